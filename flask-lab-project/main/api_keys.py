@@ -0,0 +1,211 @@
+"""
+Flask Lab Project - API keys
+A registry of API keys with scopes. Keys are never stored: the key file
+holds a salted PBKDF2 hash per key plus its first few characters, which
+are used to find the candidate entry without hashing every key.
+
+PBKDF2 is deliberately slow, so verified keys go into a small LRU cache
+with a TTL, keyed by a SHA-256 of the presented key; the slow hash runs
+once per key and TTL rather than once per request. The key file is
+checked for changes every few seconds and reloaded in place, which also
+empties the cache, so revoking a key needs no restart.
+
+Manage the key file from the command line:
+    python api_keys.py add ops --scopes admin:read admin:profile --file keys.json
+    python api_keys.py revoke ops --file keys.json
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+PREFIX_LENGTH = 8
+ITERATIONS = 100000
+DEVELOPMENT_KEY = 'your-secret-api-key'
+
+
+def hash_key(key, salt, iterations=ITERATIONS):
+    """Salted PBKDF2-SHA256 of a key"""
+    return hashlib.pbkdf2_hmac('sha256', key.encode('utf-8'), salt, iterations)
+
+
+def make_entry(name, key, scopes, iterations=ITERATIONS):
+    """Key file entry for a key (the key itself is not included)"""
+    salt = secrets.token_bytes(16)
+    return {
+        'name': name,
+        'prefix': key[:PREFIX_LENGTH],
+        'salt': salt.hex(),
+        'hash': hash_key(key, salt, iterations).hex(),
+        'iterations': iterations,
+        'scopes': sorted(scopes)
+    }
+
+
+class KeyRegistry:
+    """Hashed API keys with scopes, a verification cache and hot reload"""
+
+    def __init__(self, path=None, entries=None, cache_size=1024, cache_ttl=300.0,
+                 reload_interval=2.0):
+        self.path = path
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.reload_interval = reload_interval
+        self.hashes_computed = 0
+        self._by_prefix = {}
+        self._generation = 0  # bumped on reload; stale verifications are not cached
+        self._cache = OrderedDict()  # sha256(key) -> (name, scopes or None, expires)
+        self._lock = threading.Lock()
+        self._file_state = None
+        self._next_check = 0.0
+
+        if path is not None:
+            self.reload()
+        else:
+            self._index(entries or [])
+
+    @classmethod
+    def from_environment(cls):
+        """Registry for API_KEYS_FILE, or the single development key"""
+        path = os.environ.get('API_KEYS_FILE')
+        if path:
+            return cls(path)
+        # Development only: the old hard-coded key, with every scope
+        return cls(entries=[make_entry('development', DEVELOPMENT_KEY, ['*'], iterations=1000)])
+
+    def _index(self, entries):
+        """Replace the entries and forget every cached verification"""
+        by_prefix = {}
+        for entry in entries:
+            by_prefix.setdefault(entry['prefix'], []).append(entry)
+        with self._lock:
+            self._by_prefix = by_prefix
+            self._generation += 1
+            self._cache.clear()
+
+    def reload(self):
+        """Load the key file if it changed; returns True if it was loaded"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            state = None
+        else:
+            state = (stat.st_mtime_ns, stat.st_size)
+        if state == self._file_state:
+            return False
+
+        entries = []
+        if state is not None:
+            with open(self.path) as f:
+                entries = json.load(f)['keys']  # a bad file keeps the old keys
+        self._index(entries)
+        self._file_state = state
+        return True
+
+    def _maybe_reload(self, now):
+        """Check the key file for changes at most every reload_interval"""
+        if self.path is None or now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            self.reload()
+        except (OSError, ValueError, KeyError):
+            pass  # e.g. caught mid-write; try again at the next interval
+
+    def verify(self, key, scope=None):
+        """Name of the key's entry if the key is valid (and has scope), else None"""
+        if not key:
+            return None
+        now = time.monotonic()
+        self._maybe_reload(now)
+
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        with self._lock:
+            cached = self._cache.get(digest)
+            if cached is not None and cached[2] > now:
+                self._cache.move_to_end(digest)
+                name, scopes = cached[0], cached[1]
+            else:
+                cached = None
+                generation = self._generation
+                candidates = list(self._by_prefix.get(key[:PREFIX_LENGTH], ()))
+
+        if cached is None:
+            name, scopes = self._check(key, candidates)
+            with self._lock:
+                # Keys matching no prefix cost nothing to reject; caching them
+                # would let random keys push out the real ones
+                if candidates and generation == self._generation:
+                    self._cache[digest] = (name, scopes, now + self.cache_ttl)
+                    self._cache.move_to_end(digest)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+
+        if name is None:
+            return None
+        if scope is not None and '*' not in scopes and scope not in scopes:
+            return None
+        return name
+
+    def _check(self, key, candidates):
+        """Run the slow hash against the entries sharing the key's prefix"""
+        for entry in candidates:
+            self.hashes_computed += 1
+            computed = hash_key(key, bytes.fromhex(entry['salt']), entry.get('iterations', ITERATIONS))
+            if hmac.compare_digest(computed, bytes.fromhex(entry['hash'])):
+                return entry['name'], frozenset(entry['scopes'])
+        return None, None
+
+
+def load_file(path):
+    """Entries of a key file ([] if it does not exist yet)"""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)['keys']
+
+
+def save_file(path, entries):
+    """Atomically replace a key file (running workers pick it up)"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'keys': entries}, f, indent=2)
+    os.chmod(tmp_path, 0o600)
+    os.replace(tmp_path, path)
+
+
+def main():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--file', default=os.environ.get('API_KEYS_FILE', 'api_keys.json'))
+    parser = argparse.ArgumentParser(description='Manage the API key file')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', parents=[common], help='create a key and print it once')
+    add.add_argument('name')
+    add.add_argument('--scopes', nargs='+', default=[])
+    revoke = commands.add_parser('revoke', parents=[common], help='remove every key with this name')
+    revoke.add_argument('name')
+    args = parser.parse_args()
+
+    entries = load_file(args.file)
+    if args.command == 'add':
+        key = secrets.token_urlsafe(32)
+        entries.append(make_entry(args.name, key, args.scopes))
+        save_file(args.file, entries)
+        print(key)
+    else:
+        remaining = [entry for entry in entries if entry['name'] != args.name]
+        if len(remaining) == len(entries):
+            print(f'No key named {args.name!r}', file=sys.stderr)
+            return 1
+        save_file(args.file, remaining)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
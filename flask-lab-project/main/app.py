@@ -3,90 +3,246 @@ Flask Lab Project - Main Application
 A collaborative Flask application with CI/CD and Docker support
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, g, request, jsonify
 import os
 
-app = Flask(__name__)
-
-# Configuration
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
-app.config['DEBUG'] = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
-
-
-@app.route('/')
-def home():
-    """Homepage route - displays welcome message"""
-    return render_template('index.html')
-
-
-@app.route('/health')
-def health():
-    """Health check endpoint for monitoring"""
-    return jsonify({
-        'status': 'OK',
-        'message': 'Application is running successfully'
-    }), 200
-
-
-@app.route('/data', methods=['POST'])
-def receive_data():
-    """POST endpoint to receive and process data"""
-    try:
-        data = request.get_json()
+from ingest import iter_records, load_json, IngestError, MAX_RECORD_SIZE, MAX_REPORTED_ERRORS
+from json_provider import setup_json_provider, StaticJSONResponse
+from metrics import setup_metrics
+from structured_log import setup_logging
+from rate_limit import RateLimiter, SharedBuckets, setup_rate_limit
+from api_keys import KeyRegistry
+from body_limits import BodyLimits, setup_body_limits, KB, MB
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from compression import setup_compression
+from static_assets import setup_static_assets
+from render_cache import RenderCache
+from jobs import JobQueue, setup_jobs, wants_async, job_accepted, queue_full
+
+# /data bodies above this size are parsed incrementally (see ingest.load_json)
+STREAM_JSON_THRESHOLD = 256 * KB
+
+# Payloads that never change are encoded once at first use
+HEALTH_RESPONSE = StaticJSONResponse({
+    'status': 'OK',
+    'message': 'Application is running successfully'
+})
+
+API_INFO_RESPONSE = StaticJSONResponse({
+    'application': 'Flask Lab Project',
+    'version': '1.0.0',
+    'endpoints': {
+        '/': 'Homepage',
+        '/health': 'Health check',
+        '/data': 'POST endpoint for data submission',
+        '/data/batch': 'POST endpoint for JSON array / NDJSON batches',
+        '/api/info': 'API information',
+        '/api/jobs/<id>': 'Status of an asynchronous /data submission',
+        '/metrics': 'Request metrics (Prometheus text format)'
+    }
+})
+
+
+def process_data(data):
+    """Process one /data submission (simple echo for now)"""
+    return data
+
+
+def create_app(config=None):
+    """Build the application; config overrides the environment defaults
+    
+    gunicorn imports the module-level app below. With preload_app (see
+    gunicorn.conf.py) that happens once in the master, and the workers
+    fork with everything built here already in memory.
+    """
+    app = Flask(__name__)
+    
+    # Configuration
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
+    app.config['DEBUG'] = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
+    app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', 'True').lower() == 'true'
+    app.config.update(config or {})
+    
+    # JSON serialization: orjson when installed, JSON_ENCODER=stdlib to disable
+    setup_json_provider(app, os.environ.get('JSON_ENCODER', 'auto'))
+    
+    # Request counts and latency histograms at /metrics; METRICS_DIR lets
+    # gunicorn workers share their totals
+    setup_metrics(app, os.environ.get('METRICS_DIR'))
+    
+    # One JSON line per request, written off the request thread; health checks
+    # and scrapes are high-volume, so only 1 in 100 of them is logged
+    log = setup_logging(app, sample_rates={'/health': 100, '/metrics': 100})
+    
+    # Token buckets per client (verified API key or IP) and route, as (per
+    # second, burst); RATE_LIMIT_FILE (e.g. under /dev/shm) shares the
+    # buckets between workers. Keys come from API_KEYS_FILE (see api_keys.py)
+    app.extensions['api_keys'] = KeyRegistry.from_environment()
+    rate_limit_file = os.environ.get('RATE_LIMIT_FILE')
+    setup_rate_limit(app, RateLimiter(
+        default=(100, 200),
+        routes={'/data': (50, 100), '/data/batch': (5, 10)},
+        store=SharedBuckets(rate_limit_file) if rate_limit_file else None,
+        exempt=('/health', '/metrics')
+    ))
+    
+    # Largest request bodies, answered with 413 before the body is read;
+    # MAX_BODY_SIZE (bytes) changes the default for routes not listed here
+    setup_body_limits(app, BodyLimits(
+        default=int(os.environ.get('MAX_BODY_SIZE', 1 * MB)),
+        routes={'/data': 8 * MB, '/data/batch': 256 * MB}
+    ))
+    
+    # gzip/brotli for text responses of 1 KB or more, when the client accepts it
+    setup_compression(app)
+    
+    # Hashed, pre-compressed static files with immutable caching, once built
+    # with `python static_assets.py` (the Dockerfile does); plain files otherwise
+    setup_static_assets(app)
+    
+    # The homepage is the same HTML for every visitor: rendered once, then
+    # served from memory with ETag/Last-Modified
+    pages = RenderCache(app, preload=('index.html',))
+    app.extensions['render_cache'] = pages
+    
+    # Background jobs for requests sent with "Prefer: respond-async"; the
+    # worker threads start with the first job, i.e. after gunicorn forks
+    jobs = setup_jobs(app, JobQueue(
+        threads=int(os.environ.get('JOB_THREADS', 4)),
+        processes=int(os.environ.get('JOB_PROCESSES', 0)),
+        max_queued=int(os.environ.get('JOB_QUEUE_SIZE', 1000)),
+        keep_bytes=int(os.environ.get('JOB_RESULT_BYTES', 64 * 1024 * 1024))
+    ))
+    
+    @app.route('/')
+    def home():
+        """Homepage route - displays welcome message"""
+        return pages.response('index.html')
+    
+    @app.route('/health')
+    def health():
+        """Health check endpoint for monitoring"""
+        return HEALTH_RESPONSE()
+    
+    @app.route('/data', methods=['POST'])
+    def receive_data():
+        """POST endpoint to receive and process data"""
+        try:
+            length = request.content_length
+            if request.is_json and (length is None or length > STREAM_JSON_THRESHOLD):
+                # A single member may be as large as the route allows
+                data = load_json(request.stream, max_record_size=g.get('body_limit', MAX_RECORD_SIZE))
+            else:
+                data = request.get_json()
+            
+            if not data:
+                return jsonify({
+                    'status': 'error',
+                    'message': 'No data provided'
+                }), 400
+            
+            if wants_async():
+                # Inline in the job thread: an echo is cheaper than shipping
+                # the payload to a pool process (which would import this app)
+                job = jobs.submit(process_data, data, name='receive_data')
+                return job_accepted(job) if job is not None else queue_full()
+            
+            response = {
+                'status': 'success',
+                'message': 'Data received successfully',
+                'received_data': process_data(data)
+            }
+            
+            return jsonify(response), 201
         
-        if not data:
+        except IngestError as e:
             return jsonify({
                 'status': 'error',
-                'message': 'No data provided'
+                'message': f'Error processing data: {str(e)}'
             }), 400
         
-        # Process the data (simple echo for now)
-        response = {
-            'status': 'success',
-            'message': 'Data received successfully',
-            'received_data': data
-        }
+        except BadRequest:
+            # get_json() on a small body: malformed JSON, as IngestError above
+            return jsonify({
+                'status': 'error',
+                'message': 'Error processing data: Invalid JSON'
+            }), 400
+        
+        except RequestEntityTooLarge:
+            raise
         
-        return jsonify(response), 201
+        except Exception as e:
+            log.error('data_error', path=request.path, error=str(e))
+            return jsonify({
+                'status': 'error',
+                'message': f'Error processing data: {str(e)}'
+            }), 500
     
-    except Exception as e:
+    @app.route('/data/batch', methods=['POST'])
+    def receive_data_batch():
+        """POST endpoint for many records: a JSON array or an NDJSON stream
+        
+        Answers with counts and the first MAX_REPORTED_ERRORS rejected
+        records (index and reason), not one result per record.
+        """
+        accepted = rejected = 0
+        errors = []
+        
+        try:
+            for index, (record, error) in enumerate(iter_records(request.stream, request.content_type)):
+                if error is None and not record:
+                    error = 'No data provided'
+                
+                if error is None:
+                    accepted += 1
+                else:
+                    rejected += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'index': index, 'message': error})
+        
+        except IngestError as e:
+            log.warning('batch_rejected', path=request.path, accepted=accepted, error=str(e))
+            return jsonify({
+                'status': 'error',
+                'message': f'Error processing batch: {str(e)}',
+                'accepted': accepted,
+                'rejected': rejected,
+                'errors': errors
+            }), 400
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Batch received successfully',
+            'accepted': accepted,
+            'rejected': rejected,
+            'errors': errors
+        }), 201
+    
+    @app.route('/api/info')
+    def api_info():
+        """API information endpoint"""
+        return API_INFO_RESPONSE()
+    
+    @app.errorhandler(404)
+    def not_found(error):
+        """Handle 404 errors"""
+        return jsonify({
+            'status': 'error',
+            'message': 'Resource not found'
+        }), 404
+    
+    @app.errorhandler(500)
+    def internal_error(error):
+        """Handle 500 errors"""
         return jsonify({
             'status': 'error',
-            'message': f'Error processing data: {str(e)}'
+            'message': 'Internal server error'
         }), 500
+    
+    return app
 
 
-@app.route('/api/info')
-def api_info():
-    """API information endpoint"""
-    return jsonify({
-        'application': 'Flask Lab Project',
-        'version': '1.0.0',
-        'endpoints': {
-            '/': 'Homepage',
-            '/health': 'Health check',
-            '/data': 'POST endpoint for data submission',
-            '/api/info': 'API information'
-        }
-    }), 200
-
-
-@app.errorhandler(404)
-def not_found(error):
-    """Handle 404 errors"""
-    return jsonify({
-        'status': 'error',
-        'message': 'Resource not found'
-    }), 404
-
-
-@app.errorhandler(500)
-def internal_error(error):
-    """Handle 500 errors"""
-    return jsonify({
-        'status': 'error',
-        'message': 'Internal server error'
-    }), 500
+app = create_app()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,268 @@
+"""
+Flask Lab Project - ASGI entry point
+Serve the same Flask routes from an ASGI server:
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+Flask views still run synchronously, in a bounded thread pool. Request
+bodies are read and responses written by the event loop, so a slow client
+never holds a thread, and bodies that can be iterated asynchronously
+(event streams, see events.py) are served without any thread at all.
+Route body limits (see body_limits.py) are checked while reading: a body
+over its limit is not read any further, and the app answers 413.
+The WSGI entry point (gunicorn app:app) keeps working unchanged.
+
+application serves app.py's app only. To serve another Flask app, wrap it
+with create_application(); for app.py's routes plus the member1_backend
+user and message routes (needs that directory next to this one, e.g. a
+checkout rather than the Docker image):
+
+    uvicorn asgi:create_backend_application --factory --port 5000
+"""
+
+import asyncio
+import io
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+from app import app
+
+SPOOL_SIZE = 1024 * 1024  # request bodies above this go to a temp file
+
+
+class WSGIBridge:
+    """Run a WSGI application behind the ASGI interface"""
+
+    def __init__(self, wsgi_app, max_threads=32, body_limit=None):
+        self.wsgi_app = wsgi_app
+        self.body_limit = body_limit  # optional callable(scope) -> bytes or None
+        self.executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    async def lifespan(self, receive, send):
+        """Acknowledge startup and release the thread pool on shutdown"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive, limit=None):
+        """Read the request body without holding a thread
+
+        Reading stops as soon as the body is over limit; the app then sees
+        a length over the route's limit and answers 413.
+        """
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            more_body = message.get('more_body', False)
+            if limit is not None and body.tell() > limit:
+                break
+        body.seek(0)
+        return body
+
+    @staticmethod
+    def content_length(scope):
+        """The Content-Length header as an int, or None"""
+        for name, value in scope.get('headers', []):
+            if name.lower() == b'content-length':
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    @staticmethod
+    def build_environ(scope, body, length=None):
+        """Translate an ASGI HTTP scope into a WSGI environ
+
+        length overrides the body's own size (for a body left unread).
+        """
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        # The body is already complete (and de-chunked), so its size is known
+        if length is None:
+            body.seek(0, os.SEEK_END)
+            length = body.tell()
+            body.seek(0)
+        environ['CONTENT_LENGTH'] = str(length)
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+                continue
+            else:
+                key = f'HTTP_{name}'
+                environ[key] = f'{environ[key]},{value}' if key in environ else value
+        return environ
+
+    async def http(self, scope, receive, send):
+        """Handle one HTTP request"""
+        limit = self.body_limit(scope) if self.body_limit is not None else None
+        length = self.content_length(scope)
+        if limit is not None and length is not None and length > limit:
+            body = io.BytesIO()  # declared too large: the app answers 413 unread
+        else:
+            length = None
+            body = await self.read_body(receive, limit)
+            if body is None:
+                return  # client went away before sending the body
+
+        loop = asyncio.get_running_loop()
+        environ = self.build_environ(scope, body, length)
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            return lambda data: None  # legacy write() callable is not supported
+
+        def call_app():
+            """Run the view and, for regular bodies, produce the first chunk"""
+            iterable = self.wsgi_app(environ, start_response)
+            if hasattr(iterable, '__aiter__'):
+                return iterable, None, None
+            iterator = iter(iterable)
+            return iterable, iterator, next(iterator, None)
+
+        try:
+            iterable, iterator, first = await loop.run_in_executor(self.executor, call_app)
+        finally:
+            body.close()
+
+        try:
+            await send({'type': 'http.response.start', 'status': started['status'],
+                        'headers': started['headers']})
+            if iterator is None:
+                await self.send_async(iterable, receive, send)
+            else:
+                await self.send_sync(iterator, first, started, send, loop)
+        finally:
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    async def send_sync(self, iterator, chunk, started, send, loop):
+        """Send a regular WSGI body; further chunks are pulled in the pool"""
+        # Most responses are a single chunk with a Content-Length: no extra hop
+        length = dict(started['headers']).get(b'content-length')
+        sent = 0
+        while chunk is not None:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                sent += len(chunk)
+            if length is not None and sent >= int(length):
+                break
+            chunk = await loop.run_in_executor(self.executor, next, iterator, None)
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    async def send_async(self, iterable, receive, send):
+        """Send an async body, stopping as soon as the client disconnects"""
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        disconnected = asyncio.ensure_future(wait_for_disconnect())
+        chunks = iterable.__aiter__()
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(chunks.__anext__())
+                await asyncio.wait({next_chunk, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_chunk.done():
+                    next_chunk.cancel()
+                    await asyncio.gather(next_chunk, return_exceptions=True)
+                    return
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            disconnected.cancel()
+            aclose = getattr(chunks, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+
+
+def route_body_limit(flask_app):
+    """body_limit for WSGIBridge: the limit of the route a request is for"""
+    limits = flask_app.extensions.get('body_limits')
+    if limits is None:
+        return None
+
+    def body_limit(scope):
+        adapter = flask_app.url_map.bind('localhost')
+        try:
+            rule, _ = adapter.match(scope['path'], scope['method'], return_rule=True)
+            route = rule.rule
+        except HTTPException:
+            route = '<unmatched>'  # as body_limits.py sees it
+        return limits.limit_for(route)
+    return body_limit
+
+
+def create_application(flask_app=None):
+    """ASGI application for a Flask app (default: app.py's app)"""
+    if flask_app is None:
+        flask_app = app
+    return WSGIBridge(flask_app, max_threads=int(os.environ.get('ASGI_THREADS', 32)),
+                      body_limit=route_body_limit(flask_app))
+
+
+def create_backend_application():
+    """ASGI application for a new app with the member1_backend routes added"""
+    backend = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'member1_backend')
+    if backend not in sys.path:
+        sys.path.insert(0, backend)
+    from app import create_app
+    from backend_examples import create_user_routes, create_advanced_routes
+
+    flask_app = create_app()
+    create_user_routes(flask_app)
+    create_advanced_routes(flask_app)
+    return create_application(flask_app)
+
+
+application = create_application()
@@ -0,0 +1,63 @@
+"""
+Benchmark: peak memory of parsing a large /data body
+
+Compares, for one JSON object of many members,
+  1. json.loads() of the whole body (what request.get_json() does)
+  2. ingest.load_json() reading the body in chunks
+
+Peak memory is measured with tracemalloc and includes the parsed result
+itself, which both approaches have to build.
+
+Run from the main/ directory:
+    python benchmarks/body_parsing.py [--size-mb 8]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ingest import load_json
+
+
+def make_body(size):
+    """A JSON object of about size bytes, with non-ASCII text in it"""
+    member = 'Grüße aus dem Labor ' * 20
+    count = size // (len(member.encode('utf-8')) + 16)
+    return json.dumps({f'field{i}': member for i in range(count)}, ensure_ascii=False).encode('utf-8')
+
+
+def measure(parse, body):
+    """(peak bytes above the body itself, seconds) for one parse"""
+    start = time.perf_counter()
+    parse(io.BytesIO(body))
+    elapsed = time.perf_counter() - start  # timed without tracemalloc's overhead
+
+    tracemalloc.start()
+    result = parse(io.BytesIO(body))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mb', type=float, default=8)
+    args = parser.parse_args()
+
+    body = make_body(int(args.size_mb * 1024 * 1024))
+    print(f'body: {len(body) / 1024 / 1024:.1f} MB')
+    for name, parse in (('json.loads(whole body)', lambda stream: json.loads(stream.read())),
+                        ('ingest.load_json', load_json)):
+        peak, elapsed = measure(parse, body)
+        print(f'{name:24} peak {peak / 1024 / 1024:8.1f} MB   {elapsed * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Benchmark: JSON providers on the application's real payload shapes
+
+Run from the main/ directory:
+    python benchmarks/json_providers.py [--messages 1000] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from json_provider import FastJSONProvider, StaticJSONResponse, orjson
+
+
+def message_listing(count):
+    """Payload shaped like GET /api/messages"""
+    messages = []
+    for i in range(1, count + 1):
+        text = f'Message number {i} with a few words of content'
+        messages.append({
+            'id': i,
+            'original': {'name': f'user {i % 50}', 'message': text},
+            'processed': {
+                'name': f'User {i % 50}',
+                'message': text,
+                'word_count': len(text.split()),
+                'char_count': len(text),
+                'timestamp': datetime.now().isoformat()
+            }
+        })
+    return {
+        'status': 'success',
+        'count': count,
+        'total': count,
+        'next_cursor': None,
+        'statistics': {'total': count, 'average_length': 45.0, 'total_words': count * 9},
+        'messages': messages
+    }
+
+
+API_INFO = {
+    'application': 'Flask Lab Project',
+    'version': '1.0.0',
+    'endpoints': {
+        '/': 'Homepage',
+        '/health': 'Health check',
+        '/data': 'POST endpoint for data submission',
+        '/api/info': 'API information'
+    }
+}
+
+
+def providers(app):
+    """Providers to compare, by label"""
+    result = {
+        'flask-default': DefaultJSONProvider(app),
+        'fast-stdlib': FastJSONProvider(app, use_orjson=False),
+    }
+    if orjson is not None:
+        result['fast-orjson'] = FastJSONProvider(app)
+    return result
+
+
+def run(payload_name, payload, app, repeat):
+    """Time provider.response() for one payload"""
+    print(f'\n{payload_name}')
+    with app.app_context():
+        for label, provider in providers(app).items():
+            seconds = min(timeit.repeat(lambda: provider.response(payload), number=repeat, repeat=5))
+            size = len(provider.response(payload).get_data())
+            print(f'  {label:<14} {seconds / repeat * 1e6:12.1f} us/response  {size:>10} bytes')
+
+        static = StaticJSONResponse(payload)
+        seconds = min(timeit.repeat(static, number=repeat, repeat=5))
+        print(f"  {'pre-encoded':<14} {seconds / repeat * 1e6:12.1f} us/response")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    print(f"orjson: {'available' if orjson is not None else 'not installed'}")
+    run('/api/info', API_INFO, app, args.repeat * 100)
+    run(f'/api/messages ({args.messages} messages)', message_listing(args.messages), app, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: per-request cost of the /metrics instrumentation
+
+Measures
+  1. Metrics.observe() on its own (counter + histogram update)
+  2. a full request through the test client, with and without setup_metrics
+
+Run from the main/ directory:
+    python benchmarks/metrics_overhead.py [--requests 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from metrics import Metrics, setup_metrics
+
+
+def make_app(instrumented, directory=None):
+    """A minimal app, so the hooks are a visible share of each request"""
+    app = Flask(__name__)
+
+    @app.route('/ping')
+    def ping():
+        return 'pong'
+
+    if instrumented:
+        setup_metrics(app, directory)
+    return app
+
+
+def per_request_us(app, requests, repeat):
+    """Best-of-repeat mean time per GET /ping, in microseconds"""
+    client = app.test_client()
+    client.get('/ping')
+    best = min(timeit.repeat(lambda: client.get('/ping'), number=requests, repeat=repeat))
+    return best / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    metrics = Metrics()
+    calls = args.requests * 10
+    best = min(timeit.repeat(lambda: metrics.observe('/ping', 'GET', 200, 0.00042),
+                             number=calls, repeat=args.repeat))
+    print(f'Metrics.observe()              {best / calls * 1e6:8.2f} us/call')
+
+    with tempfile.TemporaryDirectory() as directory:
+        baseline = per_request_us(make_app(False), args.requests, args.repeat)
+        local = per_request_us(make_app(True), args.requests, args.repeat)
+        shared = per_request_us(make_app(True, directory), args.requests, args.repeat)
+
+    print(f'request without metrics        {baseline:8.2f} us')
+    print(f'request with metrics           {local:8.2f} us   (+{local - baseline:.2f} us)')
+    print(f'request with METRICS_DIR       {shared:8.2f} us   (+{shared - baseline:.2f} us)')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
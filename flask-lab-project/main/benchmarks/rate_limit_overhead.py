@@ -0,0 +1,79 @@
+"""
+Benchmark: cost of the token-bucket rate limiter
+
+Measures
+  1. one bucket check with the local and the shared (mmap) store
+  2. a full request through the test client, with and without the limiter
+
+Run from the main/ directory:
+    python benchmarks/rate_limit_overhead.py [--checks 200000] [--requests 20000] [--clients 1000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask
+from rate_limit import LocalBuckets, RateLimiter, SharedBuckets, setup_rate_limit
+
+
+def check_us(limiter, checks, clients, repeat):
+    """Best-of-repeat time per RateLimiter.check over many clients, in microseconds"""
+    identities = [f'ip:10.0.{i // 256}.{i % 256}' for i in range(clients)]
+    position = [0]
+
+    def one():
+        position[0] = (position[0] + 1) % clients
+        limiter.check(identities[position[0]], '/data')
+
+    best = min(timeit.repeat(one, number=checks, repeat=repeat))
+    return best / checks * 1e6
+
+
+def request_us(limiter, requests, repeat):
+    """Best-of-repeat time per GET /ping, in microseconds"""
+    app = Flask(__name__)
+
+    @app.route('/ping')
+    def ping():
+        return 'pong'
+
+    if limiter is not None:
+        setup_rate_limit(app, limiter)
+    client = app.test_client()
+    best = min(timeit.repeat(lambda: client.get('/ping'), number=requests, repeat=repeat))
+    return best / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--checks', type=int, default=200000)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Limits high enough that every check is allowed (the common path)
+    limit = (1e9, 1e9)
+    with tempfile.TemporaryDirectory() as directory:
+        shared = SharedBuckets(os.path.join(directory, 'buckets'))
+        local_check = check_us(RateLimiter(limit, store=LocalBuckets()), args.checks, args.clients, args.repeat)
+        shared_check = check_us(RateLimiter(limit, store=shared), args.checks, args.clients, args.repeat)
+        print(f'check, local buckets           {local_check:8.2f} us')
+        print(f'check, shared mmap buckets     {shared_check:8.2f} us')
+
+        baseline = request_us(None, args.requests, args.repeat)
+        local = request_us(RateLimiter(limit), args.requests, args.repeat)
+        shared_request = request_us(RateLimiter(limit, store=shared), args.requests, args.repeat)
+
+    print(f'request without limiter        {baseline:8.2f} us')
+    print(f'request, local buckets         {local:8.2f} us   (+{local - baseline:.2f} us)')
+    print(f'request, shared buckets        {shared_request:8.2f} us   (+{shared_request - baseline:.2f} us)')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+Benchmark: memory of a message (and user) store, dict vs compact records
+
+Fills a Collection the way POST /api/messages and POST /api/users do, once
+storing plain dicts and once with compact records (MessageRecord and
+UserRecord in member1_backend/backend_examples.py). Inputs are decoded
+from JSON one request at a time, so strings are not shared unless the
+record layer shares them. Memory is measured with tracemalloc and covers
+everything the store keeps alive, text included.
+
+Exits with status 1 when compact messages do not use at least
+--min-ratio times less memory.
+
+Run from the main/ directory:
+    python benchmarks/record_memory.py [--messages 1000000] [--users 100000]
+        [--min-ratio 2.5]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'member1_backend')))
+
+from backend_examples import Collection, DataProcessor, MessageRecord, UserRecord
+
+WORDS = ('hello world flask lab project message backend frontend deploy docker '
+         'request response cache index search update review merge test build').split()
+
+
+def message_bodies(count, seed=0):
+    """JSON bodies for count messages from a pool of 1000 senders"""
+    rng = random.Random(seed)
+    names = [f'user {i}' for i in range(1000)]
+    for _ in range(count):
+        text = ' '.join(rng.choices(WORDS, k=rng.randint(4, 16)))
+        yield json.dumps({'name': rng.choice(names), 'message': text})
+
+
+def user_bodies(count, seed=0):
+    """JSON bodies for count users with common first names"""
+    rng = random.Random(seed)
+    names = [f'name{i}' for i in range(200)]
+    for i in range(count):
+        yield json.dumps({'name': rng.choice(names), 'email': f'user{i}@example.com'})
+
+
+def fill_messages(collection, count):
+    """POST /api/messages, count times"""
+    for body in message_bodies(count):
+        collection.insert(DataProcessor.process_data(json.loads(body)))
+
+
+def fill_users(collection, count):
+    """POST /api/users, count times"""
+    for body in user_bodies(count):
+        data = json.loads(body)
+        collection.insert({'name': data['name'], 'email': data['email'],
+                           'created_at': datetime.now().isoformat()})
+
+
+def measure(fill, collection, count):
+    """(bytes kept by the collection, seconds to fill it)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    fill(collection, count)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--min-ratio', type=float, default=2.5)
+    args = parser.parse_args()
+
+    ratios = {}
+    for label, fill, count, compact_type in (('messages', fill_messages, args.messages, MessageRecord),
+                                            ('users', fill_users, args.users, UserRecord)):
+        sizes = {}
+        for name, record_type in (('dict', None), ('compact', compact_type)):
+            size, elapsed = measure(fill, Collection(label, record_type=record_type), count)
+            sizes[name] = size
+            print(f'{label:8} {name:8} {count:>9} records {size / 1024 / 1024:8.1f} MB '
+                  f'({size / count:6.0f} B/record, traced fill {elapsed:5.1f} s)')
+        ratios[label] = sizes['dict'] / sizes['compact']
+        print(f'{label:8} compact records use {ratios[label]:.1f}x less memory')
+
+    if ratios['messages'] < args.min_ratio:
+        print(f'BELOW TARGET messages ratio {ratios["messages"]:.1f}x < {args.min_ratio:g}x')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Benchmark: sync WSGI (gunicorn) vs ASGI (uvicorn) serving of main/app.py
+
+Starts each server on a local port, then measures
+  1. /health throughput and latency with concurrent keep-alive clients
+  2. /health latency while many slow clients hold connections open
+
+Run from the main/ directory (needs gunicorn and uvicorn installed):
+    python benchmarks/serving_modes.py [--clients 32] [--requests 200] [--slow 200]
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+MAIN_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SERVERS = {
+    # Same flags as the Dockerfile
+    'wsgi (gunicorn 2x2)': ['gunicorn', '--bind', '127.0.0.1:{port}', '--workers', '2',
+                            '--threads', '2', 'app:app'],
+    'asgi (uvicorn)': ['uvicorn', 'asgi:application', '--host', '127.0.0.1', '--port', '{port}',
+                       '--log-level', 'warning'],
+}
+
+
+def wait_for_port(port, timeout=15.0):
+    """Block until the server accepts connections"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def run_clients(port, clients, requests_per_client, timeout=30):
+    """Concurrent keep-alive clients; returns (requests/s, latencies in ms, errors)"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+        mine = []
+        try:
+            for _ in range(requests_per_client):
+                start = time.perf_counter()
+                connection.request('GET', '/health')
+                connection.getresponse().read()
+                mine.append((time.perf_counter() - start) * 1000)
+        except OSError as e:
+            with lock:
+                errors.append(e)
+        finally:
+            connection.close()
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, latencies, errors
+
+
+def open_slow_clients(port, count):
+    """Open connections that send half a request and then stall"""
+    sockets = []
+    for _ in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(b'GET /health HTTP/1.1\r\nHost: localhost\r\n')
+        sockets.append(sock)
+    return sockets
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(label, rate, latencies, errors):
+    """Print one result line"""
+    if not latencies:
+        print(f'  {label:<22} no successful requests ({len(errors)} errors)')
+        return
+    print(f'  {label:<22} {rate:10.0f} req/s   p50 {statistics.median(latencies):7.2f} ms'
+          f'   p99 {percentile(latencies, 0.99):8.2f} ms   errors {len(errors)}')
+
+
+def bench(name, command, port, args):
+    """Start one server and run both scenarios against it"""
+    argv = [part.format(port=port) for part in command]
+    server = subprocess.Popen(argv, cwd=MAIN_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        print(f'\n{name}')
+        report('concurrent clients', *run_clients(port, args.clients, args.requests))
+
+        slow = open_slow_clients(port, args.slow)
+        try:
+            # A single probe client; it times out if every thread is stuck
+            report(f'with {args.slow} slow clients', *run_clients(port, 1, 20, timeout=5))
+        finally:
+            for sock in slow:
+                sock.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--slow', type=int, default=200)
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    for offset, (name, command) in enumerate(SERVERS.items()):
+        bench(name, command, args.port + offset, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
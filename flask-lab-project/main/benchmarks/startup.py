@@ -0,0 +1,134 @@
+"""
+Benchmark: worker startup time and memory, checked against a budget
+
+Measures
+  1. `import app` in a fresh interpreter (the work every worker repeats
+     without preload), median of several runs
+  2. time from starting gunicorn (Dockerfile flags) to the first 200 from
+     /health, with and without preload_app (see gunicorn.conf.py)
+  3. private (unshared) memory per worker after some traffic, which is
+     what preloading with gc.freeze() is meant to keep low
+
+Exits with status 1 when the import or first-response time is over its
+budget.
+
+Run from the main/ directory (needs gunicorn installed):
+    python benchmarks/startup.py [--runs 5] [--import-budget-ms 400]
+        [--first-response-budget-ms 2000]
+"""
+
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MAIN_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SERVER = ['gunicorn', '--bind', '127.0.0.1:{port}', '--workers', '2', '--threads', '2', 'app:app']
+
+IMPORT_SNIPPET = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+
+
+def import_time(runs):
+    """Median seconds to import app.py in a new interpreter"""
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=MAIN_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def wait_for_response(port, timeout=30.0):
+    """Poll /health until it answers 200"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.01)
+        finally:
+            connection.close()
+    raise RuntimeError(f'No response on port {port}')
+
+
+def worker_pids(master_pid):
+    """Worker processes of a gunicorn master"""
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+def private_kb(pid):
+    """Private (not shared with the master) memory of a process, in kB"""
+    total = 0
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1])
+    return total
+
+
+def start_server(port, preload):
+    """Start gunicorn; returns (process, seconds to first response, private kB per worker)"""
+    env = dict(os.environ, PRELOAD_APP=str(preload), RATELIMIT_ENABLED='false')
+    argv = [part.format(port=port) for part in SERVER]
+    started = time.perf_counter()
+    server = subprocess.Popen(argv, cwd=MAIN_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_response(port)
+        first_response = time.perf_counter() - started
+
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        for path in ('/', '/api/info', '/health') * 300:
+            connection.request('GET', path)
+            connection.getresponse().read()
+        connection.close()
+        memory = []
+        if os.path.exists('/proc/self/smaps_rollup'):
+            memory = [private_kb(pid) for pid in worker_pids(server.pid)]
+        return first_response, memory
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--import-budget-ms', type=float, default=400)
+    parser.add_argument('--first-response-budget-ms', type=float, default=2000)
+    parser.add_argument('--port', type=int, default=5070)
+    args = parser.parse_args()
+
+    over_budget = []
+    imported = import_time(args.runs) * 1000
+    print(f'import app                  {imported:8.1f} ms   (budget {args.import_budget_ms:g} ms)')
+    if imported > args.import_budget_ms:
+        over_budget.append('import app')
+
+    for offset, preload in enumerate((True, False)):
+        runs = [start_server(args.port + offset, preload) for _ in range(args.runs)]
+        first_response = statistics.median(run[0] for run in runs) * 1000
+        memory = runs[-1][1]
+        label = 'preload' if preload else 'no preload'
+        line = f'first response, {label:<10} {first_response:8.1f} ms'
+        if memory:
+            line += f'   private memory per worker {statistics.mean(memory) / 1024:6.1f} MB'
+        print(line)
+        if preload and first_response > args.first_response_budget_ms:
+            over_budget.append(f'first response ({label})')
+
+    for name in over_budget:
+        print(f'OVER BUDGET {name}')
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
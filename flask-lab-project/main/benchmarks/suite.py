@@ -0,0 +1,324 @@
+"""
+Benchmark suite: micro benchmarks and an HTTP load test, checked against a baseline
+
+  micro  DataProcessor, DatabaseHelper, SearchIndex and JSON serialization;
+         each call is timed in rounds sized by timeit's autorange and the
+         median time per call is reported (as pytest-benchmark does)
+  load   main/app.py served by gunicorn (Dockerfile flags), driven for a
+         fixed time by several client processes, each with its own
+         keep-alive connections; reports requests/s and latency percentiles
+
+--save-baseline stores the results as JSON; later runs compare against it
+and exit with status 1 if a result is more than --tolerance worse (slower
+per call, fewer requests/s or a higher p99). Baselines depend on the
+machine, so keep one per machine or CI runner rather than in git.
+
+Run from the main/ directory:
+    python benchmarks/suite.py [micro|load|all] [--save-baseline]
+        [--baseline benchmarks/baseline.json] [--tolerance 0.25]
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, MAIN_DIR)
+sys.path.insert(0, os.path.abspath(os.path.join(MAIN_DIR, '..', 'member1_backend')))
+
+from flask import Flask
+from backend_examples import DataProcessor, DatabaseHelper, SearchIndex
+from json_provider import setup_json_provider
+from json_providers import message_listing
+from serving_modes import percentile, wait_for_port
+
+# Metric name -> True if higher is better
+HIGHER_IS_BETTER = {'us_per_call': False, 'requests_per_s': True, 'p50_ms': False, 'p99_ms': False}
+
+# ---------------------------------------------------------------------------
+# Micro benchmarks: each function does its setup and returns the call to time
+
+MICRO = {}
+
+
+def micro(name):
+    """Register a micro benchmark"""
+    def register(setup):
+        MICRO[name] = setup
+        return setup
+    return register
+
+
+def sample_records(count):
+    """Message records shaped like POST /api/messages bodies"""
+    return [{'name': f'user {i % 50}', 'message': f'Message number {i} with a few words of content'}
+            for i in range(count)]
+
+
+@micro('processor.validate_data')
+def bench_validate_data():
+    record = sample_records(1)[0]
+    return lambda: DataProcessor.validate_data(record)
+
+
+@micro('processor.process_data')
+def bench_process_data():
+    record = sample_records(1)[0]
+    return lambda: DataProcessor.process_data(record)
+
+
+@micro('processor.validate_process_many_1000')
+def bench_process_many():
+    names, messages = DataProcessor.to_columns(sample_records(1000))
+
+    def run():
+        DataProcessor.validate_many(names, messages)
+        DataProcessor.process_many(names, messages)
+    return run
+
+
+@micro('processor.calculate_statistics_1000')
+def bench_calculate_statistics():
+    records = sample_records(1000)
+    return lambda: DataProcessor.calculate_statistics(records)
+
+
+@micro('database.save')
+def bench_database_save():
+    db = DatabaseHelper(indexes={'users': ('email',)})
+    counter = iter(range(10 ** 9))
+    return lambda: db.save('users', {'name': 'Ada', 'email': f'ada{next(counter)}@example.com'})
+
+
+@micro('database.find_by_id_10000')
+def bench_database_find_by_id():
+    db = DatabaseHelper()
+    for record in sample_records(10000):
+        db.save('messages', record)
+    return lambda: db.find_by_id('messages', 5000)
+
+
+@micro('database.find_by_indexed_10000')
+def bench_database_find_by():
+    db = DatabaseHelper(indexes={'messages': ('name',)})
+    for record in sample_records(10000):
+        db.save('messages', record)
+    return lambda: db.find_by('messages', 'name', 'user 7')
+
+
+@micro('search.prefix_query_5000')
+def bench_search():
+    index = SearchIndex()
+    for i, record in enumerate(sample_records(5000)):
+        index.add(i, record['name'], record['message'])
+    return lambda: index.search('user mess', limit=20)
+
+
+@micro('json.message_listing_1000')
+def bench_json():
+    app = Flask(__name__)
+    setup_json_provider(app)
+    payload = message_listing(1000)
+    return lambda: app.json.dumps(payload)
+
+
+def time_call(call, rounds=5, min_time=0.2):
+    """Median seconds per call over rounds of an autoranged number of calls"""
+    timer = timeit.Timer(call)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return statistics.median(timer.repeat(repeat=rounds, number=number)) / number
+
+
+def run_micro(names=None, rounds=5, min_time=0.2):
+    """{benchmark name: {'us_per_call': ...}} for the selected benchmarks"""
+    results = {}
+    for name, setup in MICRO.items():
+        if names and name not in names:
+            continue
+        seconds = time_call(setup(), rounds, min_time)
+        results[f'micro.{name}'] = {'us_per_call': round(seconds * 1e6, 3)}
+        print(f'  {name:<40} {seconds * 1e6:12.2f} us/call')
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Load test: client processes against a gunicorn-served app
+
+SCENARIOS = {
+    'GET /health': ('GET', '/health', None),
+    'GET /api/info': ('GET', '/api/info', None),
+    'POST /data': ('POST', '/data', json.dumps({'name': 'Load Test', 'message': 'Testing load'})),
+}
+
+SERVER = ['gunicorn', '--bind', '127.0.0.1:{port}', '--workers', '2', '--threads', '2', 'app:app']
+
+
+def load_worker(port, method, path, body, connections, duration):
+    """One client process: (latencies in ms, errors) of keep-alive connections"""
+    headers = {'Content-Type': 'application/json'} if body else {}
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def connection_loop():
+        nonlocal errors
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        mine = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    failed += 1
+                    continue
+            except OSError:
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                continue
+            mine.append((time.perf_counter() - start) * 1000)
+        connection.close()
+        with lock:
+            latencies.extend(mine)
+            errors += failed
+
+    threads = [threading.Thread(target=connection_loop) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def generate_load(port, method, path, body=None, processes=4, connections=8, duration=5.0):
+    """Drive one endpoint from several processes: results dict"""
+    with multiprocessing.Pool(processes) as pool:
+        started = time.perf_counter()
+        parts = pool.starmap(load_worker, [(port, method, path, body, connections, duration)] * processes)
+        elapsed = time.perf_counter() - started
+    latencies = [latency for part, _ in parts for latency in part]
+    errors = sum(part_errors for _, part_errors in parts)
+    if not latencies:
+        return {'requests_per_s': 0.0, 'errors': errors}
+    return {
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p90_ms': round(percentile(latencies, 0.90), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'max_ms': round(max(latencies), 3),
+        'errors': errors
+    }
+
+
+def run_load(port=5060, processes=4, connections=8, duration=5.0):
+    """{scenario: results} for every scenario against a fresh server"""
+    env = dict(os.environ, RATELIMIT_ENABLED='false')  # one client address would be limited
+    argv = [part.format(port=port) for part in SERVER]
+    server = subprocess.Popen(argv, cwd=MAIN_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = {}
+    try:
+        wait_for_port(port)
+        for name, (method, path, body) in SCENARIOS.items():
+            result = generate_load(port, method, path, body, processes, connections, duration)
+            results[f'load.{name}'] = result
+            print(f'  {name:<16} {result["requests_per_s"]:10.0f} req/s'
+                  f'   p50 {result.get("p50_ms", 0):7.2f} ms   p90 {result.get("p90_ms", 0):7.2f} ms'
+                  f'   p99 {result.get("p99_ms", 0):7.2f} ms   errors {result["errors"]}')
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Baselines
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against a baseline, as printable lines"""
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in HIGHER_IS_BETTER.items():
+            if metric not in metrics or not base.get(metric):
+                continue
+            change = metrics[metric] / base[metric] - 1
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append(f'{name} {metric}: {base[metric]} -> {metrics[metric]} '
+                                   f'({change:+.0%})')
+    return regressions
+
+
+def load_baseline(path):
+    """A saved baseline, or {} if there is none"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    """Merge results into the baseline file (micro and load can be saved separately)"""
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('suite', nargs='?', choices=('micro', 'load', 'all'), default='all')
+    parser.add_argument('--baseline', default=os.path.join(BENCH_DIR, 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--only', nargs='+', help='micro benchmarks to run (default: all)')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--connections', type=int, default=8, help='per client process')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--port', type=int, default=5060)
+    args = parser.parse_args()
+
+    results = {}
+    if args.suite in ('micro', 'all'):
+        print('micro benchmarks')
+        results.update(run_micro(args.only))
+    if args.suite in ('load', 'all'):
+        print(f'load ({args.processes} processes x {args.connections} connections, {args.duration:g}s each)')
+        results.update(run_load(args.port, args.processes, args.connections, args.duration))
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f'baseline saved to {args.baseline}')
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if not baseline:
+        print('no baseline to compare against (use --save-baseline)')
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f'REGRESSION {line}')
+    print(f'{len(regressions)} regression(s) beyond {args.tolerance:.0%}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
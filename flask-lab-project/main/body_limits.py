@@ -0,0 +1,72 @@
+"""
+Flask Lab Project - Request body limits
+Per-route maximum body sizes. A request whose Content-Length is over its
+route's limit gets 413 before any of the body is read; a chunked body
+without a Content-Length is cut off with 413 as soon as it passes the
+limit while being read.
+"""
+
+from flask import g, jsonify, request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import LimitedStream
+
+KB = 1024
+MB = 1024 * KB
+
+
+class BodyLimits:
+    """Maximum request body size per route rule"""
+
+    def __init__(self, default=1 * MB, routes=None):
+        self.default = default            # None for no limit
+        self.routes = dict(routes or {})  # route rule -> bytes, None for no limit
+        self.rejected = 0
+
+    def limit_for(self, route):
+        """Largest body accepted for a route, or None"""
+        return self.routes.get(route, self.default)
+
+
+def too_large(limit):
+    """The JSON 413 response"""
+    response = jsonify({
+        'status': 'error',
+        'message': f'Request body exceeds {limit} bytes'
+    })
+    response.status_code = 413
+    return response
+
+
+def setup_body_limits(app, limits):
+    """Reject request bodies over their route's limit with 413"""
+
+    @app.before_request
+    def check_body_size():
+        rule = request.url_rule
+        limit = limits.limit_for(rule.rule if rule is not None else '<unmatched>')
+        if limit is None:
+            return None
+        g.body_limit = limit
+
+        length = request.content_length
+        if length is not None:
+            if length > limit:
+                limits.rejected += 1
+                return too_large(limit)
+        elif 'wsgi.input_terminated' in request.environ and 'stream' not in request.__dict__:
+            # Chunked body: count bytes as they are read instead
+            request.environ['wsgi.input'] = LimitedStream(request.environ['wsgi.input'], limit, is_max=True)
+        return None
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def body_too_large(error):
+        limits.rejected += 1
+        return too_large(g.get('body_limit', limits.default))
+
+    metrics = app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.add_counter('request_body_rejected_total', 'Request bodies rejected with 413.',
+                            lambda: limits.rejected)
+
+    app.extensions['body_limits'] = limits
+    return limits
@@ -0,0 +1,126 @@
+"""
+Flask Lab Project - Response compression
+gzip (or brotli, when the brotli package is installed) for dynamic
+responses the client accepts, above a size threshold and only for text
+types. Files sent with send_file are left alone (they go out with
+sendfile; see static_assets.py for pre-compressed static files), as are
+streamed responses such as the event stream.
+
+A compressed response is a different representation, so its ETag is
+made weak. Responses that carry an ETag are also the ones that repeat
+(see http_cache.conditional), so their compressed bodies are cached by
+ETag and encoding instead of being compressed on every request.
+"""
+
+import gzip
+
+from flask import request
+
+from http_cache import ResponseCache
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/x-ndjson',
+    'application/xml', 'image/svg+xml'
+}
+
+
+def is_compressible(mimetype):
+    """Text formats gain from compression; images and archives do not"""
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def choose_encoding(available):
+    """Best encoding of available ('br', 'gzip') the client accepts, or None"""
+    accept = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accept.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, level):
+    """Compress bytes with gzip or brotli"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=level['br'])
+    return gzip.compress(data, compresslevel=level['gzip'], mtime=0)
+
+
+class Compressor:
+    """Settings and counters of response compression"""
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5, cache=None):
+        self.min_size = min_size
+        self.level = {'gzip': gzip_level, 'br': brotli_quality}
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        self.cache = cache if cache is not None else ResponseCache(max_entries=512,
+                                                                   max_bytes=32 * 1024 * 1024)
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def should_compress(self, response):
+        """Only complete, uncompressed text bodies above min_size"""
+        if response.direct_passthrough or response.is_streamed:
+            return False
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in response.headers or not is_compressible(response.mimetype or ''):
+            return False
+        return (response.content_length or 0) >= self.min_size
+
+    def apply(self, response):
+        """Compress a response in place if the client accepts it"""
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(self.encodings)
+        if encoding is None:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag and not weak else None
+        entry = self.cache.get(key) if key is not None else None
+        if entry is not None:
+            body = entry[0]
+        else:
+            data = response.get_data()
+            body = compress(data, encoding, self.level)
+            if len(body) >= len(data):
+                return response  # e.g. already compressed data inside JSON
+            if key is not None:
+                self.cache.put(key, body, response.mimetype)
+
+        self.compressed += 1
+        self.bytes_in += response.content_length
+        self.bytes_out += len(body)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+def setup_compression(app, compressor=None):
+    """Compress an app's dynamic responses for clients that accept it"""
+    compressor = compressor or Compressor()
+
+    @app.after_request
+    def compress_response(response):
+        if compressor.should_compress(response):
+            return compressor.apply(response)
+        return response
+
+    metrics = app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.add_counter('compressed_responses_total', 'Responses sent compressed.',
+                            lambda: compressor.compressed)
+        metrics.add_counter('compression_saved_bytes_total', 'Bytes saved by compression.',
+                            lambda: compressor.bytes_in - compressor.bytes_out)
+
+    app.extensions['compression'] = compressor
+    return compressor
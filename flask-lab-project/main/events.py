@@ -0,0 +1,215 @@
+"""
+Flask Lab Project - Server-sent events
+An in-process broker that encodes each event once and fans the same bytes
+out to every subscriber. Each subscriber has a bounded queue; a client
+that falls too far behind is sent a 'resync' event and disconnected
+instead of letting its backlog grow without limit.
+
+Event ids are "<process token>:<sequence>": each worker process numbers
+its own events, so a Last-Event-ID from another process (or from before a
+restart) cannot be replayed here and gets a 'resync' instead.
+
+Streams can be consumed synchronously (WSGI: one thread per client) or
+asynchronously (ASGI, see asgi.py: no thread while a client waits). asyncio
+is only imported by the async path, so WSGI workers never load it.
+"""
+
+import os
+import queue
+import threading
+import uuid
+import weakref
+from collections import deque
+
+from flask import current_app
+
+HEARTBEAT = b': keepalive\n\n'
+
+
+def encode_event(event_id, event, data):
+    """Format one SSE frame (event_id None leaves the client's last id alone)"""
+    frame = f'event: {event}\ndata: {data}\n\n'
+    if event_id is not None:
+        frame = f'id: {event_id}\n' + frame
+    return frame.encode('utf-8')
+
+
+class Subscriber:
+    """One connected client: a bounded queue of encoded frames"""
+
+    def __init__(self, max_queued):
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.overflowed = False
+        self.waiter = None  # called after every send; set by async consumers
+
+    def send(self, frame):
+        """Queue a frame without blocking the publisher; False if it lags"""
+        try:
+            self.queue.put_nowait(frame)
+            sent = True
+        except queue.Full:
+            self.overflowed = True
+            sent = False
+
+        if self.waiter is not None:
+            self.waiter()
+        return sent
+
+
+class EventStream:
+    """Response body for one subscriber, iterable from WSGI and ASGI alike"""
+
+    def __init__(self, broker, subscriber):
+        self.broker = broker
+        self.subscriber = subscriber
+
+    def __iter__(self):
+        return self.broker.stream(self.subscriber)
+
+    def __aiter__(self):
+        return self._aiter()
+
+    async def _aiter(self):
+        """Async variant of EventBroker.stream, woken by the publisher"""
+        import asyncio
+        
+        subscriber = self.subscriber
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # event loop already closed
+
+        subscriber.waiter = wake
+        try:
+            yield b'retry: 3000\n\n'
+            while True:
+                if subscriber.overflowed and subscriber.queue.empty():
+                    yield encode_event(None, 'resync', '{}')
+                    return
+
+                try:
+                    frame = subscriber.queue.get_nowait()
+                except queue.Empty:
+                    ready.clear()
+                    if not subscriber.queue.empty():
+                        continue
+                    try:
+                        await asyncio.wait_for(ready.wait(), self.broker.heartbeat)
+                        continue
+                    except asyncio.TimeoutError:
+                        frame = HEARTBEAT
+                yield frame
+        finally:
+            subscriber.waiter = None
+            self.close()
+
+    def close(self):
+        """Called by the server when the response ends, even if never iterated"""
+        self.broker.unsubscribe(self.subscriber)
+
+
+class EventBroker:
+    """Publish/subscribe hub for server-sent events"""
+
+    def __init__(self, max_queued=256, history=256, heartbeat=15.0):
+        self.max_queued = max_queued
+        self.heartbeat = heartbeat
+        self.history = deque(maxlen=history)  # (sequence, frame) for reconnects
+        self._lock = threading.Lock()
+        self._reset()
+
+        # A forked worker numbers its own events
+        def reset_in_child(ref=weakref.ref(self)):
+            broker = ref()
+            if broker is not None:
+                broker._lock = threading.Lock()
+                broker._reset()
+        os.register_at_fork(after_in_child=reset_in_child)
+
+    def _reset(self):
+        """New process token, no events yet"""
+        self.origin = uuid.uuid4().hex[:12]
+        self.last_id = 0  # sequence of the last event published here
+        self.subscribers = set()
+        self.history.clear()
+
+    def event_id(self, sequence):
+        """Last-Event-ID text of one of our events"""
+        return f'{self.origin}:{sequence}'
+
+    def sequence(self, event_id):
+        """Our sequence number in a Last-Event-ID, or None if it is not ours"""
+        origin, _, sequence = (event_id or '').rpartition(':')
+        if origin != self.origin or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def publish(self, event, data):
+        """Encode an event once and queue it for every subscriber; returns its id"""
+        payload = current_app.json.dumps(data)
+        with self._lock:
+            self.last_id += 1
+            event_id = self.event_id(self.last_id)
+            frame = encode_event(event_id, event, payload)
+            self.history.append((self.last_id, frame))
+            subscribers = list(self.subscribers)
+
+        lagging = [subscriber for subscriber in subscribers if not subscriber.send(frame)]
+        if lagging:
+            # They will get a 'resync' once their queue drains; stop feeding them
+            with self._lock:
+                self.subscribers.difference_update(lagging)
+        return event_id
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber, replaying events it missed if still known"""
+        subscriber = Subscriber(self.max_queued)
+        with self._lock:
+            if last_event_id is not None:
+                last = self.sequence(last_event_id)
+                oldest = self.history[0][0] if self.history else self.last_id + 1
+                if last is None or last < oldest - 1 or last > self.last_id:
+                    # Missed events are gone, or were another process's
+                    subscriber.overflowed = True
+                else:
+                    for sequence, frame in self.history:
+                        if sequence > last:
+                            subscriber.send(frame)
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Forget a subscriber"""
+        with self._lock:
+            self.subscribers.discard(subscriber)
+
+    def stream(self, subscriber):
+        """Yield SSE frames for a subscriber until it disconnects or lags"""
+        try:
+            yield b'retry: 3000\n\n'
+            while True:
+                if subscriber.overflowed and subscriber.queue.empty():
+                    yield encode_event(None, 'resync', '{}')
+                    return
+
+                try:
+                    frame = subscriber.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    frame = HEARTBEAT
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    def response(self, last_event_id=None):
+        """Build a text/event-stream response for a new subscriber"""
+        subscriber = self.subscribe(last_event_id)
+        response = current_app.response_class(EventStream(self, subscriber),
+                                              mimetype='text/event-stream',
+                                              direct_passthrough=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
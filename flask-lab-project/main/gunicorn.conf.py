@@ -0,0 +1,46 @@
+"""
+Flask Lab Project - gunicorn settings
+gunicorn reads ./gunicorn.conf.py on its own, so the Dockerfile command
+and the benchmarks (all run from main/) use these without a flag.
+
+preload_app imports app.py once in the master; workers are forked with
+the application already built instead of each importing Flask and every
+module again. Forked workers share the master's memory copy-on-write, but
+CPython's garbage collector writes to every object it scans, which would
+copy those pages into each worker. As the gc module documentation
+advises, the master runs with the collector disabled, freezes everything
+it has built right before each fork, and workers turn the collector back
+on for their own objects only.
+
+When a worker exits, its metrics file in METRICS_DIR is removed, so
+/metrics stops adding up the totals of workers that are gone.
+
+PRELOAD_APP=false restores a separate import per worker (e.g. for code
+reloading in development).
+"""
+
+import gc
+import os
+
+preload_app = os.environ.get('PRELOAD_APP', 'True').lower() == 'true'
+
+if preload_app:
+    gc.disable()  # no collections (and no freed holes in pages) while loading
+
+
+def pre_fork(server, worker):
+    """Move everything the master built out of the collector's reach"""
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Workers collect their own garbage as usual"""
+    gc.enable()
+
+
+def child_exit(server, worker):
+    """Drop an exited worker's metrics file"""
+    directory = os.environ.get('METRICS_DIR')
+    if directory:
+        from metrics import remove_worker_file
+        remove_worker_file(directory, worker.pid)
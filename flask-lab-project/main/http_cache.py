@@ -0,0 +1,108 @@
+"""
+Flask Lab Project - HTTP caching helpers
+Strong ETags hashed from response bodies, 304 answers for If-None-Match,
+and an LRU cache of encoded response bodies (and their ETags).
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+def make_etag(body):
+    """Build a strong ETag value from a response body
+
+    A hash of the content itself, so every worker process tags the same
+    body alike and never a different one (versions are per process).
+    """
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def not_modified(etag):
+    """Return a bodiless 304 response carrying the ETag"""
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+class ResponseCache:
+    """LRU cache of response bodies, bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (body, mimetype, etag)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return (body, mimetype, etag) or None, marking the entry as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, mimetype, etag=None):
+        """Store a body, evicting the least recently used entries as needed"""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = (body, mimetype, etag)
+            self.size += len(body)
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                evicted_body = self._entries.popitem(last=False)[1][0]
+                self.size -= len(evicted_body)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+def conditional(cache, version):
+    """Serve a GET view from (route, query, version) with ETag/304 support
+
+    version is a callable returning the current version of the data the
+    view reads; any change to it invalidates cached bodies. The ETag is
+    hashed from the body once, when it is cached: a version number alone
+    could stand for different data in another worker process.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = (request.path, request.query_string, version())
+            entry = cache.get(key)
+            if entry is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                entry = (body, response.mimetype, make_etag(body))
+                cache.put(key, *entry)
+
+            body, mimetype, etag = entry
+            if request.if_none_match.contains_weak(etag):
+                return not_modified(etag)
+
+            response = current_app.response_class(body, mimetype=mimetype)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,203 @@
+"""
+Flask Lab Project - Streaming ingestion helpers
+Parse JSON-array or NDJSON request bodies one record at a time, so a large
+batch never has to be held in memory as a whole. load_json() applies the
+same idea to a single large JSON document, one member at a time.
+"""
+
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+MAX_RECORD_SIZE = 1024 * 1024
+
+# Rejected records itemized in a batch response; further ones are only
+# counted, so the response stays small however large the batch
+MAX_REPORTED_ERRORS = 100
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+class IngestError(ValueError):
+    """Raised when a batch body cannot be parsed any further"""
+
+
+def is_ndjson(content_type):
+    """Check whether a Content-Type header names a newline-delimited body"""
+    return (content_type or '').split(';')[0].strip().lower() in NDJSON_TYPES
+
+
+def iter_records(stream, content_type, chunk_size=CHUNK_SIZE,
+                 max_record_size=MAX_RECORD_SIZE):
+    """Yield (record, error) pairs from a JSON array or NDJSON body"""
+    if is_ndjson(content_type):
+        return iter_ndjson(stream, chunk_size, max_record_size)
+    return iter_json_array(stream, chunk_size, max_record_size)
+
+
+def iter_ndjson(stream, chunk_size=CHUNK_SIZE, max_record_size=MAX_RECORD_SIZE):
+    """Yield (record, error) for every non-blank line of an NDJSON stream"""
+    buffer = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        lines = buffer.split(b'\n')
+        buffer = b'' if not chunk else lines.pop()
+
+        if len(buffer) > max_record_size:
+            raise IngestError(f'Record exceeds {max_record_size} bytes')
+
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, f'Invalid JSON: {e}'
+
+        if not chunk:
+            return
+
+
+class _Scanner:
+    """Characters of a UTF-8 byte stream, buffered a chunk at a time"""
+
+    def __init__(self, stream, chunk_size, max_record_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_record_size = max_record_size
+        self.reader = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def fill(self):
+        """Drop consumed text and read the next chunk
+
+        A chunk is at least as large as the unconsumed text, so a member
+        that spans many chunks is decoded (and copied) a logarithmic
+        number of times, not once per chunk: linear time overall.
+        """
+        pending = len(self.buffer) - self.position
+        size = min(max(self.chunk_size, pending), self.max_record_size + 1 - pending)
+        chunk = self.stream.read(max(size, 1))
+        self.eof = not chunk
+        self.buffer = self.buffer[self.position:] + self.reader.decode(chunk, final=self.eof)
+        self.position = 0
+        if len(self.buffer) > self.max_record_size:
+            raise IngestError(f'Record exceeds {self.max_record_size} bytes')
+
+    def next_char(self):
+        """Skip whitespace and return the next character ('' at end of body)"""
+        while True:
+            buffer = self.buffer
+            position = self.position
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            self.position = position
+            if position < len(buffer) or self.eof:
+                return buffer[position:position + 1]
+            self.fill()
+
+    def value(self, delimiters, container):
+        """Decode the next value and consume the delimiter after it
+
+        Returns (value, delimiter); delimiters are the characters that may
+        follow the value inside its container ('array' or 'object').
+        """
+        while True:
+            if self.next_char() == '':
+                raise IngestError(f'Unterminated JSON {container}')
+            try:
+                record, end = _decoder.raw_decode(self.buffer, self.position)
+            except ValueError as e:
+                if self.eof:
+                    raise IngestError(f'Invalid JSON: {e}')
+                self.fill()
+                continue
+
+            # Only accept a value once the delimiter after it is in the buffer;
+            # a value at the buffer edge (e.g. "12" of "123") may be cut short.
+            buffer = self.buffer
+            after = end
+            while after < len(buffer) and buffer[after] in _WHITESPACE:
+                after += 1
+            delimiter = buffer[after:after + 1]
+            if delimiter not in delimiters:
+                if not self.eof:
+                    self.fill()
+                    continue
+                if delimiter == '':
+                    raise IngestError(f'Unterminated JSON {container}')
+                expected = ' or '.join(f'"{d}"' for d in delimiters)
+                raise IngestError(f'Expected {expected} in JSON {container}')
+
+            self.position = after + 1
+            return record, delimiter
+
+
+def iter_json_array(stream, chunk_size=CHUNK_SIZE, max_record_size=MAX_RECORD_SIZE):
+    """Yield (record, error) for every element of a top-level JSON array"""
+    scanner = _Scanner(stream, chunk_size, max_record_size)
+    if scanner.next_char() != '[':
+        raise IngestError('Body must be a JSON array or NDJSON')
+    for record in _array_items(scanner):
+        yield record, None
+
+
+def _array_items(scanner):
+    """Elements of the array whose '[' is the next character"""
+    scanner.position += 1
+    if scanner.next_char() == ']':
+        scanner.position += 1
+        return
+    while True:
+        record, delimiter = scanner.value((',', ']'), 'array')
+        yield record
+        if delimiter == ']':
+            return
+
+
+def _object_members(scanner):
+    """(key, value) pairs of the object whose '{' is the next character"""
+    scanner.position += 1
+    if scanner.next_char() == '}':
+        scanner.position += 1
+        return
+    while True:
+        key, _ = scanner.value((':',), 'object')
+        if not isinstance(key, str):
+            raise IngestError('Object keys must be strings')
+        value, delimiter = scanner.value((',', '}'), 'object')
+        yield key, value
+        if delimiter == '}':
+            return
+
+
+def load_json(stream, chunk_size=CHUNK_SIZE, max_record_size=MAX_RECORD_SIZE):
+    """Parse a JSON document without holding its whole text in memory
+
+    A top-level object or array is decoded member by member, so only the
+    largest single member (at most max_record_size) is ever buffered as
+    text; the result equals json.load() of the same body.
+    """
+    scanner = _Scanner(stream, chunk_size, max_record_size)
+    first = scanner.next_char()
+    if first == '{':
+        document = dict(_object_members(scanner))
+    elif first == '[':
+        document = list(_array_items(scanner))
+    else:
+        while not scanner.eof:
+            scanner.fill()
+        try:
+            return json.loads(scanner.buffer)
+        except ValueError as e:
+            raise IngestError(f'Invalid JSON: {e}')
+
+    if scanner.next_char() != '':
+        raise IngestError('Extra data after the JSON document')
+    return document
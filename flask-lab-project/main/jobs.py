@@ -0,0 +1,309 @@
+"""
+Flask Lab Project - Background jobs
+An in-process job queue for work that need not delay the response.
+A route can accept a request, queue the rest of the work and answer
+202 Accepted with the job's URL; GET /api/jobs/<id> reports its progress.
+
+- the queue is bounded: when it is full, submit() returns None and the
+  route answers 503 with Retry-After instead of piling up work
+- a few worker threads run the jobs, each exactly once: a failing job is
+  marked failed rather than repeated, as it may already have had effects
+- finished jobs are remembered for status lookups up to keep jobs and
+  keep_bytes of results (JSON size); beyond that the oldest results are
+  dropped, their status still answers with result_expired
+- run_cpu() sends CPU-heavy steps to a process pool (when configured),
+  so they do not hold the GIL that the request threads need; a failing
+  step is retried with exponential backoff, as it has no side effects
+
+Clients opt in per request with "Prefer: respond-async" (RFC 7240) or
+?async=1; without it the routes keep answering synchronously. Jobs live in
+the worker process that accepted them: under gunicorn, /api/jobs/<id> is
+only answered by that worker (ids are random, so another worker answers
+404 rather than describing a different job).
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import nullcontext
+
+from flask import jsonify, request, url_for
+
+
+class Job:
+    """One unit of queued work and its outcome"""
+
+    __slots__ = ('id', 'name', 'function', 'args', 'status', 'attempts', 'result', 'error',
+                 'size', 'expired', 'created', 'started', 'finished')
+
+    def __init__(self, name, function, args):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.function = function
+        self.args = args
+        self.status = 'queued'  # then 'running', 'succeeded' or 'failed'
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.size = 0          # JSON size of the result, counted against keep_bytes
+        self.expired = False   # result dropped to stay within keep_bytes
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in ('succeeded', 'failed')
+
+    def to_dict(self):
+        """JSON-serializable status (the result only once it exists)"""
+        status = {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'attempts': self.attempts,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished
+        }
+        if self.expired:
+            status['result_expired'] = True
+        elif self.status == 'succeeded':
+            status['result'] = self.result
+        elif self.status == 'failed':
+            status['error'] = self.error
+        return status
+
+
+class JobQueue:
+    """Bounded job queue served by worker threads (and an optional process pool)"""
+
+    def __init__(self, threads=4, processes=0, max_queued=1000, keep=10000,
+                 keep_bytes=64 * 1024 * 1024, max_retries=2, retry_delay=0.1):
+        self.threads = threads
+        self.processes = processes
+        self.max_queued = max_queued
+        self.keep = keep                # finished jobs remembered for status lookups
+        self.keep_bytes = keep_bytes    # ...and the total size of their results
+        self.max_retries = max_retries  # of a failing run_cpu() step
+        self.retry_delay = retry_delay  # seconds before the first retry, doubled each time
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+        self.app = None  # set by setup_jobs; jobs then run in its app context
+        self._lock = threading.Lock()
+        self._local = threading.local()  # .job: the job a worker thread is running
+        self._reset()
+
+    def _reset(self):
+        """Fresh queue, no threads and no pool (also after a fork)"""
+        self._queue = queue.Queue(self.max_queued)
+        self._jobs = OrderedDict()  # id -> Job, oldest first
+        self._finished = deque()    # ids of finished jobs, in the order they finished
+        self._results = deque()     # ids of finished jobs whose result is kept, likewise
+        self._result_bytes = 0
+        self._workers = []
+        self._pool = None
+        self._pid = os.getpid()
+
+    def _start(self):
+        """Start the worker threads (again, in a forked child)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()  # the parent's threads and jobs did not survive the fork
+            if not self._workers:
+                for number in range(self.threads):
+                    worker = threading.Thread(target=self._run, name=f'job-worker-{number}', daemon=True)
+                    worker.start()
+                    self._workers.append(worker)
+
+    def submit(self, function, *args, name=None):
+        """Queue function(*args); returns the Job, or None if the queue is full"""
+        if not self._workers or self._pid != os.getpid():
+            self._start()
+        job = Job(name or function.__name__, function, args)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            self.rejected += 1
+            return None
+        return job
+
+    def get(self, job_id):
+        """A job by id, or None if unknown (or long finished)"""
+        return self._jobs.get(job_id)
+
+    def __len__(self):
+        """Jobs waiting to run"""
+        return self._queue.qsize()
+
+    def _forget_finished(self, job):
+        """Remember a finished job, dropping the oldest beyond keep and keep_bytes"""
+        with self._lock:
+            self._finished.append(job.id)
+            while len(self._finished) > self.keep:
+                old = self._jobs.pop(self._finished.popleft())
+                self._result_bytes -= old.size
+                old.size = 0
+
+            if job.size:
+                self._results.append(job.id)
+                self._result_bytes += job.size
+            # The newest result is kept even if it alone exceeds keep_bytes
+            while self._result_bytes > self.keep_bytes and len(self._results) > 1:
+                old = self._jobs.get(self._results.popleft())
+                if old is not None and old.size:
+                    self._result_bytes -= old.size
+                    old.size = 0
+                    old.result = None
+                    old.expired = True
+
+    def _run(self):
+        """Worker loop"""
+        while True:
+            job = self._queue.get()
+            try:
+                with self.app.app_context() if self.app is not None else nullcontext():
+                    self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, job):
+        """Run a job once (run_cpu retries its own steps)"""
+        job.status = 'running'
+        job.started = time.time()
+        job.attempts = 1
+        self._local.job = job
+        try:
+            job.result = job.function(*job.args)
+            job.size = len(json.dumps(job.result, separators=(',', ':'), default=str))
+        except Exception as e:
+            job.error = f'{type(e).__name__}: {e}'
+            job.status = 'failed'
+            self.failed += 1
+        else:
+            job.status = 'succeeded'
+            self.completed += 1
+        finally:
+            self._local.job = None
+        job.finished = time.time()
+        job.function = job.args = None  # let the inputs be freed
+        self._forget_finished(job)
+
+    def run_cpu(self, function, *args):
+        """Run a CPU-bound, picklable function in the process pool
+
+        Called from inside a job; without processes configured it simply
+        runs in the calling thread. The function must be free of side
+        effects: a failure is retried with exponential backoff (and counted
+        in the job's attempts) before it is raised.
+        """
+        job = getattr(self._local, 'job', None)
+        for attempt in itertools.count(1):
+            try:
+                return self._call_cpu(function, args)
+            except Exception:
+                if attempt > self.max_retries:
+                    raise
+            self.retried += 1
+            if job is not None:
+                job.attempts += 1
+            time.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+    def _call_cpu(self, function, args):
+        """One call of function(*args), in the pool if there is one"""
+        if not self.processes:
+            return function(*args)
+        if self._pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            with self._lock:
+                if self._pool is None:
+                    # spawn, not fork: this process is running threads
+                    self._pool = ProcessPoolExecutor(self.processes,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        return self._pool.submit(function, *args).result()
+
+    def join(self, timeout=None):
+        """Wait until every queued job has finished; returns True if they did"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+
+def wants_async():
+    """True if the client asked for the 'accept now, process later' mode"""
+    return ('respond-async' in request.headers.get('Prefer', '')
+            or request.args.get('async') in ('1', 'true'))
+
+
+def job_accepted(job):
+    """202 pointing at the job's status URL"""
+    location = url_for('job_status', job_id=job.id)
+    response = jsonify({
+        'status': 'accepted',
+        'message': 'Queued for processing',
+        'job_id': job.id,
+        'status_url': location
+    })
+    response.status_code = 202
+    response.headers['Location'] = location
+    response.headers['Preference-Applied'] = 'respond-async'
+    return response
+
+
+def queue_full():
+    """503 for when the job queue cannot take more work"""
+    response = jsonify({
+        'status': 'error',
+        'message': 'Too many queued jobs, retry later'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def setup_jobs(app, jobs=None):
+    """Add a job queue and GET /api/jobs/<id> to an app"""
+    if jobs is None:
+        jobs = JobQueue()
+
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        """Status (and, when done, result or error) of a background job"""
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Job not found'
+            }), 404
+        return jsonify({
+            'status': 'success',
+            'job': job.to_dict()
+        }), 200
+
+    metrics = app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.add_counter('jobs_completed_total', 'Background jobs that succeeded.',
+                            lambda: jobs.completed)
+        metrics.add_counter('jobs_failed_total', 'Background jobs that failed after retries.',
+                            lambda: jobs.failed)
+        metrics.add_counter('jobs_rejected_total', 'Jobs refused because the queue was full.',
+                            lambda: jobs.rejected)
+
+    jobs.app = app
+    app.extensions['jobs'] = jobs
+    return jobs
@@ -0,0 +1,109 @@
+"""
+Flask Lab Project - JSON serialization
+A Flask JSON provider that uses orjson when it is installed and falls back
+to the standard library otherwise, plus pre-encoded responses for payloads
+that never change.
+"""
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+from http_cache import make_etag, not_modified
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson, with a stdlib json fallback"""
+
+    compact = True  # no indentation or spaces, even in debug mode
+
+    def __init__(self, app, use_orjson=True):
+        super().__init__(app)
+        self.use_orjson = use_orjson and orjson is not None
+
+    def _orjson_option(self, indent=False):
+        """orjson flags matching this provider's settings"""
+        # Dates and dataclasses go through self.default like Flask's provider
+        option = (orjson.OPT_NON_STR_KEYS
+                  | orjson.OPT_PASSTHROUGH_DATETIME
+                  | orjson.OPT_PASSTHROUGH_DATACLASS)
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, indent=False):
+        """Serialize data as UTF-8 encoded JSON bytes"""
+        if self.use_orjson:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_option(indent))
+            except orjson.JSONEncodeError:
+                pass  # e.g. integers beyond 64 bits; let the stdlib handle it
+
+        if indent:
+            return super().dumps(obj, indent=2).encode('utf-8')
+        return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        """Serialize data as a JSON string"""
+        if self.use_orjson and not kwargs:
+            return self.dumps_bytes(obj).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        """Deserialize JSON from a string or bytes"""
+        if self.use_orjson and not kwargs:
+            try:
+                return orjson.loads(s)
+            except orjson.JSONDecodeError:
+                pass  # NaN, huge integers, ...; the stdlib decides
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Build a JSON response without an intermediate str"""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumps_bytes(obj, indent), mimetype=self.mimetype)
+
+
+class StaticJSONResponse:
+    """A JSON payload that is encoded once and then served as bytes (with an ETag)"""
+
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status = status
+        self.body = None
+
+    def _encode(self):
+        """Encode the payload with the current app's provider"""
+        provider = current_app.json
+        if hasattr(provider, 'dumps_bytes'):
+            self.body = provider.dumps_bytes(self.payload)
+        else:
+            self.body = provider.dumps(self.payload).encode('utf-8')
+        self.mimetype = provider.mimetype
+        self.response_class = current_app.response_class
+        self.etag = make_etag(self.body)
+
+    def __call__(self):
+        """Return a fresh response (or a 304) for the current request"""
+        if self.body is None:
+            self._encode()
+        if request.if_none_match.contains_weak(self.etag):
+            return not_modified(self.etag)
+
+        response = self.response_class(self.body, status=self.status, mimetype=self.mimetype)
+        response.set_etag(self.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+def setup_json_provider(app, encoder='auto'):
+    """Install FastJSONProvider on an app ('stdlib' disables orjson)"""
+    app.json = FastJSONProvider(app, use_orjson=encoder != 'stdlib')
+    return app.json
@@ -0,0 +1,294 @@
+"""
+Flask Lab Project - Request metrics
+Per-route request counts and latency histograms, recorded by
+before_request/after_request hooks and exposed at /metrics in the
+Prometheus text format.
+
+Latencies go into log-linear (HDR-style) histograms: fixed buckets with a
+bounded relative error, so histograms from several processes can be added
+up and p50/p95/p99 computed from the sum. Under gunicorn every worker
+writes its totals to METRICS_DIR at most once per flush interval; /metrics
+merges the files of all live workers (so other workers' numbers can be up
+to one interval old). gunicorn removes an exited worker's file (see
+gunicorn.conf.py), and files of processes that are gone are skipped.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+import weakref
+
+from flask import g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """Log-linear histogram of durations in seconds (buckets within 12.5%)"""
+
+    SUB_BUCKETS = 8      # per power of two
+    MIN_EXPONENT = -19   # 2**-20 s, about 1 microsecond
+    MAX_EXPONENT = 7     # 2**7 s; anything longer lands in the last bucket
+    SIZE = (MAX_EXPONENT - MIN_EXPONENT + 1) * SUB_BUCKETS
+    SCALE = 2 * SUB_BUCKETS
+
+    # Prometheus 'le' bounds: every power of two from ~15 us to 32 s
+    EXPORT_EXPONENTS = range(-16, 6)
+
+    def __init__(self):
+        self.counts = [0] * self.SIZE
+        self.count = 0
+        self.sum = 0.0
+
+    @classmethod
+    def bucket(cls, seconds, frexp=math.frexp):
+        """Index of the bucket holding a duration"""
+        if seconds <= 0:
+            return 0
+        mantissa, exponent = frexp(seconds)  # mantissa in [0.5, 1)
+        index = (exponent - cls.MIN_EXPONENT - 1) * cls.SUB_BUCKETS + int(mantissa * cls.SCALE)
+        if index < 0:
+            return 0
+        return index if index < cls.SIZE else cls.SIZE - 1
+
+    @classmethod
+    def upper_bound(cls, index):
+        """Largest duration a bucket can hold"""
+        exponent, sub = divmod(index, cls.SUB_BUCKETS)
+        return (0.5 + (sub + 1) / (2 * cls.SUB_BUCKETS)) * 2.0 ** (exponent + cls.MIN_EXPONENT)
+
+    def record(self, seconds):
+        """Add one duration (caller holds the lock)"""
+        self.counts[self.bucket(seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def merge(self, counts, count, total):
+        """Add another histogram's buckets (sparse {index: n} or a list)"""
+        items = counts.items() if isinstance(counts, dict) else enumerate(counts)
+        for index, n in items:
+            self.counts[int(index)] += n
+        self.count += count
+        self.sum += total
+
+    def quantile(self, q):
+        """Upper bound of the bucket containing the q-th quantile"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.upper_bound(index)
+        return self.upper_bound(self.SIZE - 1)
+
+    def cumulative(self):
+        """Yield (le, cumulative count) at the exported bounds"""
+        seen = 0
+        index = 0
+        for exponent in self.EXPORT_EXPONENTS:
+            # Buckets of exponent e hold values in [2**(e-1), 2**e)
+            end = (exponent - self.MIN_EXPONENT + 1) * self.SUB_BUCKETS
+            while index < end:
+                seen += self.counts[index]
+                index += 1
+            yield 2.0 ** exponent, seen
+
+    def sparse(self):
+        """Non-empty buckets as {index: n}, for the worker files"""
+        return {index: n for index, n in enumerate(self.counts) if n}
+
+
+def escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Request counters and latency histograms for one process"""
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.counters = {}   # name -> (help, callable), e.g. from structured_log.py
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one writer of this process's file at a time
+        self._reset()
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # A forked worker starts from zero and writes its own file
+        def reset_in_child(ref=weakref.ref(self)):
+            metrics = ref()
+            if metrics is not None:
+                metrics._lock = threading.Lock()
+                metrics._flush_lock = threading.Lock()
+                metrics._reset()
+        os.register_at_fork(after_in_child=reset_in_child)
+
+    def _reset(self):
+        """Start from empty totals"""
+        self.requests = {}   # (route, method, status) -> count
+        self.latency = {}    # (route, method) -> LatencyHistogram
+        self._last_flush = time.monotonic()
+
+    def observe(self, route, method, status, seconds):
+        """Record one finished request"""
+        with self._lock:
+            histogram = self.latency.get((route, method))
+            if histogram is None:
+                histogram = self.latency[(route, method)] = LatencyHistogram()
+            histogram.record(seconds)
+            series = (route, method, status)
+            self.requests[series] = self.requests.get(series, 0) + 1
+
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def add_counter(self, name, help_text, value):
+        """Export another per-process counter, summed over workers"""
+        self.counters[name] = (help_text, value)
+
+    def snapshot(self):
+        """JSON-serializable totals of this process"""
+        with self._lock:
+            return {
+                'requests': [[route, method, status, n]
+                             for (route, method, status), n in self.requests.items()],
+                'latency': [[route, method, h.count, h.sum, h.sparse()]
+                            for (route, method), h in self.latency.items()],
+                'counters': {name: value() for name, (_, value) in self.counters.items()}
+            }
+
+    def path(self, pid=None):
+        """File holding a worker's totals"""
+        return os.path.join(self.directory, f'metrics-{pid or os.getpid()}.json')
+
+    def flush(self):
+        """Write this process's totals for the other workers to read"""
+        self._last_flush = time.monotonic()
+        path = self.path()
+        tmp_path = f'{path}.tmp'
+        with self._flush_lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+
+    def collect(self):
+        """Merge the totals of every worker: (requests, latency, counters)"""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = os.path.basename(self.path())
+            for name in os.listdir(self.directory):
+                if (name.startswith('metrics-') and name.endswith('.json') and name != own
+                        and process_alive(name[len('metrics-'):-len('.json')])):
+                    try:
+                        with open(os.path.join(self.directory, name)) as f:
+                            snapshots.append(json.load(f))
+                    except (OSError, ValueError):
+                        continue  # a worker is replacing its file
+
+        requests = {}
+        latency = {}
+        counters = {}
+        for snapshot in snapshots:
+            for name, n in snapshot.get('counters', {}).items():
+                counters[name] = counters.get(name, 0) + n
+            for route, method, status, n in snapshot['requests']:
+                key = (route, method, status)
+                requests[key] = requests.get(key, 0) + n
+            for route, method, count, total, counts in snapshot['latency']:
+                histogram = latency.get((route, method))
+                if histogram is None:
+                    histogram = latency[(route, method)] = LatencyHistogram()
+                histogram.merge(counts, count, total)
+        return requests, latency, counters
+
+    def render(self):
+        """All workers' metrics in the Prometheus text format"""
+        requests, latency, counters = self.collect()
+        lines = [
+            '# HELP http_requests_total Requests handled, by route, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        for (route, method, status), n in sorted(requests.items()):
+            lines.append(f'http_requests_total{{route="{escape(route)}",method="{method}",'
+                         f'status="{status}"}} {n}')
+
+        lines += [
+            '# HELP http_request_duration_seconds Request latency, by route and method.',
+            '# TYPE http_request_duration_seconds histogram',
+        ]
+        for (route, method), histogram in sorted(latency.items()):
+            labels = f'route="{escape(route)}",method="{method}"'
+            for le, n in histogram.cumulative():
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{le:g}"}} {n}')
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'http_request_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+            lines.append(f'http_request_duration_seconds_count{{{labels}}} {histogram.count}')
+
+        lines += [
+            '# HELP http_request_duration_quantile_seconds Latency quantiles over all workers.',
+            '# TYPE http_request_duration_quantile_seconds gauge',
+        ]
+        for (route, method), histogram in sorted(latency.items()):
+            labels = f'route="{escape(route)}",method="{method}"'
+            for q in QUANTILES:
+                lines.append(f'http_request_duration_quantile_seconds{{{labels},quantile="{q}"}} '
+                             f'{histogram.quantile(q):.6f}')
+
+        for name, n in sorted(counters.items()):
+            help_text = self.counters[name][0] if name in self.counters else name
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter', f'{name} {n}']
+        return '\n'.join(lines) + '\n'
+
+
+def process_alive(pid):
+    """Whether a process id (as in a file name) belongs to a running process"""
+    try:
+        os.kill(int(pid), 0)
+    except (ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True  # running, as another user
+    return True
+
+
+def remove_worker_file(directory, pid):
+    """Forget an exited worker's totals (gunicorn's child_exit hook)"""
+    try:
+        os.remove(os.path.join(directory, f'metrics-{pid}.json'))
+    except FileNotFoundError:
+        pass
+
+
+def setup_metrics(app, directory=None, flush_interval=1.0):
+    """Record every request of an app and serve the totals at /metrics"""
+    metrics = Metrics(directory, flush_interval)
+    clock = time.perf_counter
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = clock()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get('metrics_start')
+        if start is not None:
+            rule = request.url_rule
+            metrics.observe(rule.rule if rule is not None else '<unmatched>',
+                            request.method, response.status_code, clock() - start)
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Request metrics of all workers in the Prometheus text format"""
+        return app.response_class(metrics.render(), content_type=CONTENT_TYPE)
+
+    app.extensions['metrics'] = metrics
+    return metrics
@@ -0,0 +1,194 @@
+"""
+Flask Lab Project - Profiling
+Two opt-in tools for finding where request time goes in production:
+
+- a statistical sampler that records the stack of every thread at a fixed
+  interval for N seconds and returns collapsed stacks (one line per stack,
+  "outer;inner;leaf count"), the input format of flamegraph.pl/speedscope
+- per-request cProfile capture for requests that carry the X-Profile
+  header (and pass the same authorization as the admin routes); the last
+  few reports can be fetched by id
+
+Nothing is recorded unless one of the endpoints is used, and cProfile and
+pstats are not even imported until a request asks for a report.
+"""
+
+import io
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from flask import g, jsonify, request
+
+MAX_SECONDS = 30
+PROFILE_HEADER = 'X-Profile'
+
+
+def frame_label(code):
+    """How a frame appears in collapsed stacks"""
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Periodically sample the stacks of all other threads"""
+
+    def __init__(self, interval=0.005, max_depth=128):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._labels = {}  # code object -> label, formatted once
+        self._busy = threading.Lock()
+
+    def sample(self, counts, skip):
+        """Add one sample of every thread (except those in skip) to counts"""
+        labels = self._labels
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in skip:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            stack.reverse()
+            counts[';'.join(stack)] += 1
+
+    def run(self, seconds, interval=None):
+        """Sample for a number of seconds: (Counter of stacks, samples taken)
+
+        Returns None if another sampling session is already running.
+        """
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            interval = min(interval or self.interval, seconds)  # never sleep past the end
+            counts = Counter()
+            skip = {threading.get_ident()}
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self.sample(counts, skip)
+                samples += 1
+                time.sleep(interval)
+            return counts, samples
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def collapse(counts):
+        """Collapsed-stack text, most frequent stacks first"""
+        return ''.join(f'{stack} {n}\n' for stack, n in counts.most_common())
+
+
+class RequestProfiles:
+    """The last few per-request cProfile reports"""
+
+    def __init__(self, keep=20):
+        self.reports = deque(maxlen=keep)  # dicts with id, method, path, ..., report
+        self._ids = itertools.count(1)
+
+    def add(self, profile, status, duration):
+        """Format a finished profile and keep it; returns its id"""
+        import pstats
+        
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(40)
+        report_id = next(self._ids)
+        self.reports.append({
+            'id': report_id,
+            'method': request.method,
+            'path': request.path,
+            'status': status,
+            'duration_ms': round(duration * 1000, 3),
+            'report': stream.getvalue()
+        })
+        return report_id
+
+    def get(self, report_id):
+        """A stored report, or None once it has been pushed out"""
+        for report in self.reports:
+            if report['id'] == report_id:
+                return report
+        return None
+
+
+def setup_profiling(app, protect, authorize, sampler=None, keep=20):
+    """Add the profiling endpoints and X-Profile capture to an app
+
+    protect decorates the endpoints (e.g. require_api_key) and authorize()
+    decides whether a request may ask for a cProfile report.
+    """
+    sampler = sampler or StackSampler()
+    profiles = RequestProfiles(keep)
+
+    @app.before_request
+    def start_request_profile():
+        if PROFILE_HEADER in request.headers and authorize():
+            import cProfile
+            
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                return  # another profiler is active in this process
+            g.request_profile = (profile, time.perf_counter())
+
+    @app.after_request
+    def finish_request_profile(response):
+        started = g.pop('request_profile', None)
+        if started is not None:
+            profile, start = started
+            profile.disable()
+            report_id = profiles.add(profile, response.status_code, time.perf_counter() - start)
+            response.headers['X-Profile-Id'] = str(report_id)
+        return response
+
+    @app.route('/api/admin/profile', methods=['GET'])
+    @protect
+    def sample_stacks():
+        """Sample all threads for ?seconds= and return collapsed stacks"""
+        seconds = min(max(request.args.get('seconds', 5, type=float), 0.1), MAX_SECONDS)
+        interval_ms = min(max(request.args.get('interval_ms', sampler.interval * 1000, type=float), 1),
+                          seconds * 1000)
+
+        result = sampler.run(seconds, interval_ms / 1000)
+        if result is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'A profiling session is already running'
+            }), 409
+
+        counts, samples = result
+        response = app.response_class(sampler.collapse(counts), mimetype='text/plain')
+        response.headers['X-Profile-Samples'] = str(samples)
+        return response
+
+    @app.route('/api/admin/profile/requests', methods=['GET'])
+    @protect
+    def list_request_profiles():
+        """Recent per-request cProfile reports (without the report text)"""
+        return jsonify({
+            'status': 'success',
+            'profiles': [{key: value for key, value in report.items() if key != 'report'}
+                         for report in profiles.reports]
+        }), 200
+
+    @app.route('/api/admin/profile/requests/<int:report_id>', methods=['GET'])
+    @protect
+    def get_request_profile(report_id):
+        """One cProfile report as pstats text"""
+        report = profiles.get(report_id)
+        if report is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Profile not found'
+            }), 404
+        return app.response_class(report['report'], mimetype='text/plain')
+
+    app.extensions['profiling'] = (sampler, profiles)
+    return sampler, profiles
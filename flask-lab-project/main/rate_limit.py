@@ -0,0 +1,241 @@
+"""
+Flask Lab Project - Rate limiting
+Token buckets keyed by client (verified API key, else IP address) and route. Each
+check is O(1): refill the bucket by the time elapsed since its last use,
+then take one token. A client that runs out gets 429 with Retry-After.
+
+Two bucket stores:
+- LocalBuckets: an LRU dict for one process, bounded in size; buckets
+  idle long enough to be full again are dropped (they equal new ones)
+- SharedBuckets: a fixed-size table in a memory-mapped file shared by all
+  gunicorn workers; the table is split into stripes, each guarded by a
+  byte-range lock, so workers only contend on the same stripe; the file
+  can outlive a reboot, so it is stamped with wall-clock time
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, jsonify, request
+
+
+class LocalBuckets:
+    """Token buckets of one process in a bounded LRU dict"""
+
+    clock = time.monotonic  # the "now" that RateLimiter passes to take()
+
+    def __init__(self, max_buckets=100000, idle_timeout=300.0):
+        self.max_buckets = max_buckets
+        self.idle_timeout = idle_timeout
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, rate, burst, now):
+        """Take one token: (allowed, tokens left)"""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now]
+                self._evict(now)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, bucket[0]
+            return False, bucket[0]
+
+    def _evict(self, now):
+        """Drop least recently used buckets that are idle or over the limit"""
+        buckets = self._buckets
+        while len(buckets) > self.max_buckets:
+            buckets.popitem(last=False)
+        # Amortized O(1): at most a couple of idle buckets per new one
+        for _ in range(2):
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket[1] < self.idle_timeout:
+                break
+            del buckets[key]
+
+
+class SharedBuckets:
+    """Token buckets in a memory-mapped table shared between processes"""
+
+    SLOT = struct.Struct('<Qdd8x')  # key hash (0 = empty), tokens, last refill
+    STRIPE = 64                     # slots per lock stripe (probing stays inside)
+
+    # monotonic() restarts with each boot while the file persists: wall-clock
+    # stamps stay comparable (take() clamps the elapsed time if they step back)
+    clock = time.time
+
+    def __init__(self, path, slots=65536, idle_timeout=300.0):
+        self.path = path
+        self.stripes = max(1, slots // self.STRIPE)
+        self.slots = self.stripes * self.STRIPE
+        self.idle_timeout = idle_timeout
+        size = self.slots * self.SLOT.size
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)  # new space reads as empty slots
+        self.mm = mmap.mmap(self.fd, size)
+        # Byte-range locks only exclude other processes; threads need these
+        self._locks = [threading.Lock() for _ in range(min(self.stripes, 64))]
+
+    @staticmethod
+    def key_hash(key):
+        """Stable 64-bit hash of a key (Python's hash() differs per process)"""
+        value = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+        return value or 1
+
+    def take(self, key, rate, burst, now):
+        """Take one token: (allowed, tokens left)"""
+        hashed = self.key_hash(key)
+        home = hashed % self.slots
+        stripe = home // self.STRIPE
+        base = stripe * self.STRIPE
+        offset = base * self.SLOT.size
+        length = self.STRIPE * self.SLOT.size
+
+        with self._locks[stripe % len(self._locks)]:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, length, offset)
+            try:
+                slot, tokens, updated = self._find(hashed, base, home - base, now)
+                if tokens is None:
+                    tokens = float(burst)
+                else:
+                    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self.SLOT.pack_into(self.mm, slot * self.SLOT.size, hashed, tokens, now)
+                return allowed, tokens
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, length, offset)
+
+    def _find(self, hashed, base, start, now):
+        """Locate a key's slot within its stripe: (slot, tokens, updated)
+
+        tokens is None when the key is new; its slot is then an empty one,
+        an idle one (or one stamped in the future: the clock stepped back),
+        or failing both the least recently used in the stripe.
+        """
+        unpack = self.SLOT.unpack_from
+        mm = self.mm
+        free = None
+        oldest = None
+        for probe in range(self.STRIPE):
+            slot = base + (start + probe) % self.STRIPE
+            stored, tokens, updated = unpack(mm, slot * self.SLOT.size)
+            if stored == hashed:
+                return slot, tokens, updated
+            if stored == 0:
+                return (slot if free is None else free), None, None
+            if free is None and not 0 <= now - updated < self.idle_timeout:
+                free = slot
+            if oldest is None or updated < oldest[1]:
+                oldest = (slot, updated)
+        return (free if free is not None else oldest[0]), None, None
+
+
+def client_identity():
+    """Who a request is counted against: its verified API key, else its address
+
+    Keys are checked against app.extensions['api_keys'] (see api_keys.py) and
+    counted by entry name, never by the secret. An unknown key counts as its
+    address: otherwise a new random key per request would get a fresh bucket
+    each time, and flood the bucket store.
+    """
+    api_key = request.headers.get('X-API-Key')
+    keys = current_app.extensions.get('api_keys')
+    if api_key and keys is not None:
+        name = keys.verify(api_key)
+        if name is not None:
+            return f'key:{name}'
+    return f'ip:{request.remote_addr}'
+
+
+class RateLimiter:
+    """Token-bucket limits per client and route"""
+
+    def __init__(self, default=(100.0, 200), routes=None, store=None, exempt=()):
+        self.default = default          # (tokens per second, burst size)
+        self.routes = dict(routes or {})  # route rule -> (rate, burst), None for no limit
+        self.store = store if store is not None else LocalBuckets()
+        self.exempt = set(exempt)
+        self.limited = 0
+
+    def limit_for(self, route):
+        """(rate, burst) for a route, or None if it is not limited"""
+        if route in self.exempt:
+            return None
+        return self.routes.get(route, self.default)
+
+    def check(self, identity, route, now=None):
+        """(allowed, remaining tokens, seconds until the next token, limit)"""
+        limit = self.limit_for(route)
+        if limit is None:
+            return True, None, 0.0, None
+        rate, burst = limit
+        allowed, tokens = self.store.take(f'{identity}|{route}', rate, burst,
+                                          self.store.clock() if now is None else now)
+        if allowed:
+            return True, int(tokens), 0.0, limit
+        self.limited += 1
+        return False, 0, (1 - tokens) / rate, limit
+
+
+def setup_rate_limit(app, limiter):
+    """Reject requests over their client's limit with 429 and Retry-After"""
+
+    @app.before_request
+    def enforce_rate_limit():
+        if not app.config.get('RATELIMIT_ENABLED', True):
+            return None
+        rule = request.url_rule
+        route = rule.rule if rule is not None else '<unmatched>'
+        allowed, remaining, retry_after, limit = limiter.check(client_identity(), route)
+        if limit is None:
+            return None
+        if allowed:
+            g.rate_limit = (limit, remaining)
+            return None
+
+        response = jsonify({
+            'status': 'error',
+            'message': 'Rate limit exceeded, retry later'
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        response.headers['X-RateLimit-Limit'] = str(limit[1])
+        response.headers['X-RateLimit-Remaining'] = '0'
+        return response
+
+    @app.after_request
+    def rate_limit_headers(response):
+        state = g.pop('rate_limit', None)
+        if state is not None:
+            response.headers['X-RateLimit-Limit'] = str(state[0][1])
+            response.headers['X-RateLimit-Remaining'] = str(state[1])
+        return response
+
+    metrics = app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.add_counter('rate_limited_requests_total', 'Requests rejected with 429.',
+                            lambda: limiter.limited)
+
+    app.extensions['rate_limit'] = limiter
+    return limiter
@@ -0,0 +1,114 @@
+"""
+Flask Lab Project - Template render cache
+Pages whose HTML depends only on the context they are given (such as the
+homepage) are rendered once and then served as bytes. Templates are
+compiled at startup, rendered output is cached by template name and a
+hash of the context, and every response carries an ETag and Last-Modified
+so browsers can revalidate with a 304.
+
+The ETag is a hash of the HTML itself, so all workers agree on it. When
+Jinja auto-reloads templates (debug mode), a changed template file is
+re-rendered on its next request.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import render_template, request
+from werkzeug.http import http_date, quote_etag
+
+from http_cache import not_modified
+
+
+def context_key(context):
+    """Stable hash of a render context ('' for none)"""
+    if not context:
+        return ''
+    encoded = json.dumps(context, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(encoded.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class RenderedPage:
+    """One rendered template: body, validators and the template it came from"""
+
+    __slots__ = ('body', 'etag', 'last_modified', 'headers', 'template')
+
+    def __init__(self, body, template):
+        self.body = body
+        self.etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.template = template
+        mtime = os.path.getmtime(template.filename) if template.filename else time.time()
+        self.last_modified = datetime.fromtimestamp(int(mtime), timezone.utc)
+        # Header values formatted once, not per response
+        self.headers = [
+            ('ETag', quote_etag(self.etag)),
+            ('Last-Modified', http_date(self.last_modified)),
+            ('Cache-Control', 'no-cache')
+        ]
+
+
+class RenderCache:
+    """Rendered templates kept as bytes, keyed by template name and context
+
+    At most max_entries pages are kept; the least recently used goes first.
+    """
+
+    def __init__(self, app, preload=(), max_entries=128):
+        self.app = app
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._pages = OrderedDict()  # (name, context key) -> RenderedPage
+        self._lock = threading.Lock()
+        for name in preload:
+            app.jinja_env.get_template(name)  # compile now, not on the first request
+
+    def page(self, name, /, **context):
+        """The rendered page, rendering it only when not cached (or stale)"""
+        key = (name, context_key(context))
+        page = self._pages.get(key)
+        if page is not None and self.app.jinja_env.auto_reload and not page.template.is_up_to_date:
+            page = None
+        if page is not None:
+            with self._lock:
+                if key in self._pages:  # unless evicted meanwhile
+                    self._pages.move_to_end(key)  # least recently used goes first
+            self.hits += 1
+            return page
+
+        self.misses += 1
+        template = self.app.jinja_env.get_template(name)
+        page = RenderedPage(render_template(template, **context).encode('utf-8'), template)
+        with self._lock:
+            self._pages[key] = page
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
+
+    def response(self, name, /, **context):
+        """Serve a cached page, or a 304 if the client's copy is current"""
+        page = self.page(name, **context)
+        if request.if_none_match:
+            if request.if_none_match.contains_weak(page.etag):
+                return self._not_modified(page)
+        elif request.if_modified_since and page.last_modified <= request.if_modified_since:
+            return self._not_modified(page)
+
+        return self.app.response_class(page.body, mimetype='text/html', headers=page.headers)
+
+    @staticmethod
+    def _not_modified(page):
+        """304 carrying the page's validators"""
+        response = not_modified(page.etag)
+        response.last_modified = page.last_modified
+        return response
+
+    def clear(self):
+        """Forget every rendered page (e.g. after changing a template's data)"""
+        with self._lock:
+            self._pages.clear()
@@ -0,0 +1,147 @@
+"""
+Flask Lab Project - Static assets
+A build step that copies every file under static/ to static/dist/ with a
+content hash in its name (style.css -> style.1a2b3c4d5e6f.css), next to
+gzip and brotli versions compressed once at maximum level, plus a
+manifest.json mapping original names to hashed ones.
+
+At runtime url_for('static', filename='style.css') returns the hashed URL
+when the manifest lists the file. A hashed file never changes, so it is
+served with a one-year immutable Cache-Control, in the best pre-compressed
+variant the client accepts. Files are sent with send_file, which hands
+them to the server's wsgi.file_wrapper (sendfile(2) under gunicorn)
+instead of copying them through Python. Without a build, static files are
+served as before.
+
+Build (the Dockerfile runs this):
+    python static_assets.py [--static static]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+
+from flask import send_from_directory
+
+from compression import brotli, choose_encoding, is_compressible
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+MIN_COMPRESS_SIZE = 256
+ONE_YEAR = 365 * 24 * 3600
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def hashed_name(path, data):
+    """name.<hash>.ext for a file's contents"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.{hashlib.blake2b(data, digest_size=6).hexdigest()}{ext}'
+
+
+def build(static_folder):
+    """Write static/dist/ with hashed and pre-compressed files; returns the manifest"""
+    output = os.path.join(static_folder, DIST)
+    if os.path.exists(os.path.join(output, MANIFEST)):
+        shutil.rmtree(output)  # a previous build; stale hashes would pile up
+
+    manifest = {}
+    for directory, subdirectories, files in os.walk(static_folder):
+        if os.path.abspath(directory) == os.path.abspath(static_folder):
+            subdirectories[:] = [name for name in subdirectories if name != DIST]
+        for name in files:
+            source = os.path.join(directory, name)
+            relative = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+
+            target_name = hashed_name(relative, data)
+            target = os.path.join(output, target_name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            manifest[relative] = target_name
+
+            mimetype = mimetypes.guess_type(name)[0] or ''
+            if len(data) < MIN_COMPRESS_SIZE or not is_compressible(mimetype):
+                continue
+            variants = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['br'] = brotli.compress(data, quality=11)
+            for encoding, body in variants.items():
+                if len(body) < len(data):
+                    with open(target + SUFFIXES[encoding], 'wb') as f:
+                        f.write(body)
+
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def setup_static_assets(app):
+    """Serve the built assets of an app's static folder, if there are any"""
+    output = os.path.join(app.static_folder, DIST)
+    try:
+        with open(os.path.join(output, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+
+    # Which pre-compressed variants exist, checked once rather than per request
+    variants = {}
+    for target_name in manifest.values():
+        path = os.path.join(output, target_name)
+        variants[f'{DIST}/{target_name}'] = tuple(
+            encoding for encoding in ('br', 'gzip') if os.path.exists(path + SUFFIXES[encoding]))
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static':
+            target_name = manifest.get(values.get('filename'))
+            if target_name is not None:
+                values['filename'] = f'{DIST}/{target_name}'
+
+    static_view = app.view_functions['static']
+
+    def serve_static(filename):
+        encodings = variants.get(filename)
+        if encodings is None:
+            return static_view(filename=filename)
+
+        encoding = choose_encoding(encodings)
+        response = send_from_directory(
+            app.static_folder,
+            filename + SUFFIXES[encoding] if encoding else filename,
+            mimetype=mimetypes.guess_type(filename)[0],
+            max_age=ONE_YEAR
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if encodings:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions['static'] = serve_static
+    app.extensions['static_assets'] = manifest
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build hashed, pre-compressed static assets')
+    parser.add_argument('--static', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    args = parser.parse_args()
+
+    manifest = build(args.static)
+    for original, target_name in sorted(manifest.items()):
+        print(f'{original} -> {DIST}/{target_name}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
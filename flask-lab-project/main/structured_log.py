@@ -0,0 +1,206 @@
+"""
+Flask Lab Project - Structured logging
+JSON-lines logging that never blocks a request. The request thread only
+appends a tuple to a queue; a background thread adds the timestamp text,
+encodes the records and writes them in batches with one write() call.
+When the queue is full, records are dropped and counted instead of making
+the request wait, and high-volume routes can be sampled (keep 1 in N).
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+
+from flask import g, request
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+_loggers = weakref.WeakSet()
+
+
+class StructuredLogger:
+    """Queue-based JSON-lines logger with a background writer thread"""
+
+    def __init__(self, stream=None, max_queue=10000, batch_size=512,
+                 flush_interval=0.1, sample_rates=None):
+        self.stream = stream                  # None means sys.stdout at write time
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rates = dict(sample_rates or {})  # route -> keep 1 in N
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self._start_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reset()
+        _loggers.add(self)
+
+    def _reset(self):
+        """Fresh queue and no writer thread (also after a fork)"""
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._seen = {}       # route -> requests seen, for sampling
+        self._thread = None
+        self._pid = os.getpid()
+        self._closed = False
+
+    def log(self, level, event, **fields):
+        """Queue one record; returns False if it was dropped"""
+        if self._thread is None or self._pid != os.getpid():
+            self._start()
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return False
+
+        self._queue.append((time.time(), level, event, fields))
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def info(self, event, **fields):
+        """Queue an info record"""
+        return self.log('info', event, **fields)
+
+    def warning(self, event, **fields):
+        """Queue a warning record"""
+        return self.log('warning', event, **fields)
+
+    def error(self, event, **fields):
+        """Queue an error record"""
+        return self.log('error', event, **fields)
+
+    def sample(self, route):
+        """True if this request of the route should be logged"""
+        rate = self.sample_rates.get(route)
+        if not rate or rate <= 1:
+            return True
+        seen = self._seen.get(route, 0) + 1
+        self._seen[route] = seen
+        if seen % rate:
+            self.sampled_out += 1
+            return False
+        return True
+
+    def _start(self):
+        """Start the writer thread (again, in a forked child)"""
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._reset()  # the parent writes what it had queued
+                self.written = self.dropped = self.sampled_out = 0
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='structured-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Writer loop: flush every interval, or sooner when a batch is full"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    @staticmethod
+    def format(record):
+        """One JSON line for a queued record"""
+        timestamp, level, event, fields = record
+        entry = {
+            'ts': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': level,
+            'event': event,
+        }
+        entry.update(fields)
+        if orjson is not None:
+            try:
+                return orjson.dumps(entry, default=str).decode('utf-8') + '\n'
+            except TypeError:
+                pass  # e.g. non-string keys; the stdlib copes
+        return json.dumps(entry, separators=(',', ':'), default=str) + '\n'
+
+    def flush(self):
+        """Write everything queued so far"""
+        with self._write_lock:
+            stream = self.stream or sys.stdout
+            while self._queue:
+                batch = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                try:
+                    stream.write(''.join(map(self.format, batch)))
+                    stream.flush()
+                    self.written += len(batch)
+                except (OSError, ValueError):
+                    self.dropped += len(batch)  # closed or broken stream
+
+    def close(self):
+        """Stop the writer thread and write what is left"""
+        self._closed = True
+        self._wakeup.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        self.flush()
+
+
+def close_all():
+    """Flush every logger; registered to run at interpreter exit"""
+    for logger in list(_loggers):
+        logger.close()
+
+
+atexit.register(close_all)
+
+default_logger = StructuredLogger()
+
+
+def setup_logging(app, logger=None, sample_rates=None):
+    """Log every request of an app (and unhandled errors) as JSON lines"""
+    logger = logger or default_logger
+    if sample_rates:
+        logger.sample_rates.update(sample_rates)
+    clock = time.perf_counter
+
+    @app.before_request
+    def start_log_timer():
+        g.log_start = clock()
+
+    @app.after_request
+    def log_request(response):
+        rule = request.url_rule
+        route = rule.rule if rule is not None else '<unmatched>'
+        if logger.sample(route):
+            start = g.get('log_start')
+            logger.info(
+                'request',
+                route=route,
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+                duration_ms=round((clock() - start) * 1000, 3) if start is not None else None,
+                remote=request.remote_addr
+            )
+        return response
+
+    @app.teardown_request
+    def log_exception(error):
+        if error is not None:
+            logger.error('unhandled_exception', path=request.path, error=repr(error))
+
+    metrics = app.extensions.get('metrics')
+    if metrics is not None:
+        metrics.add_counter('log_records_written_total', 'Log records written.', lambda: logger.written)
+        metrics.add_counter('log_records_dropped_total', 'Log records dropped (queue full).',
+                            lambda: logger.dropped)
+        metrics.add_counter('log_records_sampled_out_total', 'Request logs skipped by sampling.',
+                            lambda: logger.sampled_out)
+
+    app.extensions['structured_log'] = logger
+    return logger
@@ -0,0 +1,1034 @@
+"""
+Backend Tests - Member 1
+Tests for the routes and helpers in member1_backend/backend_examples.py
+"""
+
+import pytest
+import json
+import sys
+import os
+
+# Add backend directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'member1_backend')))
+
+from flask import Flask, jsonify
+from backend_examples import (
+    create_user_routes, create_advanced_routes, create_profiling_routes, DataProcessor,
+    RunningStatistics, SearchIndex, Collection, DatabaseHelper, MessageRecord, UserRecord
+)
+from persistence import Persistence, WriteAheadLog
+from shared_store import SharedStore
+from profiling import StackSampler
+from events import EventBroker
+
+
+@pytest.fixture
+def client():
+    """Create a test client for an app with the backend routes"""
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    create_user_routes(app)
+    create_advanced_routes(app)
+    with app.test_client() as client:
+        yield client
+
+
+def post_message(client, name, message):
+    """Helper to create a message through the API"""
+    return client.post('/api/messages',
+                       data=json.dumps({'name': name, 'message': message}),
+                       content_type='application/json')
+
+
+# ============================================
+# Search Index
+# ============================================
+
+class TestSearchIndex:
+    """Test the inverted index used by message search"""
+    
+    def test_term_and_prefix_queries(self):
+        """Test exact term and prefix matching"""
+        index = SearchIndex()
+        index.add(1, 'Alice', 'Hello world')
+        index.add(2, 'Bob', 'Help wanted')
+        
+        total, hits = index.search('hello', prefix=False)
+        assert total == 1
+        assert hits[0][0] == 1
+        assert index.search('hel', prefix=False)[0] == 0
+        assert index.search('hel')[0] == 2
+    
+    def test_all_terms_must_match(self):
+        """Test that multi-term queries intersect postings"""
+        index = SearchIndex()
+        index.add(1, 'Alice', 'Hello world')
+        index.add(2, 'Bob', 'Hello there')
+        
+        total, hits = index.search('hello bob')
+        assert total == 1
+        assert hits[0][0] == 2
+    
+    def test_ranking_and_pagination(self):
+        """Test results are ranked by score then id"""
+        index = SearchIndex()
+        index.add(1, 'Alice', 'python once')
+        index.add(2, 'Bob', 'python python python')
+        index.add(3, 'Carol', 'python twice python')
+        
+        total, hits = index.search('python', limit=2)
+        assert total == 3
+        assert [doc_id for doc_id, score in hits] == [2, 3]
+        
+        total, hits = index.search('python', limit=2, offset=2)
+        assert [doc_id for doc_id, score in hits] == [1]
+    
+    def test_remove_cleans_postings(self):
+        """Test removing a document drops empty postings"""
+        index = SearchIndex()
+        index.add(1, 'Alice', 'unique words here')
+        index.remove(1)
+        
+        assert index.search('unique') == (0, [])
+        assert index.postings == {}
+        assert index.vocabulary == []
+    
+    def test_search_while_writing(self):
+        """Test searches stay consistent while another thread adds and removes documents"""
+        import threading
+        index = SearchIndex()
+        for doc_id in range(5000):
+            index.add(doc_id, 'sender', f'status update {doc_id}')
+        stop = threading.Event()
+        
+        def writer():
+            doc_id = 5000
+            while not stop.is_set():
+                index.add(doc_id, 'sender', f'status update {doc_id}')
+                index.remove(doc_id - 2500)
+                doc_id += 1
+        
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            for _ in range(50):
+                total, hits = index.search('status upd')
+                assert total == 5000 or total == 5001
+        finally:
+            stop.set()
+            thread.join()
+
+
+# ============================================
+# Batch Processing
+# ============================================
+
+class TestBatchProcessing:
+    """Test the column-oriented DataProcessor batch API"""
+    
+    RECORDS = [
+        {'name': '  alice smith ', 'message': '  Hello there world  '},
+        {'name': 'B', 'message': 'short name'},
+        {'name': 'Carol', 'message': 'hi'},
+        {'name': 'Dave'},
+        {'name': None, 'message': 'null name here'},
+        'not an object',
+        ['name', 'message'],
+    ]
+    
+    def test_validate_many_matches_validate_data(self):
+        """Test bulk validation agrees with the per-record validator"""
+        errors = DataProcessor.validate_many(*DataProcessor.to_columns(self.RECORDS))
+        
+        assert len(errors) == len(self.RECORDS)
+        for record, error in zip(self.RECORDS, errors):
+            is_valid, message = DataProcessor.validate_data(record)
+            assert (error is None) == is_valid
+            if not is_valid:
+                assert error == message
+    
+    def test_process_many_matches_process_data(self):
+        """Test bulk processing produces the same processed fields"""
+        names = ['  alice smith ', 'bob']
+        messages = ['  Hello there world  ', 'Another message']
+        columns = DataProcessor.process_many(names, messages)
+        
+        for name, message, processed in zip(names, messages, DataProcessor.iter_processed(columns)):
+            expected = DataProcessor.process_data({'name': name, 'message': message})['processed']
+            del expected['timestamp']
+            assert {k: v for k, v in processed.items() if k != 'timestamp'} == expected
+        assert len(set(p['timestamp'] for p in DataProcessor.iter_processed(columns))) == 1
+
+
+# ============================================
+# Running Statistics
+# ============================================
+
+class TestRunningStatistics:
+    """Test incrementally maintained message statistics"""
+    
+    def test_matches_full_recalculation(self):
+        """Test running totals agree with calculate_statistics"""
+        texts = ['short', 'a much longer message', 'medium text', 'tiny!']
+        stats = RunningStatistics()
+        for item_id, text in enumerate(texts, start=1):
+            stats.add(item_id, text)
+        
+        expected = DataProcessor.calculate_statistics([{'message': t} for t in texts])
+        assert stats.snapshot() == expected
+    
+    def test_remove_updates_extremes(self):
+        """Test longest/shortest follow deletions"""
+        stats = RunningStatistics()
+        stats.add(1, 'short')
+        stats.add(2, 'the longest message')
+        stats.add(3, 'mid length')
+        
+        stats.remove(2)
+        snapshot = stats.snapshot()
+        assert snapshot['longest'] == 'mid length'
+        assert snapshot['total'] == 2
+        assert snapshot['total_words'] == 3
+    
+    def test_empty_after_removing_everything(self):
+        """Test statistics reset once all messages are removed"""
+        stats = RunningStatistics()
+        for item_id in range(1, 50):
+            stats.add(item_id, 'message %d' % item_id)
+        for item_id in range(1, 50):
+            stats.remove(item_id)
+        
+        assert stats.snapshot()['total'] == 0
+        assert stats.snapshot()['longest'] is None
+
+
+# ============================================
+# Storage Engine
+# ============================================
+
+class TestCollection:
+    """Test the indexed in-memory collection"""
+    
+    def test_ids_are_never_reused(self):
+        """Test ids stay monotonic after deletes"""
+        users = Collection('users')
+        first = users.insert({'name': 'A'})
+        second = users.insert({'name': 'B'})
+        users.delete(second['id'])
+        third = users.insert({'name': 'C'})
+        
+        assert (first['id'], second['id'], third['id']) == (1, 2, 3)
+        assert [u['name'] for u in users.all()] == ['A', 'C']
+    
+    def test_secondary_index_tracks_updates(self):
+        """Test secondary index follows updates and deletes"""
+        users = Collection('users', indexes=('email',))
+        user = users.insert({'name': 'A', 'email': 'a@example.com'})
+        
+        user = users.update(user['id'], {'email': 'new@example.com'})
+        assert users.find_by('email', 'a@example.com') == []
+        assert users.find_by('email', 'new@example.com') == [user]
+        
+        users.delete(user['id'])
+        assert users.find_by('email', 'new@example.com') == []
+        assert users.indexes['email'] == {}
+    
+    def test_unhashable_value_leaves_collection_unchanged(self):
+        """Test a value that cannot be indexed is rejected before anything is stored"""
+        users = Collection('users', indexes=('email',))
+        journal = []
+        users.journal = lambda *change: journal.append(change)
+        user = users.insert({'name': 'A', 'email': 'a@example.com'})
+        
+        with pytest.raises(TypeError):
+            users.insert({'name': 'B', 'email': []})
+        with pytest.raises(TypeError):
+            users.update(user['id'], {'email': {}})
+        
+        assert users.all() == [user]
+        assert users.order == [1] and users.next_id == 2
+        assert users.find_by('email', 'a@example.com') == [user]
+        assert len(journal) == 1
+    
+    def test_page_follows_cursor(self):
+        """Test keyset pagination skips deleted ids"""
+        items = Collection('items')
+        for i in range(10):
+            items.insert({'n': i})
+        items.delete(4)
+        items.delete(5)
+        
+        page, cursor = items.page(after=0, limit=3)
+        assert [r['id'] for r in page] == [1, 2, 3]
+        page, cursor = items.page(after=cursor, limit=3)
+        assert [r['id'] for r in page] == [6, 7, 8]
+        page, cursor = items.page(after=cursor, limit=3)
+        assert [r['id'] for r in page] == [9, 10]
+        assert cursor is None
+    
+    def test_page_compacts_deleted_ids(self):
+        """Test deleted ids are eventually dropped from the seek list"""
+        items = Collection('items')
+        for i in range(100):
+            items.insert({'n': i})
+        for item_id in range(1, 91):
+            items.delete(item_id)
+        
+        assert len(items.order) < 100
+        page, cursor = items.page(limit=5)
+        assert [r['id'] for r in page] == [91, 92, 93, 94, 95]
+    
+    def test_find_by_unindexed_field(self):
+        """Test lookups on fields without an index still work"""
+        users = Collection('users')
+        users.insert({'name': 'A'})
+        assert len(users.find_by('name', 'A')) == 1
+
+
+class TestCompactRecords:
+    """Test the __slots__ records used by the message and user collections"""
+    
+    def test_message_round_trip(self):
+        """Test a compact message serializes exactly like its dict form"""
+        processed = DataProcessor.process_data({'name': ' alice ', 'message': ' Hi there all ', 'tag': 1})
+        processed['id'] = 7
+        record = MessageRecord.from_dict(processed)
+        
+        assert record.to_dict() == processed
+        assert record == processed
+        assert json.loads(json.dumps(processed, default=dict)) == json.loads(json.dumps(record, default=dict))
+        assert not hasattr(record, '__dict__')
+    
+    def test_strings_are_shared(self):
+        """Test names are interned and unchanged text is stored once"""
+        first, second = (MessageRecord.from_dict(DataProcessor.process_data(json.loads(body)))
+                         for body in ('{"name": "bob", "message": "hello world"}',
+                                      '{"name": "bob", "message": "second message"}'))
+        
+        assert first.name is second.name
+        assert first.original_name is second.original_name
+        assert first.message is first.original_message
+        assert isinstance(first.created, int)
+    
+    def test_typed_collection_packs_and_persists(self, tmp_path):
+        """Test inserts, updates and journaled records with a record type"""
+        persistence = Persistence(str(tmp_path))
+        users = persistence.attach(Collection('users', indexes=('email',), record_type=UserRecord))
+        user = users.insert({'name': 'A', 'email': 'a@example.com', 'created_at': '2024-05-01T10:00:00'})
+        assert isinstance(user, UserRecord)
+        users.update(1, {'email': 'b@example.com', 'role': 'admin'})
+        persistence.close()
+        
+        persistence = Persistence(str(tmp_path))
+        users = persistence.attach(Collection('users', indexes=('email',), record_type=UserRecord))
+        assert users.find_by('email', 'b@example.com')[0].to_dict() == {
+            'name': 'A', 'email': 'b@example.com', 'created_at': '2024-05-01T10:00:00',
+            'role': 'admin', 'id': 1
+        }
+        persistence.snapshot()
+        persistence.close()
+        
+        with open(persistence.snapshot_path, 'rb') as f:
+            assert b'backend_examples' not in f.read()
+        saved = Persistence.load_snapshot(persistence.snapshot_path)['users']
+        assert tuple(saved['fields']) == UserRecord.FIELDS and saved['records'] == {}
+        assert tuple(saved['rows'][0])[:3] == (1, 'A', 'b@example.com')
+        
+        persistence = Persistence(str(tmp_path))
+        users = persistence.attach(Collection('users', record_type=UserRecord))
+        assert users.get(1)['role'] == 'admin'
+        persistence.close()
+    
+    def test_snapshot_rows_and_later_log_entries_merge(self, tmp_path):
+        """Test snapshotted rows replaced or deleted by the log are not restored"""
+        persistence = Persistence(str(tmp_path), snapshot_every=0)
+        messages = persistence.attach(Collection('messages', record_type=MessageRecord))
+        for n in range(4):
+            messages.insert(DataProcessor.process_data({'name': 'Alice', 'message': f'message {n}'}))
+        persistence.snapshot()
+        messages.update(2, {'original': {'name': 'Alice', 'message': 'edited'}})
+        messages.delete(3)
+        messages.insert(DataProcessor.process_data({'name': 'Bob', 'message': 'after the snapshot'}))
+        expected = [record.to_dict() for record in messages]
+        persistence.close()
+        
+        persistence = Persistence(str(tmp_path))
+        messages = persistence.attach(Collection('messages', record_type=MessageRecord))
+        assert [record.to_dict() for record in messages] == expected
+        assert [record['id'] for record in messages] == [1, 2, 4, 5]
+        assert messages.get(1).message is messages.get(1).original_message
+        persistence.close()
+
+
+class TestDatabaseHelper:
+    """Test DatabaseHelper on top of the collection engine"""
+    
+    def test_crud_cycle(self):
+        """Test save, find, update and delete"""
+        db = DatabaseHelper(indexes={'users': ('email',)})
+        saved = db.save('users', {'name': 'A', 'email': 'a@example.com'})
+        
+        assert db.find_by_id('users', saved['id']) is saved
+        assert db.find_by('users', 'email', 'a@example.com') == [saved]
+        assert 'updated_at' in db.update('users', saved['id'], {'name': 'B'})
+        assert db.delete('users', saved['id']) is True
+        assert db.delete('users', saved['id']) is False
+        assert db.find_all('users') == []
+    
+    def test_unknown_collection(self):
+        """Test lookups on a missing collection"""
+        db = DatabaseHelper()
+        assert db.find_all('missing') == []
+        assert db.find_by_id('missing', 1) is None
+        assert db.update('missing', 1, {}) is None
+        assert db.delete('missing', 1) is False
+
+
+# ============================================
+# Event Broker
+# ============================================
+
+class TestEventBroker:
+    """Test fan-out and backpressure in the SSE broker"""
+    
+    def publish(self, broker, count):
+        """Publish events inside an app context"""
+        with Flask(__name__).app_context():
+            for i in range(count):
+                broker.publish('tick', {'n': i})
+    
+    def test_event_encoded_once_for_all_subscribers(self):
+        """Test every subscriber receives the very same frame object"""
+        broker = EventBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        self.publish(broker, 1)
+        
+        assert first.queue.get_nowait() is second.queue.get_nowait()
+    
+    def test_slow_subscriber_is_resynced(self):
+        """Test a full queue drops the subscriber and ends with 'resync'"""
+        broker = EventBroker(max_queued=2)
+        slow = broker.subscribe()
+        self.publish(broker, 5)
+        
+        assert slow not in broker.subscribers
+        frames = list(broker.stream(slow))
+        assert len(frames) == 4  # retry hint, two queued events, resync
+        assert frames[-1].startswith(b'event: resync')
+    
+    def test_stale_last_event_id_is_resynced(self):
+        """Test reconnecting past the replay history forces a reload"""
+        broker = EventBroker(history=2)
+        self.publish(broker, 5)
+        
+        assert broker.subscribe(last_event_id=broker.event_id(1)).overflowed
+        assert not broker.subscribe(last_event_id=broker.event_id(3)).overflowed
+        assert broker.subscribe(last_event_id=broker.event_id(99)).overflowed
+    
+    def test_other_process_ids_are_resynced(self):
+        """Test an id numbered by another process is never replayed from ours"""
+        broker, other = EventBroker(), EventBroker()
+        self.publish(broker, 5)
+        self.publish(other, 1)
+        
+        assert not broker.subscribe(last_event_id=broker.event_id(3)).overflowed
+        assert broker.subscribe(last_event_id=other.event_id(1)).overflowed
+        assert broker.subscribe(last_event_id='3').overflowed
+
+
+# ============================================
+# Persistence
+# ============================================
+
+class TestPersistence:
+    """Test write-ahead log and snapshot recovery"""
+    
+    def test_recover_from_log(self, tmp_path):
+        """Test changes survive a restart via log replay"""
+        persistence = Persistence(str(tmp_path))
+        users = persistence.attach(Collection('users', indexes=('email',)))
+        users.insert({'name': 'A', 'email': 'a@example.com'})
+        users.insert({'name': 'B', 'email': 'b@example.com'})
+        users.update(1, {'name': 'A2'})
+        users.delete(2)
+        persistence.close()
+        
+        persistence = Persistence(str(tmp_path))
+        users = persistence.attach(Collection('users', indexes=('email',)))
+        assert [u['name'] for u in users] == ['A2']
+        assert users.find_by('email', 'a@example.com')[0]['id'] == 1
+        assert users.insert({'name': 'C'})['id'] == 3
+        persistence.close()
+    
+    def test_snapshot_compacts_log(self, tmp_path):
+        """Test periodic snapshots truncate the log and still recover"""
+        persistence = Persistence(str(tmp_path), snapshot_every=10)
+        items = persistence.attach(Collection('items'))
+        for i in range(25):
+            items.insert({'n': i})
+        persistence.close()
+        
+        # Snapshots are written in the background (one at a time); the log
+        # only holds what came after the last one
+        assert persistence.wal.entries <= 15
+        assert len(list(WriteAheadLog.replay(persistence.wal_path))) == persistence.wal.entries
+        assert not os.path.exists(persistence.rotated_wal_path)
+        
+        persistence = Persistence(str(tmp_path))
+        items = persistence.attach(Collection('items'))
+        assert len(items) == 25
+        assert items.next_id == 26
+        persistence.close()
+    
+    def test_torn_log_tail_is_ignored(self, tmp_path):
+        """Test a partially written final entry does not break recovery"""
+        persistence = Persistence(str(tmp_path))
+        persistence.attach(Collection('items')).insert({'n': 1})
+        persistence.close()
+        with open(persistence.wal_path, 'ab') as f:
+            f.write(b'{"op":"put","c":"ite')
+        
+        persistence = Persistence(str(tmp_path))
+        items = persistence.attach(Collection('items'))
+        assert len(items) == 1
+        items.insert({'n': 2})
+        items.insert({'n': 3})
+        persistence.close()
+        
+        # The torn line was cut off, so later entries are not lost behind it
+        persistence = Persistence(str(tmp_path))
+        assert [item['n'] for item in persistence.attach(Collection('items'))] == [1, 2, 3]
+        persistence.close()
+    
+    def test_idle_batch_is_synced(self, tmp_path):
+        """Test a pending batch is fsynced after fsync_interval without more writes"""
+        import time
+        
+        wal = WriteAheadLog(str(tmp_path / 'wal.jsonl'), fsync_batch=100, fsync_interval=0.01)
+        wal.append({'op': 'put'})
+        assert wal._pending == 1
+        time.sleep(0.2)
+        assert wal._pending == 0
+        wal.close()
+    
+    def test_interrupted_snapshot_is_recovered(self, tmp_path):
+        """Test a rotated log left by a crash is replayed and then snapshotted"""
+        persistence = Persistence(str(tmp_path), snapshot_every=0)
+        items = persistence.attach(Collection('items'))
+        items.insert({'n': 1})
+        persistence.wal.rotate(persistence.rotated_wal_path)  # crash before the snapshot
+        items.insert({'n': 2})
+        persistence.close()
+        
+        persistence = Persistence(str(tmp_path))
+        assert not os.path.exists(persistence.rotated_wal_path)
+        assert [item['n'] for item in persistence.attach(Collection('items'))] == [1, 2]
+        persistence.close()
+    
+    def test_snapshot_is_columnar_and_checked(self, tmp_path):
+        """Test snapshots hold plain columns and bad files are refused"""
+        persistence = Persistence(str(tmp_path), snapshot_every=0)
+        messages = persistence.attach(Collection('messages', record_type=MessageRecord))
+        messages.insert(DataProcessor.process_data({'name': 'Alice', 'message': 'hi'}))
+        persistence.attach(Collection('items')).insert({'n': 2 ** 70})
+        persistence.snapshot()
+        persistence.close()
+        
+        saved = Persistence.load_snapshot(persistence.snapshot_path)
+        assert saved['items']['records'] == {1: {'n': 2 ** 70, 'id': 1}}
+        assert saved['messages']['rows'][0][:2] == (1, 'Alice')
+        
+        with open(persistence.snapshot_path, 'rb') as f:
+            data = f.read()
+        with open(persistence.snapshot_path, 'wb') as f:
+            f.write(data[:-3])
+        with pytest.raises(ValueError):
+            Persistence.load_snapshot(persistence.snapshot_path)
+        with open(persistence.snapshot_path, 'wb') as f:
+            f.write(b'\x80\x04\x95' + data)  # e.g. a pickle
+        with pytest.raises(ValueError):
+            Persistence.load_snapshot(persistence.snapshot_path)
+    
+    def test_routes_restore_messages(self, tmp_path):
+        """Test messages, statistics and search come back after restart"""
+        persistence = Persistence(str(tmp_path))
+        app = Flask(__name__)
+        create_advanced_routes(app, persistence=persistence)
+        post_message(app.test_client(), 'Alice', 'Persistent hello')
+        persistence.close()
+        
+        persistence = Persistence(str(tmp_path))
+        app = Flask(__name__)
+        create_advanced_routes(app, persistence=persistence)
+        client = app.test_client()
+        
+        assert json.loads(client.get('/api/messages').data)['statistics']['total'] == 1
+        assert json.loads(client.get('/api/messages/search?q=persistent').data)['total'] == 1
+        persistence.close()
+
+
+# ============================================
+# Shared Store
+# ============================================
+
+class TestSharedStore:
+    """Test collections shared between processes through one arena file"""
+    
+    def test_changes_visible_to_other_store(self, tmp_path):
+        """Test two stores on one file (two workers) see each other's writes"""
+        path = str(tmp_path / 'arena')
+        first = SharedStore(path).attach(Collection('users', indexes=('email',)))
+        second_store = SharedStore(path)
+        second = second_store.attach(Collection('users', indexes=('email',)))
+        
+        first.insert({'name': 'A', 'email': 'a@example.com'})
+        assert second.insert({'name': 'B', 'email': 'b@example.com'})['id'] == 2
+        first.update(1, {'name': 'A2'})
+        second.delete(2)
+        
+        second_store.refresh()
+        assert [u['name'] for u in second] == ['A2']
+        assert second.find_by('email', 'a@example.com')[0]['id'] == 1
+        assert first.insert({'name': 'C'})['id'] == 3
+    
+    def test_compaction_moves_readers(self, tmp_path):
+        """Test a full arena is compacted and other stores follow it"""
+        path = str(tmp_path / 'arena')
+        writer = SharedStore(path, capacity=4096).attach(Collection('items'))
+        reader_store = SharedStore(path, capacity=4096)
+        reader = reader_store.attach(Collection('items'))
+        
+        for i in range(200):
+            item = writer.insert({'n': i})
+            if i % 2:
+                writer.delete(item['id'])
+        
+        reader_store.refresh()
+        assert len(reader) == 100
+        assert reader.next_id == 201
+        assert os.path.getsize(path) > 4096
+    
+    def test_ids_unique_across_processes(self, tmp_path):
+        """Test concurrent inserts from forked workers never reuse an id"""
+        import multiprocessing
+        
+        path = str(tmp_path / 'arena')
+        store = SharedStore(path, capacity=8192)
+        items = store.attach(Collection('items'))
+        
+        def work():
+            for i in range(100):
+                items.insert({'pid': os.getpid(), 'n': i})
+        
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=work) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        
+        store.refresh()
+        assert len(items) == 300
+        assert [item['id'] for item in items] == list(range(1, 301))
+    
+    def test_routes_share_messages(self, tmp_path):
+        """Test messages, statistics, search and event streams follow another worker's writes"""
+        path = str(tmp_path / 'arena')
+        clients = []
+        for _ in range(2):
+            app = Flask(__name__)
+            create_advanced_routes(app, shared=SharedStore(path))
+            clients.append(app.test_client())
+        stream = clients[1].get('/api/stream', buffered=False)
+        frames = iter(stream.response)
+        assert next(frames) == b'retry: 3000\n\n'
+        
+        post_message(clients[0], 'Alice', 'Shared hello')
+        data = json.loads(clients[1].get('/api/messages').data)
+        assert data['total'] == 1
+        assert data['statistics']['total'] == 1
+        assert json.loads(clients[1].get('/api/messages/search?q=shared').data)['total'] == 1
+        assert b'event: message_created' in next(frames)
+        stream.close()
+        
+        clients[1].delete('/api/messages/1')
+        assert json.loads(clients[0].get('/api/messages').data)['total'] == 0
+        assert json.loads(clients[0].get('/api/messages/search?q=shared').data)['total'] == 0
+
+
+# ============================================
+# Profiling
+# ============================================
+
+API_KEY = {'X-API-Key': 'your-secret-api-key'}
+
+
+class TestProfiling:
+    """Test the sampling profiler and per-request cProfile capture"""
+    
+    @pytest.fixture
+    def profiled(self):
+        """Client for an app with message and profiling routes"""
+        app = Flask(__name__)
+        create_advanced_routes(app)
+        create_profiling_routes(app)
+        return app.test_client()
+    
+    def test_sampler_sees_busy_thread(self):
+        """Test collapsed stacks include a function running in another thread"""
+        import threading
+        stop = threading.Event()
+        
+        def busy_loop():
+            while not stop.is_set():
+                sum(range(1000))
+        
+        worker = threading.Thread(target=busy_loop)
+        worker.start()
+        try:
+            counts, samples = StackSampler(interval=0.001).run(0.2)
+        finally:
+            stop.set()
+            worker.join()
+        
+        collapsed = StackSampler.collapse(counts)
+        assert samples > 10
+        assert any('busy_loop (test_backend.py' in line for line in collapsed.splitlines())
+        line = collapsed.splitlines()[0]
+        assert int(line.rsplit(' ', 1)[1]) > 0
+    
+    def test_profile_endpoint_requires_api_key(self, profiled):
+        """Test the sampler endpoint is protected"""
+        assert profiled.get('/api/admin/profile?seconds=0.1').status_code == 401
+        
+        response = profiled.get('/api/admin/profile?seconds=0.1', headers=API_KEY)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        assert int(response.headers['X-Profile-Samples']) > 0
+    
+    def test_profile_interval_is_clamped_to_duration(self, profiled):
+        """Test a huge interval_ms cannot keep the sampler busy past ?seconds="""
+        import time
+        
+        start = time.monotonic()
+        response = profiled.get('/api/admin/profile?seconds=0.1&interval_ms=1e9', headers=API_KEY)
+        assert response.status_code == 200
+        assert time.monotonic() - start < 5
+        assert profiled.get('/api/admin/profile?seconds=0.1', headers=API_KEY).status_code == 200
+    
+    def test_request_profile_capture(self, profiled):
+        """Test X-Profile requests get a cProfile report (only with the key)"""
+        body = json.dumps({'name': 'Alice', 'message': 'Profile me'})
+        plain = profiled.post('/api/messages', data=body, content_type='application/json',
+                              headers={'X-Profile': '1'})
+        assert 'X-Profile-Id' not in plain.headers
+        
+        response = profiled.post('/api/messages', data=body, content_type='application/json',
+                                 headers=dict(API_KEY, **{'X-Profile': '1'}))
+        report_id = response.headers['X-Profile-Id']
+        
+        listing = json.loads(profiled.get('/api/admin/profile/requests', headers=API_KEY).data)
+        assert listing['profiles'][-1]['path'] == '/api/messages'
+        report = profiled.get(f'/api/admin/profile/requests/{report_id}', headers=API_KEY)
+        assert b'create_message' in report.data
+        assert profiled.get('/api/admin/profile/requests/999', headers=API_KEY).status_code == 404
+
+
+class TestProtectedRoutes:
+    """Test API-key scopes on the admin routes"""
+    
+    def test_admin_stats_requires_read_scope(self, monkeypatch):
+        """Test only keys with admin:read (or '*') can read the stats"""
+        import backend_examples
+        from backend_examples import create_protected_routes
+        from api_keys import KeyRegistry, make_entry
+        
+        registry = KeyRegistry(entries=[
+            make_entry('reader', 'reader-key-0123', ['admin:read'], iterations=1000),
+            make_entry('profiler', 'profiler-key-0123', ['admin:profile'], iterations=1000)
+        ])
+        monkeypatch.setattr(backend_examples, 'api_keys', registry)
+        app = Flask(__name__)
+        create_protected_routes(app)
+        client = app.test_client()
+        
+        assert client.get('/api/admin/stats').status_code == 401
+        assert client.get('/api/admin/stats', headers={'X-API-Key': 'profiler-key-0123'}).status_code == 401
+        assert client.get('/api/admin/stats', headers={'X-API-Key': 'reader-key-0123'}).status_code == 200
+    
+    def test_admin_stats_are_live_and_merged_across_workers(self, monkeypatch, tmp_path):
+        """Test the stats count real requests, including other workers' files"""
+        import backend_examples
+        from backend_examples import create_protected_routes
+        from usage_stats import UsageStats
+        from api_keys import KeyRegistry, make_entry
+        
+        registry = KeyRegistry(entries=[make_entry('reader', 'reader-key-0123', ['admin:read'], iterations=1000)])
+        monkeypatch.setattr(backend_examples, 'api_keys', registry)
+        app = Flask(__name__)
+        
+        @app.route('/items/<int:item_id>')
+        def item(item_id):
+            return jsonify({'id': item_id})
+        
+        create_protected_routes(app, stats_directory=str(tmp_path))
+        client = app.test_client()
+        for item_id in range(30):
+            response = client.get(f'/items/{item_id % 3}', environ_base={'REMOTE_ADDR': f'10.0.0.{item_id % 6}'})
+            assert response.status_code == 200
+        
+        other = UsageStats(str(tmp_path))
+        other.record('/items/<int:item_id>', '/items/1', 'ip:10.0.1.1')
+        other.path = lambda: str(tmp_path / 'usage-999999.json')
+        other.flush()
+        
+        response = client.get('/api/admin/stats', headers={'X-API-Key': 'reader-key-0123'})
+        data = json.loads(response.data)['data']
+        assert data['requests_per_route']['/items/<int:item_id>'] == 31
+        assert data['total_requests'] == 31
+        assert data['active_users'] == 7
+        assert data['active_users_by_window']['60m'] == 7
+        assert data['top_endpoints'][0] == {'path': '/items/1', 'requests': 11}
+        assert data['workers'] == 2
+
+
+# ============================================
+# User Routes
+# ============================================
+
+class TestUserRoutes:
+    """Test user management routes"""
+    
+    def test_create_and_get_user(self, client):
+        """Test a created user can be fetched by id and email"""
+        response = client.post('/api/users',
+                               data=json.dumps({'name': 'Alice', 'email': 'alice@example.com'}),
+                               content_type='application/json')
+        user = json.loads(response.data)['user']
+        assert response.status_code == 201
+        
+        data = json.loads(client.get(f"/api/users/{user['id']}").data)
+        assert data['user']['email'] == 'alice@example.com'
+        
+        data = json.loads(client.get('/api/users?email=alice@example.com').data)
+        assert data['count'] == 1
+    
+    def test_non_string_email_is_rejected(self, client):
+        """Test an email that is not a string returns 400 and stores nothing"""
+        for email in ([], {}):
+            response = client.post('/api/users',
+                                   data=json.dumps({'name': 'Alice', 'email': email}),
+                                   content_type='application/json')
+            assert response.status_code == 400
+        
+        assert json.loads(client.get('/api/users').data)['count'] == 0
+    
+    def test_missing_user(self, client):
+        """Test unknown user returns 404"""
+        assert client.get('/api/users/42').status_code == 404
+
+
+# ============================================
+# Message Routes
+# ============================================
+
+class TestMessageRoutes:
+    """Test message create, delete and search routes"""
+    
+    def test_get_messages_statistics(self, client):
+        """Test GET /api/messages reports running statistics"""
+        post_message(client, 'Alice', 'Hello there world')
+        post_message(client, 'Bob', 'Hi again')
+        
+        data = json.loads(client.get('/api/messages').data)
+        assert data['statistics']['total'] == 2
+        assert data['statistics']['total_words'] == 5
+        assert data['statistics']['longest'] == 'Hello there world'
+        assert data['statistics']['shortest'] == 'Hi again'
+    
+    def test_get_messages_paginated(self, client):
+        """Test GET /api/messages pages with ?after= and ?limit="""
+        for i in range(5):
+            post_message(client, 'User', f'message number {i}')
+        
+        data = json.loads(client.get('/api/messages?limit=2').data)
+        assert data['total'] == 5
+        assert [m['id'] for m in data['messages']] == [1, 2]
+        
+        data = json.loads(client.get(f"/api/messages?limit=2&after={data['next_cursor']}").data)
+        assert [m['id'] for m in data['messages']] == [3, 4]
+        
+        data = json.loads(client.get(f"/api/messages?limit=2&after={data['next_cursor']}").data)
+        assert [m['id'] for m in data['messages']] == [5]
+        assert data['next_cursor'] is None
+    
+    def test_get_messages_field_projection(self, client):
+        """Test ?fields= drops unrequested fields"""
+        post_message(client, 'Alice', 'Hello there world')
+        
+        data = json.loads(client.get('/api/messages?fields=processed').data)
+        assert set(data['messages'][0].keys()) == {'id', 'processed'}
+    
+    def test_get_messages_etag(self, client):
+        """Test message listings revalidate until the collection changes"""
+        post_message(client, 'Alice', 'Hello there world')
+        etag = client.get('/api/messages').headers['ETag']
+        
+        response = client.get('/api/messages', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        
+        post_message(client, 'Bob', 'Another message')
+        response = client.get('/api/messages', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert json.loads(response.data)['total'] == 2
+    
+    def test_etag_depends_on_query(self, client):
+        """Test different pages get different ETags"""
+        for i in range(3):
+            post_message(client, 'User', f'message number {i}')
+        
+        first = client.get('/api/messages?limit=1').headers['ETag']
+        second = client.get('/api/messages?limit=2').headers['ETag']
+        assert first != second
+    
+    def test_stream_replays_missed_events(self, client):
+        """Test /api/stream sends create/delete deltas after Last-Event-ID"""
+        response = client.get('/api/stream', buffered=False)
+        frames = iter(response.response)
+        assert response.mimetype == 'text/event-stream'
+        assert next(frames) == b'retry: 3000\n\n'
+        post_message(client, 'Alice', 'Streamed message')
+        created = next(frames)
+        response.close()
+        
+        event_id = created.split(b'\n', 1)[0].decode()[len('id: '):]
+        assert created.startswith(f'id: {event_id}\nevent: message_created\n'.encode())
+        assert b'Streamed message' in created
+        origin, sequence = event_id.rsplit(':', 1)
+        
+        client.delete('/api/messages/1')
+        response = client.get('/api/stream', headers={'Last-Event-ID': event_id}, buffered=False)
+        frames = iter(response.response)
+        assert next(frames) == b'retry: 3000\n\n'
+        deleted = next(frames)
+        assert deleted.startswith(f'id: {origin}:{int(sequence) + 1}\nevent: message_deleted\n'.encode())
+        response.close()
+        
+        response = client.get('/api/stream', headers={'Last-Event-ID': '1'}, buffered=False)
+        frames = iter(response.response)
+        next(frames)
+        assert next(frames).startswith(b'event: resync')
+        response.close()
+    
+    def test_search_finds_created_message(self, client):
+        """Test search sees messages as soon as they are created"""
+        post_message(client, 'Alice', 'Deploying the new release')
+        post_message(client, 'Bob', 'Reviewing pull requests')
+        
+        response = client.get('/api/messages/search?q=deploy')
+        data = json.loads(response.data)
+        
+        assert response.status_code == 200
+        assert data['total'] == 1
+        assert data['results'][0]['processed']['name'] == 'Alice'
+    
+    def test_search_matches_name(self, client):
+        """Test search covers the name field"""
+        post_message(client, 'Alice', 'Deploying the new release')
+        
+        data = json.loads(client.get('/api/messages/search?q=alice').data)
+        assert data['count'] == 1
+    
+    def test_search_limit_and_offset(self, client):
+        """Test search pagination parameters"""
+        for i in range(5):
+            post_message(client, 'User', f'status update number {i}')
+        
+        data = json.loads(client.get('/api/messages/search?q=status&limit=2&offset=1').data)
+        assert data['total'] == 5
+        assert data['count'] == 2
+    
+    def test_search_requires_query(self, client):
+        """Test search without a query is rejected"""
+        response = client.get('/api/messages/search')
+        assert response.status_code == 400
+    
+    def test_delete_removes_from_search(self, client):
+        """Test deleted messages disappear from search"""
+        created = json.loads(post_message(client, 'Alice', 'Temporary message').data)
+        message_id = created['data']['id']
+        
+        response = client.delete(f'/api/messages/{message_id}')
+        assert response.status_code == 200
+        
+        data = json.loads(client.get('/api/messages/search?q=temporary').data)
+        assert data['total'] == 0
+    
+    def test_batch_create_messages(self, client):
+        """Test batch creation validates and indexes each record"""
+        body = '\n'.join(json.dumps(r) for r in [
+            {'name': 'Alice', 'message': 'Batch message one'},
+            {'name': 'B', 'message': 'too short name'},
+            {'name': 'Carol', 'message': None},
+            {'name': 'Dave', 'message': 'Batch message two'},
+        ])
+        response = client.post('/api/messages/batch',
+                               data=body,
+                               content_type='application/x-ndjson')
+        result = json.loads(response.data)
+        
+        assert response.status_code == 201
+        assert (result['accepted'], result['rejected']) == (2, 2)
+        assert result['errors'] == [
+            {'index': 1, 'message': 'Name must be at least 2 characters'},
+            {'index': 2, 'message': 'Field must be a string: message'}
+        ]
+        
+        data = json.loads(client.get('/api/messages/search?q=batch').data)
+        assert data['total'] == 2
+    
+    def test_create_message_rejects_non_string(self, client):
+        """Test null fields are a validation error, not a crash"""
+        response = client.post('/api/messages',
+                               data=json.dumps({'name': None, 'message': None}),
+                               content_type='application/json')
+        assert response.status_code == 400
+    
+    def test_ids_not_reused_after_delete(self, client):
+        """Test a new message never takes a deleted message's id"""
+        post_message(client, 'Alice', 'First message')
+        post_message(client, 'Bob', 'Second message')
+        client.delete('/api/messages/1')
+        
+        created = json.loads(post_message(client, 'Carol', 'Third message').data)
+        assert created['data']['id'] == 3
+
+    def test_create_message_async(self):
+        """Test respond-async creates are accepted, then stored by a job"""
+        from jobs import JobQueue
+
+        app = Flask(__name__)
+        jobs = JobQueue(threads=2)
+        create_advanced_routes(app, jobs=jobs)
+        client = app.test_client()
+
+        response = client.post('/api/messages?async=1',
+                               data=json.dumps({'name': 'alice', 'message': 'Hello later'}),
+                               content_type='application/json')
+        assert response.status_code == 202
+        invalid = client.post('/api/messages?async=1', data=json.dumps({'name': 'alice'}),
+                              content_type='application/json')
+        assert invalid.status_code == 400
+
+        assert jobs.join(timeout=5)
+        job = client.get(response.headers['Location']).get_json()['job']
+        assert job['status'] == 'succeeded'
+        assert job['result']['processed']['name'] == 'Alice'
+        messages = client.get('/api/messages').get_json()
+        assert messages['total'] == 1
+        assert client.get('/api/messages/search?q=later').get_json()['total'] == 1
+
+    def test_delete_missing_message(self, client):
+        """Test deleting an unknown message returns 404"""
+        response = client.delete('/api/messages/999')
+        assert response.status_code == 404
@@ -0,0 +1,247 @@
+"""
+Flask Lab Project - Usage statistics
+Live numbers for the admin dashboard in bounded memory:
+
+- requests per route (exact; routes are a fixed set)
+- distinct active clients over sliding windows: one HyperLogLog per
+  minute for the last hour, merged on demand for 1/5/15/60 minutes
+- the most requested paths: a count-min sketch plus a small set of
+  candidate paths, so /api/users/<id> style paths cannot grow memory
+
+All three merge exactly across processes (register max, counter sums),
+so under gunicorn every worker writes its state to a directory (as in
+metrics.py) and the report combines the files of all workers.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import weakref
+from array import array
+from collections import OrderedDict
+
+from flask import request
+
+WINDOWS = (1, 5, 15, 60)  # minutes
+
+
+def hash64(value):
+    """Stable 64-bit hash of a string"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class HyperLogLog:
+    """Distinct-count estimate in 2**precision bytes (about 3% error at 10)"""
+
+    POWERS = [2.0 ** -k for k in range(65)]
+
+    def __init__(self, precision=10, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+
+    def add_hash(self, hashed):
+        """Add an item by its 64-bit hash"""
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, item):
+        """Add a string item"""
+        self.add_hash(hash64(item))
+
+    def merge(self, other):
+        """Fold another sketch's registers into this one"""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self):
+        """Estimated number of distinct items"""
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        powers = self.POWERS
+        estimate = alpha * m * m / sum(powers[r] for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small sets
+        return int(round(estimate))
+
+
+class CountMinSketch:
+    """Approximate per-key counts (never under-counted) in fixed memory"""
+
+    def __init__(self, width=2048, depth=4, counts=None):
+        self.width = width
+        self.depth = depth
+        self.counts = counts if counts is not None else array('Q', bytes(8 * width * depth))
+
+    def _cells(self, key):
+        """One counter index per row"""
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.depth).digest()
+        width = self.width
+        return [row * width + int.from_bytes(digest[4 * row:4 * row + 4], 'little') % width
+                for row in range(self.depth)]
+
+    def add(self, key, n=1):
+        """Count a key; returns its new estimate"""
+        counts = self.counts
+        estimate = None
+        for cell in self._cells(key):
+            counts[cell] += n
+            if estimate is None or counts[cell] < estimate:
+                estimate = counts[cell]
+        return estimate
+
+    def estimate(self, key):
+        """Estimated count of a key"""
+        return min(self.counts[cell] for cell in self._cells(key))
+
+    def merge(self, other):
+        """Add another sketch's counters to this one"""
+        self.counts = array('Q', map(sum, zip(self.counts, other.counts)))
+
+
+class UsageStats:
+    """Per-process usage counters, mergeable across worker processes"""
+
+    def __init__(self, directory=None, flush_interval=5.0, top_k=10, precision=10):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.top_k = top_k
+        self.precision = precision
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one writer of this process's file at a time
+        self._reset()
+
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        # A forked worker starts from zero and writes its own file
+        def reset_in_child(ref=weakref.ref(self)):
+            stats = ref()
+            if stats is not None:
+                stats._lock = threading.Lock()
+                stats._flush_lock = threading.Lock()
+                stats._reset()
+        os.register_at_fork(after_in_child=reset_in_child)
+
+    def _reset(self):
+        """Start from empty counters"""
+        self.routes = {}              # route -> requests
+        self.minutes = OrderedDict()  # minute number -> HyperLogLog, last hour only
+        self.paths = CountMinSketch()
+        self.candidates = {}          # path -> estimate, at most 2 * top_k
+        self._last_flush = time.monotonic()
+
+    def record(self, route, path, client, now=None):
+        """Count one request"""
+        minute = int((time.time() if now is None else now) // 60)
+        client_hash = hash64(client)
+        with self._lock:
+            self.routes[route] = self.routes.get(route, 0) + 1
+
+            sketch = self.minutes.get(minute)
+            if sketch is None:
+                sketch = self.minutes[minute] = HyperLogLog(self.precision)
+                while next(iter(self.minutes)) <= minute - WINDOWS[-1]:
+                    self.minutes.popitem(last=False)
+            sketch.add_hash(client_hash)
+
+            self.candidates[path] = self.paths.add(path)
+            if len(self.candidates) > 2 * self.top_k:
+                kept = sorted(self.candidates.items(), key=lambda item: item[1], reverse=True)
+                self.candidates = dict(kept[:self.top_k])
+
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def snapshot(self):
+        """JSON-serializable state of this process"""
+        with self._lock:
+            return {
+                'routes': dict(self.routes),
+                'minutes': [[minute, base64.b64encode(sketch.registers).decode('ascii')]
+                            for minute, sketch in self.minutes.items()],
+                'paths': base64.b64encode(self.paths.counts.tobytes()).decode('ascii'),
+                'candidates': list(self.candidates)
+            }
+
+    def path(self):
+        """File holding this worker's state"""
+        return os.path.join(self.directory, f'usage-{os.getpid()}.json')
+
+    def flush(self):
+        """Write this process's state for the other workers to read"""
+        self._last_flush = time.monotonic()
+        path = self.path()
+        tmp_path = f'{path}.tmp'
+        with self._flush_lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+
+    def _snapshots(self):
+        """This process's state plus the files of the other workers"""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = os.path.basename(self.path())
+            for name in os.listdir(self.directory):
+                if name.startswith('usage-') and name.endswith('.json') and name != own:
+                    try:
+                        with open(os.path.join(self.directory, name)) as f:
+                            snapshots.append(json.load(f))
+                    except (OSError, ValueError):
+                        continue  # a worker is replacing its file
+        return snapshots
+
+    def report(self, now=None):
+        """Merged statistics of every worker"""
+        minute = int((time.time() if now is None else now) // 60)
+        snapshots = self._snapshots()
+
+        routes = {}
+        windows = {window: HyperLogLog(self.precision) for window in WINDOWS}
+        paths = CountMinSketch()
+        candidates = set()
+        for snapshot in snapshots:
+            for route, n in snapshot['routes'].items():
+                routes[route] = routes.get(route, 0) + n
+            for sketch_minute, registers in snapshot['minutes']:
+                sketch = HyperLogLog(self.precision, base64.b64decode(registers))
+                for window in WINDOWS:
+                    if minute - window < sketch_minute <= minute:
+                        windows[window].merge(sketch)
+            counts = array('Q')
+            counts.frombytes(base64.b64decode(snapshot['paths']))
+            paths.merge(CountMinSketch(counts=counts))
+            candidates.update(snapshot['candidates'])
+
+        top = sorted(((paths.estimate(path), path) for path in candidates), reverse=True)
+        return {
+            'total_requests': sum(routes.values()),
+            'requests_per_route': dict(sorted(routes.items(), key=lambda item: item[1], reverse=True)),
+            'active_users': {f'{window}m': windows[window].count() for window in WINDOWS},
+            'top_endpoints': [{'path': path, 'requests': n} for n, path in top[:self.top_k]],
+            'workers': len(snapshots)
+        }
+
+
+def setup_usage_stats(app, identity, directory=None, flush_interval=5.0):
+    """Count every request of an app; identity() names the client"""
+    stats = UsageStats(directory, flush_interval)
+
+    @app.after_request
+    def record_usage(response):
+        rule = request.url_rule
+        route = rule.rule if rule is not None else '<unmatched>'
+        # Unmatched paths are arbitrary strings; keep them out of the sketch
+        stats.record(route, request.path if rule is not None else route, identity())
+        return response
+
+    app.extensions['usage_stats'] = stats
+    return stats
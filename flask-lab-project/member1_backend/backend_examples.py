@@ -6,24 +6,98 @@ This file demonstrates backend features that Member 1 can implement.
 Copy relevant code to main/app.py or create separate modules.
 """
 
-from flask import Flask, jsonify, request
-from datetime import datetime
+from flask import Flask, has_app_context, jsonify, request
+from datetime import datetime, timedelta
+from collections.abc import Mapping
+from array import array
+from contextlib import nullcontext
+import bisect
+import heapq
 import json
+import math
+import os
+import re
+import sys
+import threading
+
+# Shared helpers live next to the main application
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'main')))
+from ingest import iter_records, IngestError, MAX_REPORTED_ERRORS
+from http_cache import ResponseCache, conditional
+from events import EventBroker
+from structured_log import default_logger
+from api_keys import KeyRegistry
+from jobs import setup_jobs, wants_async, job_accepted, queue_full
+
+# Records processed together by the batch ingestion endpoint
+BATCH_CHUNK_SIZE = 1000
+
+# Compact records store timestamps as integer microseconds since this
+# (naive, local wall-clock) epoch, the same clock as datetime.now()
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Pagination defaults for list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def page_args():
+    """Read ?after=, ?limit= and ?fields= from the current request"""
+    after = max(request.args.get('after', 0, type=int), 0)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    
+    fields = request.args.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+    return after, limit, fields or None
+
+
+def project(record, fields):
+    """Keep only the requested top-level fields (the id is always kept)"""
+    if fields is None:
+        return record.to_dict() if isinstance(record, CompactRecord) else record
+    
+    projected = {'id': record['id']}
+    for field in fields:
+        if field in record:
+            projected[field] = record[field]
+    return projected
+
 
 # Example 1: User Management Routes
-def create_user_routes(app):
+def create_user_routes(app, persistence=None, shared=None):
     """User management endpoints"""
     
-    # In-memory storage (for demo - use database in production)
-    users = []
+    # In-memory storage, optionally made durable by a Persistence instance
+    # or shared between worker processes by a SharedStore
+    users = Collection('users', indexes=('email',), record_type=UserRecord)
+    if persistence is not None:
+        persistence.attach(users)
+    if shared is not None:
+        shared.attach(users)
+        shared.init_app(app)
+    cache = ResponseCache()
     
     @app.route('/api/users', methods=['GET'])
+    @conditional(cache, lambda: users.version)
     def get_users():
-        """Get all users"""
+        """Get a page of users, optionally filtered by email"""
+        after, limit, fields = page_args()
+        email = request.args.get('email')
+        
+        if email:
+            results, next_cursor = users.find_by('email', email), None
+        else:
+            results, next_cursor = users.page(after, limit)
+        
         return jsonify({
             'status': 'success',
-            'count': len(users),
-            'users': users
+            'count': len(results),
+            'total': len(users),
+            'next_cursor': next_cursor,
+            'users': [project(user, fields) for user in results]
         }), 200
     
     @app.route('/api/users', methods=['POST'])
@@ -37,24 +111,29 @@ def create_user_routes(app):
                 'message': 'Name and email are required'
             }), 400
         
-        user = {
-            'id': len(users) + 1,
+        if not isinstance(data['email'], str):
+            return jsonify({
+                'status': 'error',
+                'message': 'Email must be a string'
+            }), 400
+        
+        user = users.insert({
             'name': data['name'],
             'email': data['email'],
             'created_at': datetime.now().isoformat()
-        }
-        users.append(user)
+        })
         
         return jsonify({
             'status': 'success',
             'message': 'User created successfully',
-            'user': user
+            'user': user.to_dict()
         }), 201
     
     @app.route('/api/users/<int:user_id>', methods=['GET'])
+    @conditional(cache, lambda: users.version)
     def get_user(user_id):
         """Get specific user by ID"""
-        user = next((u for u in users if u['id'] == user_id), None)
+        user = users.get(user_id)
         
         if not user:
             return jsonify({
@@ -64,7 +143,7 @@ def create_user_routes(app):
         
         return jsonify({
             'status': 'success',
-            'user': user
+            'user': user.to_dict()
         }), 200
 
 
@@ -72,14 +151,22 @@ def create_user_routes(app):
 class DataProcessor:
     """Backend business logic for data processing"""
     
+    MISSING = object()     # placeholder for absent fields in column inputs
+    NOT_OBJECT = object()  # placeholder for both fields of a record that is not an object
+    
     @staticmethod
     def validate_data(data):
         """Validate incoming data"""
         required_fields = ['name', 'message']
         
+        if not isinstance(data, dict):
+            return False, "Data must be a JSON object"
+        
         for field in required_fields:
             if field not in data:
                 return False, f"Missing required field: {field}"
+            if not isinstance(data[field], str):
+                return False, f"Field must be a string: {field}"
         
         if len(data['name']) < 2:
             return False, "Name must be at least 2 characters"
@@ -104,6 +191,69 @@ class DataProcessor:
         }
         return processed
     
+    @staticmethod
+    def to_columns(records):
+        """Split records into (names, messages) columns"""
+        missing = DataProcessor.MISSING
+        names = []
+        messages = []
+        for record in records:
+            if isinstance(record, dict):
+                names.append(record.get('name', missing))
+                messages.append(record.get('message', missing))
+            else:
+                names.append(DataProcessor.NOT_OBJECT)
+                messages.append(DataProcessor.NOT_OBJECT)
+        return names, messages
+    
+    @staticmethod
+    def validate_many(names, messages):
+        """Validate name/message columns; returns an error or None per row"""
+        missing = DataProcessor.MISSING
+        errors = []
+        for name, message in zip(names, messages):
+            if name is DataProcessor.NOT_OBJECT:
+                errors.append("Data must be a JSON object")
+            elif not isinstance(name, str):
+                errors.append("Missing required field: name" if name is missing
+                              else "Field must be a string: name")
+            elif not isinstance(message, str):
+                errors.append("Missing required field: message" if message is missing
+                              else "Field must be a string: message")
+            elif len(name) < 2:
+                errors.append("Name must be at least 2 characters")
+            elif len(message) < 5:
+                errors.append("Message must be at least 5 characters")
+            else:
+                errors.append(None)
+        return errors
+    
+    @staticmethod
+    def process_many(names, messages):
+        """Process validated columns in bulk with one timestamp per batch"""
+        return {
+            'name': [name.strip().title() for name in names],
+            'message': list(map(str.strip, messages)),
+            'word_count': array('I', map(len, map(str.split, messages))),
+            'char_count': array('I', map(len, messages)),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def iter_processed(columns):
+        """Yield process_data-style 'processed' dicts from process_many output"""
+        timestamp = columns['timestamp']
+        for name, message, word_count, char_count in zip(
+                columns['name'], columns['message'],
+                columns['word_count'], columns['char_count']):
+            yield {
+                'name': name,
+                'message': message,
+                'word_count': word_count,
+                'char_count': char_count,
+                'timestamp': timestamp
+            }
+    
     @staticmethod
     def calculate_statistics(data_list):
         """Calculate statistics from data"""
@@ -127,24 +277,198 @@ class DataProcessor:
         }
 
 
+# Example 2b: Running Statistics
+class RunningStatistics:
+    """Message statistics maintained incrementally on create/delete
+    
+    Request threads and job workers share one instance, so every method
+    holds the (reentrant) lock.
+    """
+    
+    def __init__(self):
+        self.entries = {}       # item_id -> (length, word count, message)
+        self.total_length = 0
+        self.total_words = 0
+        self._longest = []      # heap of (-length, item_id)
+        self._shortest = []     # heap of (length, item_id)
+        self._lock = threading.RLock()
+    
+    def add(self, item_id, message):
+        """Account for a new message"""
+        with self._lock:
+            self.remove(item_id)
+            
+            length = len(message)
+            words = len(message.split())
+            self.entries[item_id] = (length, words, message)
+            self.total_length += length
+            self.total_words += words
+            heapq.heappush(self._longest, (-length, item_id))
+            heapq.heappush(self._shortest, (length, item_id))
+    
+    def remove(self, item_id):
+        """Stop accounting for a deleted message"""
+        with self._lock:
+            entry = self.entries.pop(item_id, None)
+            if entry is None:
+                return False
+            
+            length, words, message = entry
+            self.total_length -= length
+            self.total_words -= words
+            
+            # Heap entries are dropped lazily; rebuild once most are stale
+            if len(self._longest) > 2 * len(self.entries) + 16:
+                self._longest = [(-e[0], i) for i, e in self.entries.items()]
+                self._shortest = [(e[0], i) for i, e in self.entries.items()]
+                heapq.heapify(self._longest)
+                heapq.heapify(self._shortest)
+            return True
+    
+    def _peek(self, heap):
+        """Return the message at the top of a heap, skipping stale entries"""
+        while heap and heap[0][1] not in self.entries:
+            heapq.heappop(heap)
+        return self.entries[heap[0][1]][2]
+    
+    def snapshot(self):
+        """Return the same shape as DataProcessor.calculate_statistics"""
+        with self._lock:
+            if not self.entries:
+                return {
+                    'total': 0,
+                    'average_length': 0,
+                    'longest': None,
+                    'shortest': None
+                }
+            
+            return {
+                'total': len(self.entries),
+                'average_length': self.total_length / len(self.entries),
+                'longest': self._peek(self._longest),
+                'shortest': self._peek(self._shortest),
+                'total_words': self.total_words
+            }
+
+
 # Example 3: Advanced API Routes with Processing
-def create_advanced_routes(app):
-    """Advanced backend routes with business logic"""
+def create_advanced_routes(app, persistence=None, shared=None, jobs=None):
+    """Advanced backend routes with business logic
+    
+    With a jobs queue (see main/jobs.py), POST /api/messages also accepts
+    "Prefer: respond-async": the message is validated, answered with 202
+    and processed, stored and indexed in the background.
+    """
     
     # Storage
-    messages = []
+    messages = Collection('messages', record_type=MessageRecord)
     processor = DataProcessor()
+    statistics = RunningStatistics()
+    search_index = SearchIndex()
+    cache = ResponseCache()
+    broker = EventBroker()
+    
+    def index_message(record):
+        """Feed a stored message into the statistics and search index"""
+        processed = record['processed']
+        statistics.add(record['id'], processed['message'])
+        search_index.add(
+            record['id'],
+            processed['name'],
+            processed['message']
+        )
+    
+    def reindex_message(old, new):
+        """Follow a change made by another worker process"""
+        if new is not None:
+            index_message(new)
+        else:
+            statistics.remove(old['id'])
+            search_index.remove(old['id'])
+        
+        # Our subscribers hear of it too (a forked worker catching up
+        # outside any request has none yet)
+        if not has_app_context():
+            return
+        if new is not None:
+            publish_created(new)
+        else:
+            publish_deleted(old['id'])
+    
+    def store_message(data):
+        """Validate, process and store one message: (record, error)"""
+        is_valid, message = processor.validate_data(data)
+        if not is_valid:
+            return None, message
+        
+        record = messages.insert(processor.process_data(data))
+        index_message(record)
+        return record, None
+    
+    def publish_created(record):
+        """Tell event stream subscribers about a new message"""
+        broker.publish('message_created', {
+            'message': project(record, ['processed']),
+            'statistics': statistics.snapshot()
+        })
+    
+    def publish_deleted(message_id):
+        """Tell event stream subscribers a message is gone"""
+        broker.publish('message_deleted', {
+            'id': message_id,
+            'statistics': statistics.snapshot()
+        })
+    
+    def process_message(data):
+        """Background half of an async create (data already validated)"""
+        # process_data is CPU work and picklable: the process pool can take it
+        processed = jobs.run_cpu(DataProcessor.process_data, data)
+        record = messages.insert(processed)
+        index_message(record)
+        publish_created(record)
+        return record.to_dict()
+    
+    def store_messages(records):
+        """Bulk variant of store_message; returns (record, error) per input"""
+        names, texts = processor.to_columns(records)
+        errors = processor.validate_many(names, texts)
+        valid = [i for i, error in enumerate(errors) if error is None]
+        
+        columns = processor.process_many([names[i] for i in valid], [texts[i] for i in valid])
+        compact = MessageRecord.from_columns([records[i] for i in valid], columns)
+        results = [(None, error) for error in errors]
+        with messages.write_lock:  # one shared-store commit per chunk
+            for i, record in zip(valid, compact):
+                messages.insert(record)
+                index_message(record)
+                results[i] = (record, None)
+        return results
+    
+    if persistence is not None:
+        persistence.attach(messages)
+    if shared is not None:
+        shared.attach(messages, listener=reindex_message)
+        shared.init_app(app)
+    if jobs is not None and app.extensions.get('jobs') is not jobs:
+        setup_jobs(app, jobs)
+    for restored in messages:
+        index_message(restored)
     
     @app.route('/api/messages', methods=['GET'])
+    @conditional(cache, lambda: messages.version)
     def get_messages():
-        """Get all messages with statistics"""
-        stats = processor.calculate_statistics(messages)
+        """Get a page of messages with statistics"""
+        after, limit, fields = page_args()
+        page, next_cursor = messages.page(after, limit)
+        stats = statistics.snapshot()
         
         return jsonify({
             'status': 'success',
-            'count': len(messages),
+            'count': len(page),
+            'total': len(messages),
+            'next_cursor': next_cursor,
             'statistics': stats,
-            'messages': messages
+            'messages': [project(message, fields) for message in page]
         }), 200
     
     @app.route('/api/messages', methods=['POST'])
@@ -152,46 +476,130 @@ def create_advanced_routes(app):
         """Create a new message with validation and processing"""
         data = request.get_json()
         
-        # Validate
-        is_valid, message = processor.validate_data(data)
-        if not is_valid:
+        if jobs is not None and wants_async():
+            # Validation stays inline so bad input still gets its 400 now
+            is_valid, message = processor.validate_data(data)
+            if not is_valid:
+                return jsonify({
+                    'status': 'error',
+                    'message': message
+                }), 400
+            
+            job = jobs.submit(process_message, data, name='create_message')
+            return job_accepted(job) if job is not None else queue_full()
+        
+        processed, error = store_message(data)
+        if error is not None:
             return jsonify({
                 'status': 'error',
-                'message': message
+                'message': error
             }), 400
         
-        # Process
-        processed = processor.process_data(data)
-        processed['id'] = len(messages) + 1
-        messages.append(processed)
+        publish_created(processed)
         
         return jsonify({
             'status': 'success',
             'message': 'Message created and processed',
-            'data': processed
+            'data': processed.to_dict()
+        }), 201
+    
+    @app.route('/api/messages/batch', methods=['POST'])
+    def create_messages_batch():
+        """Create many messages from a JSON array or NDJSON stream
+        
+        Answers with counts and the first MAX_REPORTED_ERRORS rejected
+        records (index and reason), not one result per record.
+        """
+        accepted = rejected = 0
+        errors = []
+        pending = []  # (index, record, parse error) awaiting bulk processing
+        
+        def flush():
+            nonlocal accepted, rejected
+            parsed = [(index, record) for index, record, error in pending if error is None]
+            stored = dict(zip(
+                [index for index, record in parsed],
+                store_messages([record for index, record in parsed])
+            ))
+            
+            for index, record, error in pending:
+                if error is None:
+                    record, error = stored[index]
+                if error is None:
+                    accepted += 1
+                else:
+                    rejected += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append({'index': index, 'message': error})
+            pending.clear()
+        
+        try:
+            for index, (data, error) in enumerate(iter_records(request.stream, request.content_type)):
+                pending.append((index, data, error))
+                if len(pending) >= BATCH_CHUNK_SIZE:
+                    flush()
+            flush()
+        
+        except IngestError as e:
+            flush()
+            parse_error = str(e)
+        else:
+            parse_error = None
+        
+        # One summary event instead of one per record; clients reload
+        if accepted:
+            broker.publish('messages_batch', {
+                'accepted': accepted,
+                'statistics': statistics.snapshot()
+            })
+        
+        if parse_error is not None:
+            return jsonify({
+                'status': 'error',
+                'message': f'Error processing batch: {parse_error}',
+                'accepted': accepted,
+                'rejected': rejected,
+                'errors': errors
+            }), 400
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'Batch processed',
+            'accepted': accepted,
+            'rejected': rejected,
+            'errors': errors
         }), 201
     
     @app.route('/api/messages/<int:message_id>', methods=['DELETE'])
     def delete_message(message_id):
         """Delete a message"""
-        global messages
-        original_count = len(messages)
-        messages = [m for m in messages if m.get('id') != message_id]
+        message = messages.delete(message_id)
         
-        if len(messages) == original_count:
+        if message is None:
             return jsonify({
                 'status': 'error',
                 'message': 'Message not found'
             }), 404
         
+        statistics.remove(message_id)
+        search_index.remove(message_id)
+        publish_deleted(message_id)
+        
         return jsonify({
             'status': 'success',
             'message': 'Message deleted successfully'
         }), 200
     
+    @app.route('/api/stream', methods=['GET'])
+    def stream_messages():
+        """Server-sent events: message create/delete deltas and statistics"""
+        last_event_id = request.headers.get('Last-Event-ID')
+        return broker.response(last_event_id)
+    
     @app.route('/api/messages/search', methods=['GET'])
+    @conditional(cache, lambda: messages.version)
     def search_messages():
-        """Search messages by keyword"""
+        """Search messages by keyword (ranked, paginated)"""
         keyword = request.args.get('q', '').lower()
         
         if not keyword:
@@ -200,77 +608,626 @@ def create_advanced_routes(app):
                 'message': 'Search query required'
             }), 400
         
-        results = [
-            msg for msg in messages 
-            if keyword in msg['processed']['message'].lower() or 
-               keyword in msg['processed']['name'].lower()
-        ]
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        prefix = request.args.get('mode', 'prefix') != 'term'
+        
+        total, hits = search_index.search(
+            keyword, limit=limit, offset=offset, prefix=prefix
+        )
+        # A hit can outlive its message by a moment (deleted while indexing)
+        found = (messages.get(doc_id) for doc_id, score in hits)
+        results = [record.to_dict() for record in found if record is not None]
         
         return jsonify({
             'status': 'success',
             'query': keyword,
+            'total': total,
             'count': len(results),
+            'limit': limit,
+            'offset': offset,
             'results': results
         }), 200
 
 
+# Example 3b: Search Index
+class SearchIndex:
+    """Incremental inverted index used by the message search endpoint
+    
+    Request threads and job workers share one index: add, remove and
+    search hold the (reentrant) lock, so a search never iterates a
+    posting that is being changed.
+    """
+    
+    TOKEN_PATTERN = re.compile(r'\w+')
+    
+    def __init__(self):
+        self.postings = {}    # token -> {doc_id: term frequency}
+        self.documents = {}   # doc_id -> {token: term frequency}
+        self.vocabulary = []  # sorted tokens, used for prefix lookups
+        self._lock = threading.RLock()
+    
+    @classmethod
+    def tokenize(cls, text):
+        """Split text into lowercase word tokens"""
+        return cls.TOKEN_PATTERN.findall(text.lower())
+    
+    def add(self, doc_id, *fields):
+        """Index a document, replacing any previous version"""
+        with self._lock:
+            self.remove(doc_id)
+            
+            counts = {}
+            for field in fields:
+                for token in self.tokenize(field):
+                    counts[token] = counts.get(token, 0) + 1
+            
+            self.documents[doc_id] = counts
+            for token, frequency in counts.items():
+                posting = self.postings.get(token)
+                if posting is None:
+                    posting = self.postings[token] = {}
+                    bisect.insort(self.vocabulary, token)
+                posting[doc_id] = frequency
+    
+    def remove(self, doc_id):
+        """Drop a document from the index"""
+        with self._lock:
+            counts = self.documents.pop(doc_id, None)
+            if counts is None:
+                return False
+            
+            for token in counts:
+                posting = self.postings[token]
+                del posting[doc_id]
+                if not posting:
+                    del self.postings[token]
+                    del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+            return True
+    
+    def expand(self, term, prefix=True):
+        """Return the indexed tokens matching a query term"""
+        with self._lock:
+            if not prefix:
+                return [term] if term in self.postings else []
+            
+            matches = []
+            position = bisect.bisect_left(self.vocabulary, term)
+            while (position < len(self.vocabulary)
+                   and self.vocabulary[position].startswith(term)):
+                matches.append(self.vocabulary[position])
+                position += 1
+            return matches
+    
+    def search(self, query, limit=20, offset=0, prefix=True):
+        """Return (total, [(doc_id, score), ...]) for documents matching all terms"""
+        with self._lock:
+            terms = set(self.tokenize(query))
+            if not terms:
+                return 0, []
+            
+            doc_count = len(self.documents)
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token in self.expand(term, prefix):
+                    posting = self.postings[token]
+                    idf = math.log(1 + doc_count / len(posting))
+                    for doc_id, frequency in posting.items():
+                        term_scores[doc_id] = term_scores.get(doc_id, 0) + frequency * idf
+                
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        doc_id: score + term_scores[doc_id]
+                        for doc_id, score in scores.items()
+                        if doc_id in term_scores
+                    }
+                if not scores:
+                    return 0, []
+            
+            ranked = heapq.nsmallest(
+                offset + limit,
+                scores.items(),
+                key=lambda item: (-item[1], item[0])
+            )
+            return len(scores), ranked[offset:]
+
+
+# Example 3c: Compact Records
+def to_epoch_us(timestamp):
+    """isoformat() timestamp -> integer microseconds since EPOCH"""
+    return (datetime.fromisoformat(timestamp) - EPOCH) // MICROSECOND
+
+
+def from_epoch_us(value):
+    """Integer microseconds since EPOCH -> isoformat() timestamp"""
+    return (EPOCH + value * MICROSECOND).isoformat()
+
+
+def intern_str(value):
+    """Share one copy of a frequently repeated string (other values unchanged)"""
+    return sys.intern(value) if type(value) is str else value
+
+
+class CompactRecord(Mapping):
+    """Read-only mapping view of a __slots__ row; only the id can be assigned
+    
+    A stored dict record costs several hundred bytes before its text: one
+    hash table per nested object plus a timestamp string. Compact records
+    keep the same data as slots (repeated strings interned, timestamps as
+    integers) and build the dict form only when a record is serialized.
+    Collection(record_type=...) converts incoming dicts.
+    """
+    
+    __slots__ = ()
+    
+    FIELDS = ()  # what to_row() returns, in order; 'id' first
+    
+    def __len__(self):
+        return sum(1 for _ in self)
+    
+    def __setitem__(self, key, value):
+        if key != 'id':
+            raise TypeError(f'{type(self).__name__} is read-only except for its id')
+        self.id = value
+    
+    def to_dict(self):
+        """The plain (JSON-ready) dict form"""
+        return {key: self[key] for key in self}
+    
+    @classmethod
+    def from_rows(cls, rows):
+        """Records for many to_row() tuples (a snapshot being restored)"""
+        return map(cls.from_row, rows)
+    
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+
+class MessageRecord(CompactRecord):
+    """A stored message, {'original', 'processed', 'id'} as a dict"""
+    
+    __slots__ = ('id', 'name', 'message', 'original_name', 'original_message',
+                 'extra', 'word_count', 'created')
+    
+    KEYS = ('original', 'processed', 'id')
+    FIELDS = ('id', 'name', 'message', 'original_name', 'original_message',
+              'extra', 'word_count', 'created')
+    
+    def __init__(self, original, name, message, word_count, created, id=None):
+        self.id = id
+        self.original_name = intern_str(original['name'])
+        self.original_message = original['message']
+        self.extra = {key: value for key, value in original.items()
+                      if key not in ('name', 'message')} or None
+        self.name = intern_str(name)
+        # The processed text is usually the input already (strip() changed
+        # nothing): keep one copy
+        self.message = self.original_message if message == self.original_message else message
+        self.word_count = word_count
+        self.created = created
+    
+    @classmethod
+    def from_dict(cls, record):
+        """Compact form of a DataProcessor.process_data result"""
+        processed = record['processed']
+        return cls(record['original'], processed['name'], processed['message'],
+                   processed['word_count'], to_epoch_us(processed['timestamp']), record.get('id'))
+    
+    @classmethod
+    def from_columns(cls, originals, columns):
+        """Yield records for DataProcessor.process_many output"""
+        created = to_epoch_us(columns['timestamp'])
+        for original, name, message, word_count in zip(
+                originals, columns['name'], columns['message'], columns['word_count']):
+            yield cls(original, name, message, word_count, created)
+    
+    def to_row(self):
+        """Slot values in FIELDS order, the form snapshots store (see persistence.py)"""
+        # None for a message that is the original text: saved once
+        message = None if self.message is self.original_message else self.message
+        return (self.id, self.name, message, self.original_name, self.original_message,
+                self.extra, self.word_count, self.created)
+    
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild a record from to_row() values, without parsing anything"""
+        record = object.__new__(cls)
+        (record.id, name, message, original_name, record.original_message,
+         record.extra, record.word_count, record.created) = row
+        record.name = intern_str(name)
+        record.original_name = intern_str(original_name)
+        record.message = record.original_message if message is None else message
+        return record
+    
+    @classmethod
+    def from_rows(cls, rows):
+        """from_row() for many rows, inlined: restores are dominated by it"""
+        new = object.__new__
+        intern = sys.intern
+        for item_id, name, message, original_name, original_message, extra, word_count, created in rows:
+            record = new(cls)
+            record.id = item_id
+            record.name = intern(name)
+            record.message = original_message if message is None else message
+            record.original_name = intern(original_name)
+            record.original_message = original_message
+            record.extra = extra
+            record.word_count = word_count
+            record.created = created
+            yield record
+    
+    def __iter__(self):
+        return iter(self.KEYS)
+    
+    def __len__(self):
+        return len(self.KEYS)
+    
+    def __getitem__(self, key):
+        if key == 'id':
+            return self.id
+        if key == 'processed':
+            return {
+                'name': self.name,
+                'message': self.message,
+                'word_count': self.word_count,
+                'char_count': len(self.original_message),
+                'timestamp': from_epoch_us(self.created)
+            }
+        if key == 'original':
+            original = {'name': self.original_name, 'message': self.original_message}
+            if self.extra:
+                original.update(self.extra)
+            return original
+        raise KeyError(key)
+
+
+class UserRecord(CompactRecord):
+    """A stored user, {'name', 'email', 'created_at', ..., 'id'} as a dict"""
+    
+    __slots__ = ('id', 'name', 'email', 'created', 'extra')
+    
+    FIELDS = ('id', 'name', 'email', 'created', 'extra')
+    
+    def __init__(self, name, email, created, extra=None, id=None):
+        self.id = id
+        self.name = intern_str(name)
+        self.email = email
+        self.created = created
+        self.extra = extra or None
+    
+    @classmethod
+    def from_dict(cls, record):
+        """Compact form of a user dict"""
+        extra = {key: value for key, value in record.items()
+                 if key not in ('name', 'email', 'created_at', 'id')}
+        created = record.get('created_at')
+        return cls(record.get('name'), record.get('email'),
+                   to_epoch_us(created) if created is not None else None, extra, record.get('id'))
+    
+    def to_row(self):
+        """Slot values in FIELDS order, the form snapshots store (see persistence.py)"""
+        return (self.id, self.name, self.email, self.created, self.extra)
+    
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild a record from to_row() values, without parsing anything"""
+        record = object.__new__(cls)
+        record.id, name, record.email, record.created, record.extra = row
+        record.name = intern_str(name)
+        return record
+    
+    def __iter__(self):
+        yield 'name'
+        yield 'email'
+        yield 'created_at'
+        if self.extra:
+            yield from self.extra
+        yield 'id'
+    
+    def __getitem__(self, key):
+        if key == 'id':
+            return self.id
+        if key == 'name':
+            return self.name
+        if key == 'email':
+            return self.email
+        if key == 'created_at':
+            return from_epoch_us(self.created) if self.created is not None else None
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+
 # Example 4: Database Helper (for future expansion)
+class Collection:
+    """In-memory table with a primary-key index and optional secondary indexes"""
+    
+    def __init__(self, name, indexes=(), record_type=None):
+        self.name = name
+        self.record_type = record_type  # e.g. MessageRecord: rows are kept compact
+        self.rows = {}      # id -> record, kept in insertion (= id) order
+        self.order = []     # sorted ids for keyset seeks; may hold deleted ids
+        self.next_id = 1    # ids are never reused, even after a delete
+        self.indexes = {field: {} for field in indexes}  # field -> value -> {id: None}
+        self.journal = None  # optional callable(op, name, payload), see persistence.py
+        self.write_lock = nullcontext()  # held around changes, see shared_store.py
+        self.version = 0     # bumped on every change; drives response caching
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    def __iter__(self):
+        return iter(self.rows.values())
+    
+    def __contains__(self, item_id):
+        return item_id in self.rows
+    
+    def _pack(self, record):
+        """Stored form of a record (compact if the collection has a record type)"""
+        if self.record_type is None or isinstance(record, self.record_type):
+            return record
+        return self.record_type.from_dict(record)
+    
+    def restore(self, records, next_id, fields=None, rows=()):
+        """Replace the contents with previously saved records
+        
+        records are dicts. rows are to_row() tuples of the record type,
+        in id order, as a snapshot keeps them: they are rebuilt without
+        parsing, provided fields (their layout) still match the type.
+        """
+        rows = list(rows)
+        if rows and (self.record_type is None or tuple(fields) != self.record_type.FIELDS):
+            raise ValueError(f'Saved rows of {self.name!r} have fields {fields}, '
+                             f'which {self.record_type} does not')
+        restored = {}
+        if rows:
+            restored = dict(zip([row[0] for row in rows], self.record_type.from_rows(rows)))
+        records = list(map(self._pack, records))
+        if records:
+            restored.update((record['id'], record) for record in records)
+            restored = {item_id: restored[item_id] for item_id in sorted(restored)}
+        self.rows = restored
+        self.order = list(self.rows)
+        self.next_id = next_id
+        self.version += 1
+        for index in self.indexes.values():
+            index.clear()
+        if self.indexes:
+            for record in self.rows.values():
+                self._index(record)
+    
+    def _index_keys(self, record):
+        """(index, value) pairs for a record; TypeError if a value is unhashable
+        
+        Computed before a change is made, so a bad value leaves the
+        collection untouched.
+        """
+        keys = [(index, record.get(field)) for field, index in self.indexes.items()]
+        for _, value in keys:
+            hash(value)
+        return keys
+    
+    def _index(self, record, keys=None):
+        """Add a record to every secondary index"""
+        for index, value in keys if keys is not None else self._index_keys(record):
+            index.setdefault(value, {})[record['id']] = None
+    
+    def _unindex(self, record):
+        """Remove a record from every secondary index"""
+        for field, index in self.indexes.items():
+            bucket = index.get(record.get(field))
+            if bucket is not None:
+                bucket.pop(record['id'], None)
+                if not bucket:
+                    del index[record.get(field)]
+    
+    def insert(self, record):
+        """Assign the next id to a record and store it; returns the stored record"""
+        record = self._pack(record)
+        keys = self._index_keys(record)
+        with self.write_lock:
+            record['id'] = self.next_id
+            self.next_id += 1
+            self.rows[record['id']] = record
+            self.order.append(record['id'])
+            self.version += 1
+            self._index(record, keys)
+            if self.journal is not None:
+                self.journal('put', self.name, record)
+        return record
+    
+    def get(self, item_id):
+        """Primary-key lookup"""
+        return self.rows.get(item_id)
+    
+    def all(self):
+        """Return every record in id order"""
+        return list(self.rows.values())
+    
+    def page(self, after=0, limit=DEFAULT_PAGE_SIZE):
+        """Return (records with id > after, next cursor or None)"""
+        position = bisect.bisect_right(self.order, after)
+        records = []
+        while position < len(self.order) and len(records) < limit:
+            record = self.rows.get(self.order[position])
+            if record is not None:
+                records.append(record)
+            position += 1
+        
+        while position < len(self.order) and self.order[position] not in self.rows:
+            position += 1
+        next_cursor = records[-1]['id'] if records and position < len(self.order) else None
+        return records, next_cursor
+    
+    def find_by(self, field, value):
+        """Find records by field, using a secondary index when declared"""
+        if field in self.indexes:
+            return [self.rows[item_id] for item_id in self.indexes[field].get(value, ())]
+        return [record for record in self.rows.values() if record.get(field) == value]
+    
+    def update(self, item_id, updates):
+        """Apply updates to a record; the id itself cannot change
+        
+        The stored row is replaced, never changed in place, so copies of
+        self.rows (see persistence.py snapshots) stay consistent.
+        """
+        with self.write_lock:
+            record = self.rows.get(item_id)
+            if record is None:
+                return None
+            
+            updated = self._pack({**record, **updates, 'id': item_id})
+            keys = self._index_keys(updated)
+            self._unindex(record)
+            record = self.rows[item_id] = updated
+            self.version += 1
+            self._index(record, keys)
+            if self.journal is not None:
+                self.journal('put', self.name, record)
+        return record
+    
+    def delete(self, item_id):
+        """Remove a record in amortized O(1), returning it (or None)"""
+        with self.write_lock:
+            record = self._remove(item_id)
+            if record is not None and self.journal is not None:
+                self.journal('del', self.name, item_id)
+        return record
+    
+    def _remove(self, item_id):
+        """Drop a record from rows and indexes"""
+        record = self.rows.pop(item_id, None)
+        if record is not None:
+            self.version += 1
+            self._unindex(record)
+            # Deleted ids stay in self.order until they outnumber live ones
+            if len(self.order) > 2 * len(self.rows) + 32:
+                self.order = list(self.rows)
+        return record
+    
+    def apply(self, op, payload):
+        """Replay a change made elsewhere without journaling it; returns the old record"""
+        if op == 'seq':
+            self.next_id = max(self.next_id, payload)
+            return None
+        if op == 'del':
+            return self._remove(payload)
+        
+        record = self._pack(payload)
+        old = self.rows.get(record['id'])
+        if old is not None:
+            self._unindex(old)
+        elif self.order and record['id'] < self.order[-1]:
+            bisect.insort(self.order, record['id'])
+        else:
+            self.order.append(record['id'])
+        
+        self.rows[record['id']] = record
+        if old is None and self.order[-1] != record['id']:
+            self.rows = {item_id: self.rows[item_id] for item_id in sorted(self.rows)}
+        self.next_id = max(self.next_id, record['id'] + 1)
+        self.version += 1
+        self._index(record)
+        return old
+
+
 class DatabaseHelper:
     """Helper class for database operations (placeholder for real DB)"""
     
-    def __init__(self):
+    def __init__(self, indexes=None, persistence=None, shared=None):
+        self.indexes = indexes or {}  # collection -> secondary index fields
+        self.persistence = persistence
+        self.shared = shared  # SharedStore, for state shared between workers
         self.data = {}
     
+    def collection(self, name):
+        """Get a collection, creating (and restoring) it on first use"""
+        if name not in self.data:
+            self.data[name] = Collection(name, self.indexes.get(name, ()))
+            if self.persistence is not None:
+                self.persistence.attach(self.data[name])
+            if self.shared is not None:
+                self.shared.attach(self.data[name])
+        return self.data[name]
+    
+    def existing(self, name):
+        """Get a collection only if it has data here (or in another worker)"""
+        if self.shared is not None:
+            self.shared.refresh()
+            if name in self.shared.state:
+                return self.collection(name)
+        return self.data.get(name)
+    
     def save(self, collection, data):
         """Save data to collection"""
-        if collection not in self.data:
-            self.data[collection] = []
-        
-        data['id'] = len(self.data[collection]) + 1
         data['created_at'] = datetime.now().isoformat()
-        self.data[collection].append(data)
-        return data
+        return self.collection(collection).insert(data)
     
     def find_all(self, collection):
         """Get all items from collection"""
-        return self.data.get(collection, [])
+        found = self.existing(collection)
+        if found is None:
+            return []
+        return found.all()
     
     def find_by_id(self, collection, item_id):
         """Find item by ID"""
-        items = self.data.get(collection, [])
-        return next((item for item in items if item['id'] == item_id), None)
+        found = self.existing(collection)
+        if found is None:
+            return None
+        return found.get(item_id)
+    
+    def find_by(self, collection, field, value):
+        """Find items by field value"""
+        found = self.existing(collection)
+        if found is None:
+            return []
+        return found.find_by(field, value)
     
     def update(self, collection, item_id, updates):
         """Update an item"""
-        item = self.find_by_id(collection, item_id)
-        if item:
-            item.update(updates)
-            item['updated_at'] = datetime.now().isoformat()
-            return item
-        return None
+        found = self.existing(collection)
+        if found is None:
+            return None
+        updates = dict(updates, updated_at=datetime.now().isoformat())
+        return found.update(item_id, updates)
     
     def delete(self, collection, item_id):
         """Delete an item"""
-        if collection in self.data:
-            self.data[collection] = [
-                item for item in self.data[collection] 
-                if item['id'] != item_id
-            ]
-            return True
-        return False
+        found = self.existing(collection)
+        if found is None:
+            return False
+        return found.delete(item_id) is not None
 
 
 # Example 5: Authentication Middleware (simple example)
-def require_api_key(f):
-    """Decorator to require API key for routes"""
+# Hashed keys with scopes from API_KEYS_FILE (see main/api_keys.py); without
+# it only the development key 'your-secret-api-key' is accepted
+api_keys = KeyRegistry.from_environment()
+
+
+def has_valid_api_key(scope=None):
+    """Check the X-API-Key header of the current request (and its scope)"""
+    return api_keys.verify(request.headers.get('X-API-Key'), scope) is not None
+
+
+def require_api_key(f=None, scope=None):
+    """Decorator to require API key for routes
+    
+    Use as @require_api_key, or @require_api_key(scope='admin:read') to
+    also require a scope.
+    """
     from functools import wraps
     
+    if f is None:
+        return lambda view: require_api_key(view, scope)
+    
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        api_key = request.headers.get('X-API-Key')
-        
-        # Simple API key check (use proper auth in production)
-        if api_key != 'your-secret-api-key':
+        if not has_valid_api_key(scope):
             return jsonify({
                 'status': 'error',
                 'message': 'Invalid or missing API key'
@@ -281,23 +1238,53 @@ def require_api_key(f):
 
 
 # Example usage in routes:
-def create_protected_routes(app):
-    """Example of protected routes"""
+def create_protected_routes(app, stats_directory=None):
+    """Example of protected routes
+    
+    /api/admin/stats reports live usage counted by main/usage_stats.py;
+    pass stats_directory (e.g. METRICS_DIR) to combine all gunicorn workers.
+    """
+    # Admin-only subsystems are imported by the apps that use them
+    from rate_limit import client_identity
+    from usage_stats import setup_usage_stats
+    
+    # Visitors are told apart by verified key (else address), see rate_limit.py
+    app.extensions.setdefault('api_keys', api_keys)
+    usage = setup_usage_stats(app, client_identity, stats_directory)
     
     @app.route('/api/admin/stats', methods=['GET'])
-    @require_api_key
+    @require_api_key(scope='admin:read')
     def admin_stats():
         """Protected admin endpoint"""
+        stats = usage.report()
         return jsonify({
             'status': 'success',
             'message': 'This is a protected endpoint',
             'data': {
-                'total_requests': 1000,
-                'active_users': 50
+                'total_requests': stats['total_requests'],
+                'active_users': stats['active_users']['5m'],
+                'active_users_by_window': stats['active_users'],
+                'requests_per_route': stats['requests_per_route'],
+                'top_endpoints': stats['top_endpoints'],
+                'workers': stats['workers']
             }
         }), 200
 
 
+def create_profiling_routes(app):
+    """Opt-in profiling endpoints (see main/profiling.py), API-key protected
+    
+    GET /api/admin/profile?seconds=5 returns collapsed stacks for a flame
+    graph; requests sent with an X-Profile header (and the API key) get a
+    cProfile report, listed at /api/admin/profile/requests.
+    """
+    from profiling import setup_profiling
+    
+    return setup_profiling(app,
+                           protect=require_api_key(scope='admin:profile'),
+                           authorize=lambda: has_valid_api_key('admin:profile'))
+
+
 # Integration Example: How to add to main app.py
 """
 To integrate these features into main/app.py:
@@ -309,14 +1296,57 @@ To integrate these features into main/app.py:
 from flask import Flask
 app = Flask(__name__)
 
+# Optional: faster jsonify for every route below (see main/json_provider.py)
+# from json_provider import setup_json_provider
+# setup_json_provider(app)
+
+# Optional: request counts and latency histograms at /metrics (see main/metrics.py)
+# from metrics import setup_metrics
+# setup_metrics(app, os.environ.get('METRICS_DIR'))
+
+# Optional: gzip/brotli for large responses such as /api/messages pages
+# (see main/compression.py)
+# from compression import setup_compression
+# setup_compression(app)
+
+# Optional: JSON-lines request log written off the request thread
+# (see main/structured_log.py)
+# from structured_log import setup_logging
+# setup_logging(app, sample_rates={'/health': 100})
+
 # Add user routes
 create_user_routes(app)
 
 # Add advanced routes
 create_advanced_routes(app)
 
+# Optional: "Prefer: respond-async" on POST /api/messages, with job status
+# at /api/jobs/<id> (see main/jobs.py); processes=2 runs message
+# processing in a process pool
+# from jobs import JobQueue
+# create_advanced_routes(app, jobs=JobQueue(threads=4, processes=2))
+
 # Add protected routes
-create_protected_routes(app)
+create_protected_routes(app, stats_directory=os.environ.get('METRICS_DIR'))
+
+# Optional: sampling profiler and per-request cProfile (API key required)
+# create_profiling_routes(app)
+
+# Optional: keep users/messages across restarts (see persistence.py)
+# from persistence import Persistence
+# persistence = Persistence('data')
+# create_user_routes(app, persistence=persistence)
+# create_advanced_routes(app, persistence=persistence)
+
+# Optional: share users/messages between gunicorn workers (see shared_store.py)
+# from shared_store import SharedStore
+# shared = SharedStore('/dev/shm/flask-lab.arena')
+# create_user_routes(app, shared=shared)
+# create_advanced_routes(app, shared=shared)
+
+# Optional: serve over ASGI (see main/asgi.py): wrap this app with
+# asgi.create_application(app), or run main/app.py plus the user and
+# message routes with `uvicorn asgi:create_backend_application --factory`
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -359,29 +1389,27 @@ def setup_error_handlers(app):
 
 # Example 7: Logging Helper
 class Logger:
-    """Simple logging helper"""
+    """Simple logging helper (queued JSON lines, see main/structured_log.py)"""
     
     @staticmethod
     def log_request(endpoint, method, data=None):
         """Log API request"""
         log_entry = {
-            'timestamp': datetime.now().isoformat(),
             'endpoint': endpoint,
             'method': method,
             'data': data
         }
-        print(f"[{log_entry['timestamp']}] {method} {endpoint}")
+        default_logger.info('request', **log_entry)
         return log_entry
     
     @staticmethod
     def log_error(error, context=None):
         """Log error"""
         log_entry = {
-            'timestamp': datetime.now().isoformat(),
             'error': str(error),
             'context': context
         }
-        print(f"[ERROR] {log_entry['timestamp']}: {error}")
+        default_logger.error('error', **log_entry)
         return log_entry
 
 
@@ -394,7 +1422,12 @@ if __name__ == '__main__':
     print("- User management routes")
     print("- Data processing and validation")
     print("- Advanced API routes")
+    print("- Message search index")
     print("- Database helper class")
+    print("- Write-ahead log persistence (persistence.py)")
+    print("- Shared state across worker processes (shared_store.py)")
     print("- Authentication middleware")
+    print("- Live admin statistics (usage_stats.py)")
+    print("- Sampling profiler and per-request cProfile (profiling.py)")
     print("- Error handlers")
     print("- Logging utilities")
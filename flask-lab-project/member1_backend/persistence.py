@@ -0,0 +1,394 @@
+"""
+Member 1 - Backend Lead
+Durable persistence for the in-memory collections
+
+Every change to an attached Collection is appended to a write-ahead log
+(one JSON line per change). Periodically the full state is compacted into
+a columnar snapshot: the log is rotated aside and the snapshot is written
+by a background thread, so writers only pay for a shallow copy of the rows.
+On startup the snapshot is read column by column, then the (short) rotated
+and current logs are replayed on top of it.
+
+Snapshot layout: SNAPSHOT_MAGIC, then per collection a length-prefixed
+JSON header (name, next_id, fields, dict records, column kinds and
+sizes) followed by its columns, one per field of the record type: packed
+little-endian int64s for integer columns (ids, epoch timestamps, counts),
+a JSON list for anything else. Only plain values are decoded, so unlike
+pickle a snapshot cannot run code when it is loaded.
+
+Each process keeps its own in-memory copy; running several gunicorn
+workers against the same data directory is not supported here; use
+shared_store.py to share collections between workers.
+"""
+
+import contextlib
+import gc
+import itertools
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+
+SNAPSHOT_MAGIC = b'FLSNAP2\n'
+LENGTH = struct.Struct('<Q')  # size prefix of every section header
+
+
+@contextlib.contextmanager
+def gc_paused():
+    """Hold off the cyclic GC while a snapshot's objects are built
+
+    A restore creates millions of objects that all survive, so every
+    collection triggered meanwhile is wasted work (it more than doubled
+    restore time). Nothing in a snapshot forms reference cycles.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _encode_column(values):
+    """(kind, bytes) for one snapshot column"""
+    if all(type(value) is int for value in values):
+        try:
+            column = array('q', values)
+        except OverflowError:
+            pass
+        else:
+            if sys.byteorder != 'little':
+                column.byteswap()
+            return 'int64', column.tobytes()
+    return 'json', json.dumps(list(values), separators=(',', ':'), default=dict).encode('utf-8')
+
+
+def _decode_column(kind, data):
+    """The values of a column written by _encode_column()"""
+    if kind == 'int64':
+        column = array('q')
+        column.frombytes(data)
+        if sys.byteorder != 'little':
+            column.byteswap()
+        return column
+    if kind == 'json':
+        return json.loads(data)
+    raise ValueError(f'Unknown snapshot column kind: {kind!r}')
+
+
+def _read_exactly(f, size, path):
+    """size bytes from f; ValueError if the file ends first"""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError(f'Truncated snapshot file: {path}')
+    return data
+
+
+class WriteAheadLog:
+    """Append-only JSON-lines journal with group commit
+
+    append() returns once the entry is written to the OS, before it is
+    fsynced: the batch is fsynced when it holds fsync_batch entries or is
+    fsync_interval seconds old. An OS crash or power loss can therefore
+    lose the entries of the last unsynced batch even though their writes
+    were acknowledged (a killed process loses nothing). Use fsync_batch=1
+    to make every append durable before it returns.
+    """
+
+    def __init__(self, path, fsync_batch=64, fsync_interval=0.05):
+        self.path = path
+        self.fsync_batch = fsync_batch          # fsync after this many writes...
+        self.fsync_interval = fsync_interval    # ...or once this many seconds pass
+        self.entries = 0
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self._timer = None  # syncs a batch that is still pending when writes stop
+        self._lock = threading.Lock()
+        self._file = self._open()
+
+    def _open(self):
+        """Open for appending, first cutting off a torn final line
+
+        Otherwise the next entry would be glued onto the partial line and
+        every later replay would stop in front of it.
+        """
+        end = 0
+        for _, end in self.scan(self.path):
+            pass
+        if os.path.exists(self.path) and os.path.getsize(self.path) > end:
+            os.truncate(self.path, end)
+        return open(self.path, 'ab')
+
+    def append(self, entry):
+        """Write one entry; fsync when the current batch is full or old enough"""
+        # default=dict: compact rows (see backend_examples.CompactRecord) are mappings
+        line = json.dumps(entry, separators=(',', ':'), default=dict).encode('utf-8') + b'\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.entries += 1
+            self._pending += 1
+
+            if (self._pending >= self.fsync_batch
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval, self.sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def sync(self):
+        """Force pending writes to disk"""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        """sync() with the lock held"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending and not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def rotate(self, path):
+        """Move the log to path (whose contents are being snapshotted), start a new one"""
+        with self._lock:
+            self._sync()
+            self._file.close()
+            os.replace(self.path, path)
+            self._file = open(self.path, 'ab')
+            self.entries = 0
+
+    def truncate(self):
+        """Discard the log (after its contents were snapshotted)"""
+        with self._lock:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.entries = 0
+            self._pending = 0
+
+    def close(self):
+        """Sync and close the log file"""
+        with self._lock:
+            self._sync()
+            self._file.close()
+
+    @staticmethod
+    def scan(path):
+        """Yield (entry, end offset) per line, stopping at a torn final line"""
+        if not os.path.exists(path):
+            return
+        end = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    return
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    return
+                end += len(line)
+                yield entry, end
+
+    @classmethod
+    def replay(cls, path):
+        """Yield entries from a log file, stopping at a torn final line"""
+        for entry, _ in cls.scan(path):
+            yield entry
+
+
+class Persistence:
+    """Snapshot + write-ahead log storage for Collection objects"""
+
+    def __init__(self, directory, fsync_batch=64, fsync_interval=0.05,
+                 snapshot_every=10000):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = os.path.join(directory, 'snapshot.bin')
+        self.wal_path = os.path.join(directory, 'wal.jsonl')
+        self.rotated_wal_path = os.path.join(directory, 'wal.rotated.jsonl')
+        self.collections = {}
+        self._lock = threading.Lock()           # held around every change
+        self._snapshot_lock = threading.Lock()  # held while a snapshot is written
+
+        os.makedirs(directory, exist_ok=True)
+        with gc_paused():
+            self.state = self._recover()
+        self.wal = WriteAheadLog(self.wal_path, fsync_batch, fsync_interval)
+        if os.path.exists(self.rotated_wal_path):
+            # A snapshot did not finish: write it now, before the next
+            # rotation could replace the rotated log
+            with self._snapshot_lock:
+                self._write_snapshot(self.state)
+
+    def _recover(self):
+        """Load the last snapshot and replay the logs written after it
+
+        Per collection the state is {'next_id', 'fields', 'rows', 'records'}:
+        compact rows (tuples laid out as fields, see Collection.restore) as
+        the snapshot saved them, and dict records from the logs or from
+        collections without a record type.
+        """
+        state = self.load_snapshot(self.snapshot_path)
+
+        changed = {}  # name -> ids the logs replaced or deleted
+        entries = itertools.chain(WriteAheadLog.replay(self.rotated_wal_path),
+                                  WriteAheadLog.replay(self.wal_path))
+        for entry in entries:
+            saved = state.setdefault(entry['c'], {'next_id': 1, 'fields': None, 'rows': [], 'records': {}})
+            if entry['op'] == 'put':
+                record = entry['r']
+                saved['records'][record['id']] = record
+                saved['next_id'] = max(saved['next_id'], record['id'] + 1)
+                changed.setdefault(entry['c'], set()).add(record['id'])
+            elif entry['op'] == 'del':
+                saved['records'].pop(entry['id'], None)
+                changed.setdefault(entry['c'], set()).add(entry['id'])
+
+        for name, ids in changed.items():
+            saved = state[name]
+            if saved['rows']:
+                saved['rows'] = [row for row in saved['rows'] if row[0] not in ids]
+        return state
+
+    @staticmethod
+    def load_snapshot(path):
+        """Read a snapshot file, returning {} if there is none"""
+        if not os.path.exists(path):
+            return {}
+
+        state = {}
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                raise ValueError(f'Not a snapshot file: {path}')
+            while True:
+                prefix = f.read(LENGTH.size)
+                if not prefix:
+                    return state
+                header = json.loads(_read_exactly(f, LENGTH.unpack(prefix)[0], path))
+                columns = [_decode_column(kind, _read_exactly(f, size, path))
+                           for kind, size in header['columns']]
+                state[header['name']] = {
+                    'next_id': header['next_id'],
+                    'fields': header['fields'],
+                    'rows': list(zip(*columns)),
+                    'records': {record['id']: record for record in header['records']}
+                }
+
+    def attach(self, collection):
+        """Restore a collection from disk and journal its future changes"""
+        saved = self.state.pop(collection.name, None)
+        if saved is not None:
+            with gc_paused():
+                collection.restore(saved['records'].values(), saved['next_id'],
+                                   saved['fields'], saved['rows'])
+
+        self.collections[collection.name] = collection
+        collection.journal = self.record
+        return collection
+
+    def record(self, op, name, payload):
+        """Journal one change (called by Collection)"""
+        if op == 'put':
+            entry = {'op': op, 'c': name, 'r': payload}
+        else:
+            entry = {'op': op, 'c': name, 'id': payload}
+
+        with self._lock:
+            self.wal.append(entry)
+            if (self.snapshot_every and self.wal.entries >= self.snapshot_every
+                    and self._snapshot_lock.acquire(blocking=False)):
+                # Encoding runs in the background; writers carry on meanwhile
+                state = self._rotate()
+                threading.Thread(target=self._background_snapshot, args=(state,),
+                                 name='snapshot', daemon=True).start()
+
+    def snapshot(self):
+        """Compact every attached collection into a new snapshot (and wait for it)"""
+        with self._snapshot_lock:
+            with self._lock:
+                state = self._rotate()
+            self._write_snapshot(state)
+
+    def _rotate(self):
+        """Copy the rows and set the log aside (both locks held)"""
+        # Collections replace a changed row instead of mutating it, so
+        # shallow copies stay consistent while they are written
+        state = dict(self.state)  # collections that were never attached
+        for name, collection in self.collections.items():
+            state[name] = {
+                'next_id': collection.next_id,
+                'fields': getattr(collection.record_type, 'FIELDS', None),
+                'rows': [],
+                'records': dict(collection.rows)
+            }
+        self.wal.rotate(self.rotated_wal_path)
+        return state
+
+    def _background_snapshot(self, state):
+        """Thread target: write the snapshot, then let the next one start"""
+        try:
+            self._write_snapshot(state)
+        finally:
+            self._snapshot_lock.release()
+
+    def _write_snapshot(self, state):
+        """Write the snapshot and drop the rotated log (snapshot lock held)"""
+        # Compact records are saved as their rows (split into columns) and
+        # restored without parsing; anything else as plain dicts
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            for name, saved in state.items():
+                saved = self._saved_form(saved)
+                fields = saved['fields'] or ()
+                columns = [_encode_column(column) for column in zip(*saved['rows'])]
+                if not columns:
+                    columns = [_encode_column([]) for _ in fields]
+                header = json.dumps({
+                    'name': name,
+                    'next_id': saved['next_id'],
+                    'fields': saved['fields'],
+                    'records': list(saved['records'].values()),
+                    'columns': [(kind, len(data)) for kind, data in columns]
+                }, separators=(',', ':'), default=dict).encode('utf-8')
+                f.write(LENGTH.pack(len(header)))
+                f.write(header)
+                for _, data in columns:
+                    f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # Replaying the rotated log over the new snapshot is harmless, so a
+        # crash between the rename and the removal loses nothing.
+        if os.path.exists(self.rotated_wal_path):
+            os.remove(self.rotated_wal_path)
+
+    @staticmethod
+    def _saved_form(saved):
+        """A collection's state with its compact records turned into rows"""
+        rows = list(saved['rows'])
+        records = {}
+        for item_id, record in saved['records'].items():
+            if type(record) is dict:
+                records[item_id] = record
+            else:
+                rows.append(record.to_row())
+        if saved['rows'] and len(rows) > len(saved['rows']):
+            rows.sort(key=lambda row: row[0])
+        return {'next_id': saved['next_id'], 'fields': saved['fields'], 'rows': rows,
+                'records': records}
+
+    def close(self):
+        """Finish a running snapshot and flush the log; call on shutdown"""
+        with self._snapshot_lock, self._lock:
+            self.wal.close()
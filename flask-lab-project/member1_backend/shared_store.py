@@ -0,0 +1,319 @@
+"""
+Member 1 - Backend Lead
+Shared state for the in-memory collections across worker processes
+
+Each gunicorn worker has its own Collection objects, so without help a
+record created in one worker is invisible to the others. A SharedStore is
+a change log in a memory-mapped file (put it under /dev/shm for pure
+shared memory) that every worker maps:
+
+- writers take an exclusive lock (fcntl.flock plus a thread lock), catch
+  up with the log, apply their change locally and append it; ids are
+  therefore assigned in one global order
+- readers never lock the file: before each request they compare the
+  committed length in the header with what they have applied and replay
+  any new entries into their local collections
+
+When the log fills up it is compacted into a new file (live rows only,
+with room to grow) that atomically replaces the old one; the old header
+is then marked as moved so readers switch over.
+
+A collection is journaled either here or by Persistence, not both.
+"""
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+import weakref
+
+ARENA_MAGIC = b'FLARENA1'
+HEADER = struct.Struct('<8sQ')   # magic, committed end offset
+HEADER_SIZE = 64                 # entries start here
+END = struct.Struct('<Q')
+END_OFFSET = 8
+LENGTH = struct.Struct('<I')     # size prefix of every entry
+MOVED = 2 ** 64 - 1              # end value of a file replaced by compaction
+
+
+def apply_entry(state, entry):
+    """Apply a log entry to {name: {'next_id', 'rows'}} state"""
+    collection = state.setdefault(entry['c'], {'next_id': 1, 'rows': {}})
+    if entry['op'] == 'put':
+        record = entry['r']
+        collection['rows'][record['id']] = record
+        collection['next_id'] = max(collection['next_id'], record['id'] + 1)
+    elif entry['op'] == 'del':
+        collection['rows'].pop(entry['id'], None)
+    elif entry['op'] == 'seq':
+        collection['next_id'] = max(collection['next_id'], entry['next_id'])
+
+
+def read_entries(mm, start, end):
+    """Decode the entries between two arena offsets"""
+    entries = []
+    position = start
+    while position < end:
+        size = LENGTH.unpack_from(mm, position)[0]
+        position += LENGTH.size
+        entries.append(json.loads(mm[position:position + size]))
+        position += size
+    return entries
+
+
+def encode_entry(entry):
+    """Length-prefixed JSON bytes for one entry"""
+    # default=dict: compact rows (see backend_examples.CompactRecord) are mappings
+    data = json.dumps(entry, separators=(',', ':'), default=dict).encode('utf-8')
+    return LENGTH.pack(len(data)) + data
+
+
+class SharedStore:
+    """Memory-mapped change log shared by the collections of several processes"""
+
+    def __init__(self, path, capacity=4 * 1024 * 1024):
+        self.path = path
+        self.capacity = max(capacity, 2 * HEADER_SIZE)
+        self.collections = {}   # name -> Collection
+        self.listeners = {}     # name -> callable(old, new) for changes made elsewhere
+        self.state = {}         # collections in the log that are not attached here
+        self.position = HEADER_SIZE       # arena offset applied so far
+        self.write_position = HEADER_SIZE  # end of this section's uncommitted entries
+        self._depth = 0                    # nesting of the exclusive section
+        self._lock = threading.RLock()
+
+        self.fd, self.mm = self._open()
+        self._rebuild()
+
+        # flock is per open file, so a forked worker must open its own
+        def reopen_in_child(ref=weakref.ref(self)):
+            store = ref()
+            if store is not None:
+                store._after_fork()
+        os.register_at_fork(after_in_child=reopen_in_child)
+
+    def _open(self):
+        """Open (creating if needed) the current arena file and map it"""
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if not self._is_current(fd):
+                    os.close(fd)
+                    continue  # replaced between open and lock
+
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, self.capacity)
+                    mm = mmap.mmap(fd, 0)
+                    HEADER.pack_into(mm, 0, ARENA_MAGIC, HEADER_SIZE)
+                else:
+                    mm = mmap.mmap(fd, 0)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            except BaseException:
+                os.close(fd)
+                raise
+
+            if mm[:len(ARENA_MAGIC)] != ARENA_MAGIC:
+                mm.close()
+                os.close(fd)
+                raise ValueError(f'Not an arena file: {self.path}')
+            return fd, mm
+
+    def _is_current(self, fd):
+        """True if fd is still the file at self.path (not replaced)"""
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(fd)
+        return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
+
+    def _end(self):
+        """Committed end offset of the mapped file"""
+        return END.unpack_from(self.mm, END_OFFSET)[0]
+
+    def _after_fork(self):
+        """Give a forked child its own file handle and locks"""
+        self._lock = threading.RLock()
+        self._depth = 0
+        os.close(self.fd)
+        self.fd, self.mm = self._open()
+        self._rebuild()
+
+    def attach(self, collection, listener=None):
+        """Share a collection; listener(old, new) sees changes made elsewhere"""
+        if collection.journal is not None:
+            raise ValueError(f'Collection {collection.name!r} is already journaled')
+
+        with self:
+            saved = self.state.pop(collection.name, None)
+            if saved is not None:
+                collection.restore(saved['rows'].values(), saved['next_id'])
+            self.collections[collection.name] = collection
+            if listener is not None:
+                self.listeners[collection.name] = listener
+            collection.journal = self.record
+            collection.write_lock = self
+        return collection
+
+    def init_app(self, app):
+        """Catch up with other processes before every request"""
+        if app.extensions.get('shared_store') is not self:
+            app.extensions['shared_store'] = self
+            app.before_request(self.refresh)
+
+    def refresh(self):
+        """Replay changes committed elsewhere; lock-free when there are none"""
+        if self._end() == self.position:
+            return
+        with self._lock:
+            self._catch_up()
+
+    def _catch_up(self):
+        """Apply committed entries past our position (thread lock held)"""
+        end = self._end()
+        if end == MOVED:
+            os.close(self.fd)
+            self.fd, self.mm = self._open()
+            self._rebuild()
+            return
+
+        for entry in read_entries(self.mm, self.position, end):
+            collection = self.collections.get(entry['c'])
+            if collection is None:
+                apply_entry(self.state, entry)
+                continue
+
+            if entry['op'] == 'put':
+                new = entry['r']
+                old = collection.apply('put', new)
+            elif entry['op'] == 'del':
+                new = None
+                old = collection.apply('del', entry['id'])
+            else:
+                collection.apply('seq', entry['next_id'])
+                continue
+
+            listener = self.listeners.get(entry['c'])
+            if listener is not None and (old is not None or new is not None):
+                listener(old, new)
+        self.position = end
+
+    def _rebuild(self):
+        """Reload every collection from the start of a (new) arena file"""
+        while True:
+            end = self._end()
+            if end != MOVED:
+                break
+            os.close(self.fd)
+            self.fd, self.mm = self._open()
+
+        state = {}
+        for entry in read_entries(self.mm, HEADER_SIZE, end):
+            apply_entry(state, entry)
+
+        for name, collection in self.collections.items():
+            saved = state.pop(name, {'next_id': 1, 'rows': {}})
+            listener = self.listeners.get(name)
+            if listener is not None:
+                for item_id, record in collection.rows.items():
+                    if item_id not in saved['rows']:
+                        listener(record, None)
+                for item_id, record in saved['rows'].items():
+                    old = collection.rows.get(item_id)
+                    if old != record:
+                        listener(old, record)
+            collection.restore(saved['rows'].values(), saved['next_id'])
+
+        self.state = state
+        self.position = self.write_position = end
+
+    def __enter__(self):
+        """Exclusive section: other writers wait, and we are caught up"""
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                while True:
+                    fcntl.flock(self.fd, fcntl.LOCK_EX)
+                    if self._is_current(self.fd):
+                        break
+                    # A compaction elsewhere replaced the file but died
+                    # before marking it; mark it for lock-free readers
+                    END.pack_into(self.mm, END_OFFSET, MOVED)
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+                    self._catch_up()
+                self._catch_up()
+            except BaseException:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+                self._lock.release()
+                raise
+            self.write_position = self.position
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        """Publish this section's entries and let other writers in"""
+        self._depth -= 1
+        try:
+            if self._depth == 0:
+                try:
+                    if self.write_position != self.position:
+                        END.pack_into(self.mm, END_OFFSET, self.write_position)
+                        self.position = self.write_position
+                finally:
+                    fcntl.flock(self.fd, fcntl.LOCK_UN)
+        finally:
+            self._lock.release()
+
+    def record(self, op, name, payload):
+        """Append one change (called by Collection inside the exclusive section)"""
+        if op == 'put':
+            entry = {'op': op, 'c': name, 'r': payload}
+        else:
+            entry = {'op': op, 'c': name, 'id': payload}
+
+        data = encode_entry(entry)
+        end = self.write_position + len(data)
+        if end > len(self.mm):
+            self._compact()  # the compacted image already contains this change
+            return
+        self.mm[self.write_position:end] = data
+        self.write_position = end
+
+    def _compact(self):
+        """Rewrite the live rows into a new, larger file and swap it in"""
+        states = {name: {'next_id': c.next_id, 'rows': c.rows} for name, c in self.collections.items()}
+        states.update(self.state)
+
+        chunks = []
+        for name, saved in states.items():
+            chunks.append(encode_entry({'op': 'seq', 'c': name, 'next_id': saved['next_id']}))
+            for record in saved['rows'].values():
+                chunks.append(encode_entry({'op': 'put', 'c': name, 'r': record}))
+        body = b''.join(chunks)
+        end = HEADER_SIZE + len(body)
+        capacity = max(self.capacity, 2 * end)
+
+        tmp_path = self.path + '.tmp'
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.ftruncate(fd, capacity)
+        mm = mmap.mmap(fd, 0)
+        HEADER.pack_into(mm, 0, ARENA_MAGIC, end)
+        mm[HEADER_SIZE:end] = body
+        os.replace(tmp_path, self.path)
+
+        # Readers of the old file switch over when they see MOVED
+        END.pack_into(self.mm, END_OFFSET, MOVED)
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd, self.mm = fd, mm
+        self.position = self.write_position = end
+
+    def close(self):
+        """Release the file handle"""
+        with self._lock:
+            os.close(self.fd)
+            self.fd = None
@@ -4,6 +4,8 @@
 const state = {
     currentSection: 'overview',
     messages: [],
+    nextCursor: null,
+    stream: null,
     users: [],
     stats: {
         totalMessages: 0,
@@ -13,6 +15,10 @@ const state = {
     }
 };
 
+// Messages are fetched a page at a time, without the bulky 'original' copy
+const MESSAGE_PAGE_SIZE = 50;
+const MESSAGE_FIELDS = 'id,processed';
+
 // Initialize dashboard on load
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Dashboard initializing...');
@@ -29,6 +35,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize chart
     initializeChart();
     
+    // Receive message deltas pushed by the server
+    connectStream();
+    
     console.log('Dashboard ready!');
 });
 
@@ -100,16 +109,27 @@ function updateStats() {
     document.getElementById('uptime').textContent = state.stats.uptime;
 }
 
+// Fetch one page of messages after the given cursor
+async function fetchMessagePage(after) {
+    const params = new URLSearchParams({ limit: MESSAGE_PAGE_SIZE, fields: MESSAGE_FIELDS });
+    if (after) {
+        params.set('after', after);
+    }
+    
+    const response = await fetch(`/api/messages?${params}`);
+    return response.ok ? response.json() : null;
+}
+
 // Load messages (if API exists)
 async function loadMessages() {
     try {
         // This assumes you've added a /api/messages endpoint
-        const response = await fetch('/api/messages');
+        const data = await fetchMessagePage(null);
         
-        if (response.ok) {
-            const data = await response.json();
+        if (data) {
             state.messages = data.messages || [];
-            state.stats.totalMessages = state.messages.length;
+            state.nextCursor = data.next_cursor;
+            state.stats.totalMessages = data.total ?? state.messages.length;
             updateStats();
             renderMessages();
         }
@@ -118,27 +138,130 @@ async function loadMessages() {
     }
 }
 
+// Load the next page of messages
+async function loadMoreMessages() {
+    if (!state.nextCursor) return;
+    
+    try {
+        const data = await fetchMessagePage(state.nextCursor);
+        
+        if (data) {
+            state.messages = state.messages.concat(data.messages || []);
+            state.nextCursor = data.next_cursor;
+            state.stats.totalMessages = data.total ?? state.messages.length;
+            updateStats();
+            renderMessages();
+        }
+    } catch (error) {
+        showNotification('Error loading more messages', 'error');
+    }
+}
+
 // Render messages table
 function renderMessages() {
     const tbody = document.getElementById('messagesTableBody');
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    if (loadMoreBtn) {
+        loadMoreBtn.style.display = state.nextCursor ? 'inline-block' : 'none';
+    }
     
     if (state.messages.length === 0) {
         tbody.innerHTML = '<tr><td colspan="5" class="empty-state">No messages yet. Create one to get started!</td></tr>';
         return;
     }
     
-    tbody.innerHTML = state.messages.map((msg, index) => `
-        <tr>
-            <td>${index + 1}</td>
-            <td>${msg.name || 'Anonymous'}</td>
+    tbody.innerHTML = state.messages.map(messageRow).join('');
+}
+
+// Build one table row; rows are keyed by message id so deltas can target them
+function messageRow(msg) {
+    const name = msg.name || msg.processed?.name || 'Anonymous';
+    return `
+        <tr data-id="${msg.id}">
+            <td>${msg.id}</td>
+            <td>${name}</td>
             <td>${msg.message || msg.processed?.message || 'No message'}</td>
-            <td>${formatDate(msg.created_at || msg.timestamp)}</td>
+            <td>${formatDate(msg.created_at || msg.timestamp || msg.processed?.timestamp)}</td>
             <td>
-                <button class="btn btn-sm btn-secondary" onclick="viewMessage(${index})">View</button>
-                <button class="btn btn-sm btn-danger" onclick="deleteMessage(${index})">Delete</button>
+                <button class="btn btn-sm btn-secondary" onclick="viewMessage(${msg.id})">View</button>
+                <button class="btn btn-sm btn-danger" onclick="deleteMessage(${msg.id})">Delete</button>
             </td>
         </tr>
-    `).join('');
+    `;
+}
+
+// Apply a created message without re-rendering the table
+function applyMessageCreated(msg) {
+    if (state.messages.some(m => m.id === msg.id)) return;
+    
+    // Only append when every page is loaded; otherwise it arrives via "Load more"
+    if (!state.nextCursor) {
+        state.messages.push(msg);
+        const tbody = document.getElementById('messagesTableBody');
+        if (state.messages.length === 1) {
+            tbody.innerHTML = '';
+        }
+        tbody.insertAdjacentHTML('beforeend', messageRow(msg));
+    }
+}
+
+// Apply a deleted message without re-rendering the table
+function applyMessageDeleted(id) {
+    state.messages = state.messages.filter(m => m.id !== id);
+    const row = document.querySelector(`#messagesTableBody tr[data-id="${id}"]`);
+    if (row) {
+        row.remove();
+    }
+    if (state.messages.length === 0) {
+        renderMessages();
+    }
+}
+
+// Apply pushed statistics
+function applyStatistics(statistics) {
+    if (statistics) {
+        state.stats.totalMessages = statistics.total;
+        updateStats();
+    }
+}
+
+// Subscribe to /api/stream; falls back to polling without EventSource
+function connectStream() {
+    if (!window.EventSource) {
+        setInterval(() => {
+            if (state.currentSection === 'overview') {
+                loadDashboardData();
+            }
+        }, 30000);
+        return;
+    }
+    
+    const source = new EventSource('/api/stream');
+    state.stream = source;
+    
+    source.addEventListener('message_created', e => {
+        const data = JSON.parse(e.data);
+        applyMessageCreated(data.message);
+        applyStatistics(data.statistics);
+    });
+    
+    source.addEventListener('message_deleted', e => {
+        const data = JSON.parse(e.data);
+        applyMessageDeleted(data.id);
+        applyStatistics(data.statistics);
+    });
+    
+    source.addEventListener('messages_batch', e => {
+        applyStatistics(JSON.parse(e.data).statistics);
+        loadMessages();
+    });
+    
+    // We missed events (or the server restarted): reload and start over
+    source.addEventListener('resync', () => {
+        source.close();
+        loadMessages();
+        connectStream();
+    });
 }
 
 // Format date
@@ -231,7 +354,7 @@ async function handleNewMessage(e) {
     const message = document.getElementById('msgContent').value;
     
     try {
-        const response = await fetch('/data', {
+        const response = await fetch('/api/messages', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -245,11 +368,8 @@ async function handleNewMessage(e) {
             showNotification('Message created successfully!', 'success');
             closeModal('messageModal');
             
-            // Add to local state
-            state.messages.push(result.received_data || { name, message });
-            state.stats.totalMessages = state.messages.length;
-            updateStats();
-            renderMessages();
+            // The stream delivers the same delta; applying it twice is a no-op
+            applyMessageCreated({ id: result.data.id, processed: result.data.processed });
             
             // Reset form
             document.getElementById('newMessageForm').reset();
@@ -263,19 +383,23 @@ async function handleNewMessage(e) {
 }
 
 // View message
-function viewMessage(index) {
-    const msg = state.messages[index];
-    alert(`Message Details:\n\nName: ${msg.name}\nMessage: ${msg.message || msg.processed?.message}\nDate: ${formatDate(msg.created_at || msg.timestamp)}`);
+function viewMessage(id) {
+    const msg = state.messages.find(m => m.id === id);
+    if (!msg) return;
+    alert(`Message Details:\n\nName: ${msg.name || msg.processed?.name}\nMessage: ${msg.message || msg.processed?.message}\nDate: ${formatDate(msg.created_at || msg.timestamp || msg.processed?.timestamp)}`);
 }
 
 // Delete message
-function deleteMessage(index) {
+async function deleteMessage(id) {
     if (confirm('Are you sure you want to delete this message?')) {
-        state.messages.splice(index, 1);
-        state.stats.totalMessages = state.messages.length;
-        updateStats();
-        renderMessages();
-        showNotification('Message deleted', 'success');
+        const response = await fetch(`/api/messages/${id}`, { method: 'DELETE' });
+        
+        if (response.ok) {
+            applyMessageDeleted(id);
+            showNotification('Message deleted', 'success');
+        } else {
+            showNotification('Error deleting message', 'error');
+        }
     }
 }
 
@@ -415,13 +539,6 @@ function initializeChart() {
     });
 }
 
-// Refresh data periodically
-setInterval(() => {
-    if (state.currentSection === 'overview') {
-        loadDashboardData();
-    }
-}, 30000); // Refresh every 30 seconds
-
 // Export for debugging
 window.dashboardState = state;
 